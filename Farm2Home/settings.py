@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.RequestIDMiddleware',  # First, so every log line of the request carries its ID
+    'main.middleware.RequestMetricsMiddleware',  # Next, so its timings cover everything below
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -88,6 +93,37 @@ DATABASES = {
     }
 }
 
+# Connection reuse - a new PostgreSQL connection costs several ms of TCP and
+# authentication, so by default (DEBUG off) each worker thread keeps its
+# connection for DB_CONN_MAX_AGE seconds. Health checks test a reused
+# connection before a request runs on it, so after a database restart the
+# next request reconnects instead of failing.
+# DB_POOL_SIZE > 0 switches to a psycopg 3 connection pool per worker process
+# instead; keep it >= the worker's threads. requirements.txt only installs
+# psycopg2, so pip install "psycopg[binary,pool]" before turning it on.
+# Compare the modes: python manage.py benchmark_db_connections
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=0 if DEBUG else 60, cast=int)  # seconds, 0 = per request
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)  # connections per worker, 0 = no pool
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)  # seconds to wait for a free connection
+
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL_SIZE:
+    try:
+        import psycopg_pool  # noqa: F401 (needs psycopg 3 itself)
+    except ImportError:
+        raise ImproperlyConfigured(
+            'DB_POOL_SIZE needs psycopg 3 and its connection pool, which requirements.txt '
+            'does not install: pip install "psycopg[binary,pool]" or set DB_POOL_SIZE=0'
+        )
+    # Pooled connections go back to the pool after each request (Django
+    # doesn't allow persistent connections on top of a pool)
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {'min_size': 1, 'max_size': DB_POOL_SIZE, 'timeout': DB_POOL_TIMEOUT},
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -181,6 +217,35 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# ============================================
+# CACHE CONFIGURATION
+# ============================================
+# Local-memory cache by default. For multiple workers/servers point this at a
+# shared backend, e.g.:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='farm2home'),
+    }
+}
+
+# Sessions (admin) are read from the cache and written through to the
+# database, so a cache miss or restart never logs anyone out
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Catalog API: in-memory product snapshot + response cache (see main/catalog.py)
+CATALOG_ENGINE_ENABLED = config('CATALOG_ENGINE_ENABLED', default=True, cast=bool)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_MAX_ENTRIES = config('CATALOG_CACHE_MAX_ENTRIES', default=256, cast=int)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=60 * 60, cast=int)  # seconds
+
+# Product search (see main/search.py): 'auto' uses pg_trgm on PostgreSQL and the
+# in-memory trigram index elsewhere; 'postgres' / 'memory' force one backend
+PRODUCT_SEARCH_BACKEND = config('PRODUCT_SEARCH_BACKEND', default='auto')
+
 # ============================================
 # EMAIL CONFIGURATION
 # ============================================
@@ -197,6 +262,70 @@ DEFAULT_FROM_EMAIL = 'Farm2Home <noreply@farm2home.com>'
 # To use console backend for testing (prints emails to console):
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Outbound email queue (see main/email_queue.py)
+# Emails are queued in the database and sent by: python manage.py process_email_queue
+EMAIL_QUEUE_BATCH_SIZE = config('EMAIL_QUEUE_BATCH_SIZE', default=50, cast=int)
+EMAIL_QUEUE_POLL_INTERVAL = config('EMAIL_QUEUE_POLL_INTERVAL', default=5, cast=int)  # seconds
+EMAIL_QUEUE_MAX_ATTEMPTS = config('EMAIL_QUEUE_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_SMTP_POOL_SIZE = config('EMAIL_SMTP_POOL_SIZE', default=2, cast=int)  # SMTP connections per worker
+EMAIL_QUEUE_RETRY_DELAY = 60  # seconds before the first retry, doubled each attempt
+EMAIL_QUEUE_MAX_RETRY_DELAY = 60 * 60  # seconds
+EMAIL_QUEUE_CLAIM_TIMEOUT = 10 * 60  # seconds before a stuck SENDING email is retried
+
+# Cart stock holds (see main/inventory.py)
+# Expired holds are given back by: python manage.py release_stock_holds
+CART_HOLD_TIMEOUT = config('CART_HOLD_TIMEOUT', default=15 * 60, cast=int)  # seconds
+STOCK_HOLD_SWEEP_INTERVAL = config('STOCK_HOLD_SWEEP_INTERVAL', default=60, cast=int)  # seconds
+
+# Idempotency-Key support for checkout and payment POSTs (see main/idempotency.py)
+# Expired keys are deleted by: python manage.py purge_idempotency_keys
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60, cast=int)  # seconds
+IDEMPOTENCY_WAIT_TIMEOUT = 10  # seconds a duplicate waits for the first request
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before a key held by a dead request is released
+
+# Per-request metrics (see main/middleware.py): Server-Timing header and one
+# JSON log line per sampled request on the main.requests logger. A sampled
+# request costs ~0.2 ms; at 10% that is well under 1% of request time
+# (python manage.py benchmark_request_metrics)
+REQUEST_METRICS_SAMPLE_RATE = config('REQUEST_METRICS_SAMPLE_RATE', default=1.0 if DEBUG else 0.1, cast=float)  # 0 - 1
+REQUEST_METRICS_SLOW_MS = config('REQUEST_METRICS_SLOW_MS', default=500, cast=int)  # logged as WARNING
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 3  # same statement this often in one request = N+1 suspect
+
+# Prometheus metrics at /internal/metrics (see main/metrics.py). Each server
+# process writes its values to its own file in METRICS_DIR; clear it before
+# the server starts: python manage.py clear_metrics && gunicorn ...
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'farm2home-metrics'))
+METRICS_TOKEN = config('METRICS_TOKEN', default='')  # scrapers send "Authorization: Bearer <token>"
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())  # when no token is set
+
+# ============================================
+# LOGGING
+# ============================================
+
+# The main.* loggers write JSON lines from a background thread, so requests
+# never wait on stderr (see main/structured_logging.py). With LOG_LEVEL=DEBUG,
+# debug events are kept for LOG_DEBUG_SAMPLE_RATE of requests
+LOG_DEBUG_SAMPLE_RATE = config('LOG_DEBUG_SAMPLE_RATE', default=1.0 if DEBUG else 0.01, cast=float)  # 0 - 1
+LOG_QUEUE_SIZE = 10000  # records buffered for the writer thread before new ones are dropped
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            '()': 'main.structured_logging.QueueLogHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'debug_sample_rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
+    'loggers': {
+        'main': {
+            'handlers': ['console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
 # ============================================
 # STRIPE CONFIGURATION (TEST MODE)
 # ============================================
@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Customer, Product, Inventory, Order, OrderItem, Cart, Address
+from django.utils import timezone
+from .models import Customer, Product, Inventory, Order, OrderItem, Cart, Address, OutboundEmail, StockHold
+from .catalog import bump_catalog_version
+from .utils import send_order_shipped_emails, send_order_delivered_emails
+from .inventory import adjust_stock, release_hold_ids
+from .customer_stats import annotate_order_count
 
 
 # =====================================================
@@ -30,10 +35,15 @@ class CustomerAdmin(admin.ModelAdmin):
     # Ordering
     ordering = ['-customer_id']
     
+    def get_queryset(self, request):
+        """Read order counts from the customer stats rollup (no COUNT per row)"""
+        return annotate_order_count(super().get_queryset(request))
+    
     def order_count(self, obj):
         """Display number of orders for this customer"""
-        return obj.orders.count()
+        return obj.total_orders
     order_count.short_description = 'Total Orders'
+    order_count.admin_order_field = 'total_orders'
     
     def address_count(self, obj):
         """Display number of addresses for this customer"""
@@ -138,24 +148,28 @@ class ProductAdmin(admin.ModelAdmin):
     def activate_products(self, request, queryset):
         """Activate selected products"""
         updated = queryset.update(is_active=True)
+        bump_catalog_version()  # queryset.update() skips model signals
         self.message_user(request, f'{updated} product(s) activated successfully.')
     activate_products.short_description = 'Activate selected products'
     
     def deactivate_products(self, request, queryset):
         """Deactivate selected products"""
         updated = queryset.update(is_active=False)
+        bump_catalog_version()  # queryset.update() skips model signals
         self.message_user(request, f'{updated} product(s) deactivated successfully.')
     deactivate_products.short_description = 'Deactivate selected products'
     
     def set_summer_season(self, request, queryset):
         """Set season to summer for selected products"""
         updated = queryset.update(season='SUMMER')
+        bump_catalog_version()  # queryset.update() skips model signals
         self.message_user(request, f'{updated} product(s) set to Summer season.')
     set_summer_season.short_description = 'Set season to Summer'
     
     def set_winter_season(self, request, queryset):
         """Set season to winter for selected products"""
         updated = queryset.update(season='WINTER')
+        bump_catalog_version()  # queryset.update() skips model signals
         self.message_user(request, f'{updated} product(s) set to Winter season.')
     set_winter_season.short_description = 'Set season to Winter'
 
@@ -227,15 +241,16 @@ class InventoryAdmin(admin.ModelAdmin):
     # Custom actions
     def restock_items(self, request, queryset):
         """Add 50 units to selected items"""
-        for item in queryset:
-            item.stock_available += 50
-            item.save()
-        self.message_user(request, f'{queryset.count()} item(s) restocked with 50 units.')
+        # A relative change, so a checkout running at the same time isn't overwritten
+        product_ids = list(queryset.values_list('product_id', flat=True))
+        adjust_stock({product_id: 50 for product_id in product_ids})
+        self.message_user(request, f'{len(product_ids)} item(s) restocked with 50 units.')
     restock_items.short_description = 'Restock (+50 units)'
     
     def clear_stock(self, request, queryset):
         """Set stock to 0 for selected items"""
         updated = queryset.update(stock_available=0)
+        bump_catalog_version()  # queryset.update() skips model signals
         self.message_user(request, f'{updated} item(s) stock cleared.')
     clear_stock.short_description = 'Clear stock (set to 0)'
 
@@ -355,15 +370,21 @@ class OrderAdmin(admin.ModelAdmin):
     mark_confirmed.short_description = 'Mark as CONFIRMED'
     
     def mark_shipped(self, request, queryset):
-        """Mark orders as shipped"""
+        """Mark orders as shipped and notify their customers"""
+        # Only orders that weren't already shipped get an email
+        newly_shipped = list(queryset.exclude(status='SHIPPED').select_related('customer'))
         updated = queryset.update(status='SHIPPED')
-        self.message_user(request, f'{updated} order(s) marked as SHIPPED.')
+        queued = send_order_shipped_emails(newly_shipped)
+        self.message_user(request, f'{updated} order(s) marked as SHIPPED. {queued} shipping email(s) queued.')
     mark_shipped.short_description = 'Mark as SHIPPED'
     
     def mark_delivered(self, request, queryset):
-        """Mark orders as delivered"""
+        """Mark orders as delivered and notify their customers"""
+        # Only orders that weren't already delivered get an email
+        newly_delivered = list(queryset.exclude(status='DELIVERED').select_related('customer'))
         updated = queryset.update(status='DELIVERED')
-        self.message_user(request, f'{updated} order(s) marked as DELIVERED.')
+        queued = send_order_delivered_emails(newly_delivered)
+        self.message_user(request, f'{updated} order(s) marked as DELIVERED. {queued} delivery email(s) queued.')
     mark_delivered.short_description = 'Mark as DELIVERED'
     
     def mark_cancelled(self, request, queryset):
@@ -742,6 +763,91 @@ class AddressAdmin(admin.ModelAdmin):
         verbose_name_plural = 'Delivery Addresses'
 
 
+# =====================================================
+# OUTBOUND EMAIL ADMIN
+# =====================================================
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """Admin interface for the outbound email queue"""
+    
+    # List display columns
+    list_display = ['email_id', 'kind', 'to_email', 'subject', 'status', 'attempts', 'created_at', 'sent_at']
+    
+    # Search functionality
+    search_fields = ['to_email', 'subject']
+    
+    # Filters in right sidebar
+    list_filter = ['status', 'kind', 'created_at']
+    
+    # Queued emails are written by the application, not edited by hand
+    readonly_fields = [
+        'email_id', 'kind', 'to_email', 'subject', 'body_text', 'body_html',
+        'status', 'attempts', 'last_error', 'next_attempt_at', 'claimed_at',
+        'created_at', 'sent_at'
+    ]
+    
+    # Number of items per page
+    list_per_page = 50
+    
+    # Newest first
+    ordering = ['-email_id']
+    
+    # Custom actions
+    actions = ['retry_emails']
+    
+    def retry_emails(self, request, queryset):
+        """Queue failed emails for another round of delivery attempts"""
+        updated = queryset.filter(status='FAILED').update(
+            status='PENDING', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} email(s) queued for retry.')
+    retry_emails.short_description = '🔁 Retry failed emails'
+
+
+# =====================================================
+# STOCK HOLD ADMIN
+# =====================================================
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    """Admin interface for stock held by customers' carts"""
+    
+    # List display columns
+    list_display = ['hold_id', 'customer', 'product', 'quantity', 'expires_at', 'created_at']
+    
+    # Search functionality
+    search_fields = ['customer__name', 'customer__email', 'product__name']
+    
+    # Holds move stock in and out of inventory, so they are never edited by hand
+    readonly_fields = ['hold_id', 'customer', 'product', 'quantity', 'expires_at', 'created_at']
+    
+    # Number of items per page
+    list_per_page = 50
+    
+    # Soonest to expire first
+    ordering = ['expires_at']
+    
+    # Custom actions
+    actions = ['release_selected_holds']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # Deleting a hold without giving its stock back would lose the stock
+        return False
+    
+    def release_selected_holds(self, request, queryset):
+        """Give the held stock back to inventory"""
+        released = release_hold_ids(list(queryset.values_list('hold_id', flat=True)))
+        self.message_user(request, f'{released} hold(s) released, stock returned to inventory.')
+    release_selected_holds.short_description = '🔓 Release holds and return stock'
+    
+    def get_queryset(self, request):
+        """Optimize query with select_related to reduce database hits"""
+        queryset = super().get_queryset(request)
+        return queryset.select_related('customer', 'product')
+
+
 # =====================================================
 # ADMIN SITE CUSTOMIZATION
 # =====================================================
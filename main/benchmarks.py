@@ -0,0 +1,242 @@
+"""
+Endpoint Benchmarks for Farm2Home
+Drives the hot API endpoints through the Django test client against the
+synthetic dataset from generate_load_data (main/load_data.py) and records,
+per endpoint:
+- p50 / p95 / p99 and mean latency over --requests requests (after warm-up)
+- queries per request
+- peak Python memory allocated while serving one request (tracemalloc)
+Results are plain JSON, so a run can be stored as the baseline and later
+runs compared against it; compare_results() reports regressions. Everything
+runs in a transaction that is rolled back, so checkout leaves no orders behind.
+Run: python manage.py benchmark_endpoints --output baseline.json
+     python manage.py benchmark_endpoints --baseline baseline.json
+Under the test runner: main/tests.py (EndpointBenchmarkTests)
+"""
+
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .load_data import LOAD_PASSWORD, load_customers
+from .models import Cart, Inventory, Product
+from .structured_logging import redirect_logs
+
+
+# request(client, context) sends one request; max_requests caps endpoints
+# whose cost is fixed by design (password hashing)
+Endpoint = namedtuple('Endpoint', 'name request max_requests')
+
+# Most queries each endpoint may run per request (checked by the tests)
+QUERY_BUDGETS = {
+    'catalog_products_api': 2,
+    'checkout_cart_api': 3,
+    'create_checkout_order': 22,
+    'customer_orders_api': 3,
+    'customer_orders_summary_api': 3,
+    'customer_profile_api': 1,
+    'api_login': 1,
+}
+
+# Latency regressions smaller than this are noise, whatever the ratio
+MIN_REGRESSION_MS = 1.0
+
+
+# ==================== ENDPOINTS ====================
+
+def _catalog_products(client, context):
+    return client.get(reverse('main:catalog_products_api'))
+
+
+def _checkout_cart(client, context):
+    return client.get(reverse('main:checkout_cart_api'), {'customer_id': context['cart_customer'].customer_id})
+
+
+def _create_checkout_order(client, context):
+    customer = context['customer']
+    return client.post(reverse('main:create_checkout_order'), json.dumps({
+        'customer_id': customer.customer_id,
+        'shipping': {
+            'fullName': customer.name, 'email': customer.email, 'phone': customer.phone,
+            'address': 'House 12, Mall Road', 'city': 'Lahore', 'zipCode': '54000',
+        },
+        'billing': {},
+        'items': [{'product_id': product_id, 'quantity': 1} for product_id in context['product_ids']],
+    }), content_type='application/json')
+
+
+def _customer_orders(client, context):
+    return client.get(reverse('main:customer_orders_api'), {
+        'customer_id': context['customer'].customer_id, 'page_size': 20,
+    })
+
+
+def _customer_orders_summary(client, context):
+    return client.get(reverse('main:customer_orders_summary_api'), {'customer_id': context['customer'].customer_id})
+
+
+def _customer_profile(client, context):
+    return client.get(reverse('main:customer_profile_api'), {'customer_id': context['customer'].customer_id})
+
+
+def _api_login(client, context):
+    return client.post(reverse('main:api_login'), json.dumps({
+        'email': context['customer'].email, 'password': LOAD_PASSWORD,
+    }), content_type='application/json')
+
+
+ENDPOINTS = [
+    Endpoint('catalog_products_api', _catalog_products, None),
+    Endpoint('checkout_cart_api', _checkout_cart, None),
+    Endpoint('customer_orders_api', _customer_orders, None),
+    Endpoint('customer_orders_summary_api', _customer_orders_summary, None),
+    Endpoint('customer_profile_api', _customer_profile, None),
+    Endpoint('api_login', _api_login, 20),
+    # Last: every order empties the customer's cart
+    Endpoint('create_checkout_order', _create_checkout_order, None),
+]
+ENDPOINT_NAMES = [endpoint.name for endpoint in ENDPOINTS]
+
+
+# ==================== RUNNING ====================
+
+def benchmark_context():
+    """
+    The load customers and products the endpoints are called with
+
+    Raises:
+        ValueError: without load data (run generate_load_data first)
+    """
+    customers = load_customers()
+    customer = customers.filter(stats__total_orders__gt=0).order_by('-stats__total_orders').first()
+    if customer is None:
+        raise ValueError("No load data with orders - run generate_load_data first")
+    cart_owner = Cart.objects.filter(customer__in=customers).values('customer').order_by('customer').first()
+    product_ids = list(Product.objects.filter(is_active=True, inventory__isnull=False).order_by(
+        'product_id'
+    ).values_list('product_id', flat=True)[:3])
+    if not product_ids:
+        raise ValueError("No active products with inventory - run populate_products first")
+    return {
+        # The busiest customer: the longest order history
+        'customer': customer,
+        'cart_customer': customers.get(customer_id=cart_owner['customer']) if cart_owner else customer,
+        'product_ids': product_ids,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def measure_endpoint(client, endpoint, context, requests, warmup):
+    """Latency percentiles (ms), queries and peak allocation (KB) of one endpoint"""
+    requests = min(requests, endpoint.max_requests or requests)
+
+    def call():
+        response = endpoint.request(client, context)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{endpoint.name} returned {response.status_code}: {response.content[:300]!r}"
+            )
+        return response
+
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    # Read now: the next request resets the query log the capture points into
+    query_count = len(queries)
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': query_count,
+        'alloc_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(requests=100, warmup=10, names=None):
+    """
+    Benchmark the endpoints (all, or those in `names`)
+
+    Returns:
+        dict: {'created', 'vendor', 'requests', 'endpoints': {name: measurements}}
+
+    Raises:
+        ValueError: without load data
+        RuntimeError: if an endpoint returns an error status
+    """
+    client = Client()
+    endpoints = {}
+    with transaction.atomic():
+        context = benchmark_context()
+        # Enough stock for every checkout the run places
+        Inventory.objects.filter(product_id__in=context['product_ids']).update(stock_available=10 ** 6)
+
+        # The views still log every request - keep the lines out of the report
+        with open(os.devnull, 'w') as devnull, redirect_logs(devnull):
+            for endpoint in ENDPOINTS:
+                if names and endpoint.name not in names:
+                    continue
+                endpoints[endpoint.name] = measure_endpoint(client, endpoint, context, requests, warmup)
+        transaction.set_rollback(True)
+
+    return {
+        'created': timezone.now().isoformat(),
+        'vendor': connection.vendor,
+        'requests': requests,
+        'endpoints': endpoints,
+    }
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Regressions of `results` against a stored `baseline` run
+
+    An endpoint regresses when it runs more queries, or its p95 latency or
+    peak allocation grew by more than `tolerance` (0.25 = 25%).
+
+    Returns:
+        list: One description per regression (empty when nothing regressed)
+    """
+    regressions = []
+    for name, current in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(f"{name}: {current['queries']} queries per request (baseline {base['queries']})")
+        if (current['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                and current['p95_ms'] - base['p95_ms'] > MIN_REGRESSION_MS):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms (baseline {base['p95_ms']:.1f} ms)")
+        if current['alloc_kb'] > base['alloc_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: allocates {current['alloc_kb']:.0f} KB (baseline {base['alloc_kb']:.0f} KB)")
+    return regressions
@@ -0,0 +1,330 @@
+"""
+Customer Order Statistics for Farm2Home
+Lifetime spend, order count and the 30-day spending growth shown on the
+account pages, read from a rollup so their cost doesn't grow with the
+customer's order history:
+- CustomerStats: one row per customer (total_orders, total_spent)
+- CustomerDailySpend: amount spent per customer per (local) day
+The figures are the ones the profile always reported: every order counts,
+whatever its status, and growth compares the rolling 30 days up to now with
+the 30 days before. A window starts mid-day, so the whole days inside it come
+from CustomerDailySpend and its first day from that day's orders - growth
+reads at most 60 daily rows and two days of orders.
+
+The rollup is maintained incrementally, in the same transaction as the order,
+by the Order signals in main/signals.py (orders created, saved or deleted one
+by one). Writes that bypass them (queryset.update, bulk_create, raw SQL) and
+change an order's customer, amount or date must call apply_order_changes()
+themselves, or rebuild the rollup afterwards:
+    python manage.py rebuild_customer_stats [--verify-only]
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Customer, CustomerDailySpend, CustomerStats, Order
+
+
+# Order fields the rollup depends on, in the order order_row() returns them
+ORDER_STATS_FIELDS = ('customer_id', 'total_amount', 'order_date')
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+# ==================== READING ====================
+
+def stats_windows(now=None):
+    """
+    Start of the last 30 days and of the 30 days before that
+    Recent spending is order_date >= recent_start, previous spending is
+    previous_start <= order_date < recent_start
+    """
+    now = now or timezone.now()
+    return now - timedelta(days=30), now - timedelta(days=60)
+
+
+def day_start(day):
+    """The moment a (local) day starts, as stored in order_date"""
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def annotate_order_stats(queryset, now=None):
+    """
+    Annotate a Customer queryset with its order statistics from the rollup
+
+    Adds total_spent, total_orders, recent_spending (last 30 days) and
+    previous_spending (the 30 days before) to every customer, in the same
+    query as the customers themselves.
+    """
+    recent_start, previous_start = stats_windows(now)
+    recent_day, previous_day = order_day(recent_start), order_day(previous_start)
+    daily = CustomerDailySpend.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+
+    def spent(rows, field, condition):
+        return Coalesce(
+            Subquery(rows.filter(condition).annotate(total=Sum(field)).values('total'), output_field=AMOUNT_FIELD),
+            Value(Decimal('0')), output_field=AMOUNT_FIELD,
+        )
+
+    def orders_between(start, end):
+        return Q(order_date__gte=start, order_date__lt=end)
+
+    # Whole days from the rollup; the day a window starts in from its orders
+    recent_spending = (
+        spent(daily, 'amount_spent', Q(day__gt=recent_day))
+        + spent(orders, 'total_amount', orders_between(recent_start, day_start(recent_day + timedelta(days=1))))
+    )
+    previous_spending = (
+        spent(daily, 'amount_spent', Q(day__gt=previous_day, day__lt=recent_day))
+        + spent(orders, 'total_amount', orders_between(previous_start, day_start(previous_day + timedelta(days=1)))
+                | orders_between(day_start(recent_day), recent_start))
+    )
+    return queryset.annotate(
+        total_spent=F('stats__total_spent'),
+        total_orders=Coalesce(F('stats__total_orders'), 0),
+        recent_spending=recent_spending,
+        previous_spending=previous_spending,
+    )
+
+
+def annotate_order_count(queryset):
+    """Annotate a Customer queryset with total_orders from the rollup"""
+    return queryset.annotate(total_orders=Coalesce(F('stats__total_orders'), 0))
+
+
+def order_stats(customer, now=None):
+    """
+    Order statistics for one customer, from annotate_order_stats() when the
+    instance carries them, otherwise with one query
+
+    Returns:
+        dict: total_spent, total_orders, recent_spending, previous_spending
+    """
+    fields = ('total_spent', 'total_orders', 'recent_spending', 'previous_spending')
+    if hasattr(customer, 'total_orders'):
+        return {field: getattr(customer, field) for field in fields}
+    return annotate_order_stats(Customer.objects.filter(pk=customer.pk), now).values(*fields).get()
+
+
+def growth_percentage(recent_spending, previous_spending):
+    """
+    Percentage change of the last 30 days' spending over the 30 days before
+    100.0 when spending only started in the last 30 days, 0.0 with no spending
+    """
+    recent_spending = recent_spending or 0
+    previous_spending = previous_spending or 0
+    if previous_spending > 0:
+        growth = ((recent_spending - previous_spending) / previous_spending) * 100
+        return round(growth, 1)
+    elif recent_spending > 0:
+        return 100.0  # 100% growth if spending started in last 30 days
+    else:
+        return 0.0  # No growth if no spending in either period
+
+
+# ==================== INCREMENTAL UPDATES ====================
+
+def order_row(order):
+    """The values of an order the rollup depends on (see ORDER_STATS_FIELDS)"""
+    return (order.customer_id, order.total_amount, order.order_date)
+
+
+def order_day(order_date):
+    """The day an order counts towards in CustomerDailySpend"""
+    if timezone.is_naive(order_date):
+        return order_date.date()
+    return timezone.localdate(order_date)
+
+
+def _collect(rows, sign, customers, days):
+    """Add the rollup changes of these order rows (sign -1 to remove them)"""
+    for customer_id, total_amount, order_date in rows:
+        spent = Decimal(total_amount or 0) * sign
+        orders, amount = customers.get(customer_id, (0, Decimal('0')))
+        customers[customer_id] = (orders + sign, amount + spent)
+        if spent:
+            key = (customer_id, order_day(order_date))
+            days[key] = days.get(key, Decimal('0')) + spent
+
+
+def apply_order_changes(removed=(), added=()):
+    """
+    Update the rollup for orders that went away and orders that came in
+    An order that changed is removed with its old values and added with its
+    new ones, so a corrected total_amount moves the customer's spending by the
+    difference but leaves the order count alone.
+
+    Every affected row is changed with one UPDATE per table. Call inside the
+    transaction that changes the orders so both commit together.
+
+    Args:
+        removed: iterable of order rows (see order_row()) to take out
+        added: iterable of order rows to put in
+    """
+    customers, days = {}, {}
+    _collect(removed, -1, customers, days)
+    _collect(added, 1, customers, days)
+    customers = {customer_id: change for customer_id, change in customers.items() if any(change)}
+    days = {key: amount for key, amount in days.items() if amount}
+    if not customers and not days:
+        return
+
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        if customers:
+            _create_missing(CustomerStats, [
+                CustomerStats(customer_id=customer_id)
+                for customer_id, (orders, amount) in customers.items() if orders > 0 or amount > 0
+            ])
+            _lock(CustomerStats.objects.filter(customer_id__in=customers), ['customer_id'], len(customers))
+            CustomerStats.objects.filter(customer_id__in=customers).update(
+                total_orders=F('total_orders') + Case(
+                    *[When(customer_id=customer_id, then=Value(orders))
+                      for customer_id, (orders, _) in customers.items()],
+                    default=Value(0), output_field=IntegerField(),
+                ),
+                total_spent=F('total_spent') + Case(
+                    *[When(customer_id=customer_id, then=Value(amount))
+                      for customer_id, (_, amount) in customers.items()],
+                    default=Value(Decimal('0')), output_field=AMOUNT_FIELD,
+                ),
+                updated_at=now,
+            )
+
+        if days:
+            _create_missing(CustomerDailySpend, [
+                CustomerDailySpend(customer_id=customer_id, day=day)
+                for (customer_id, day), amount in days.items() if amount > 0
+            ])
+            matching = reduce(or_, [Q(customer_id=customer_id, day=day) for customer_id, day in days])
+            _lock(CustomerDailySpend.objects.filter(matching), ['customer_id', 'day'], len(days))
+            CustomerDailySpend.objects.filter(matching).update(
+                amount_spent=F('amount_spent') + Case(
+                    *[When(customer_id=customer_id, day=day, then=Value(amount))
+                      for (customer_id, day), amount in days.items()],
+                    default=Value(Decimal('0')), output_field=AMOUNT_FIELD,
+                ),
+            )
+
+
+def _create_missing(model, rows):
+    """Insert rollup rows that don't exist yet (existing ones are left alone)"""
+    if rows:
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def _lock(queryset, ordering, rows):
+    """
+    Lock rollup rows in a fixed order before a multi-row UPDATE, so two
+    transactions changing orders of the same customers queue up instead of
+    deadlocking. A single row needs no ordering - the UPDATE locks it.
+    """
+    if rows > 1:
+        list(queryset.select_for_update().order_by(*ordering).values_list('pk', flat=True))
+
+
+# ==================== REBUILD ====================
+
+def compute_customer_stats(customer_ids=None):
+    """
+    Compute the rollup from the orders themselves
+
+    Returns:
+        tuple: ({customer_id: (total_orders, total_spent)},
+                {(customer_id, day): amount_spent})
+    """
+    orders = Order.objects.order_by()
+    if customer_ids is not None:
+        orders = orders.filter(customer_id__in=customer_ids)
+
+    totals = {
+        row['customer_id']: (row['total_orders'], row['total_spent'] or Decimal('0'))
+        for row in orders.values('customer_id').annotate(
+            total_orders=Count('order_id'),
+            total_spent=Sum('total_amount'),
+        ).iterator()
+    }
+    days = {
+        (row['customer_id'], row['day']): row['amount_spent']
+        for row in orders.annotate(day=TruncDate('order_date'))
+        .values('customer_id', 'day').annotate(amount_spent=Sum('total_amount')).iterator()
+        if row['amount_spent']
+    }
+    return totals, days
+
+
+def rebuild_customer_stats(customer_ids=None, batch_size=1000):
+    """
+    Replace the rollup (of these customers, or everyone) with freshly computed rows
+
+    Returns:
+        tuple: (customer rows, daily rows) written
+    """
+    with transaction.atomic():
+        totals, days = compute_customer_stats(customer_ids)
+        stats = CustomerStats.objects.all()
+        daily = CustomerDailySpend.objects.all()
+        if customer_ids is not None:
+            stats = stats.filter(customer_id__in=customer_ids)
+            daily = daily.filter(customer_id__in=customer_ids)
+        stats.delete()
+        daily.delete()
+
+        CustomerStats.objects.bulk_create([
+            CustomerStats(customer_id=customer_id, total_orders=orders, total_spent=amount)
+            for customer_id, (orders, amount) in totals.items()
+        ], batch_size=batch_size)
+        CustomerDailySpend.objects.bulk_create([
+            CustomerDailySpend(customer_id=customer_id, day=day, amount_spent=amount)
+            for (customer_id, day), amount in days.items()
+        ], batch_size=batch_size)
+    return len(totals), len(days)
+
+
+def verify_customer_stats(customer_ids=None):
+    """
+    Compare the rollup with the orders
+
+    Returns:
+        list: One description per mismatch (empty when the rollup is right)
+    """
+    totals, days = compute_customer_stats(customer_ids)
+    stats = CustomerStats.objects.all()
+    daily = CustomerDailySpend.objects.exclude(amount_spent=0)
+    if customer_ids is not None:
+        stats = stats.filter(customer_id__in=customer_ids)
+        daily = daily.filter(customer_id__in=customer_ids)
+
+    stored = {
+        customer_id: (orders, amount)
+        for customer_id, orders, amount in stats.values_list('customer_id', 'total_orders', 'total_spent').iterator()
+        if orders or amount
+    }
+    stored_days = {
+        (customer_id, day): amount
+        for customer_id, day, amount in daily.values_list('customer_id', 'day', 'amount_spent').iterator()
+    }
+
+    mismatches = []
+    for customer_id in sorted(set(totals) | set(stored)):
+        expected, actual = totals.get(customer_id, (0, Decimal('0'))), stored.get(customer_id, (0, Decimal('0')))
+        if expected != actual:
+            mismatches.append(
+                f"customer {customer_id}: stored {actual[0]} orders / Rs. {actual[1]}, "
+                f"orders say {expected[0]} / Rs. {expected[1]}"
+            )
+    for customer_id, day in sorted(set(days) | set(stored_days)):
+        expected, actual = days.get((customer_id, day), Decimal('0')), stored_days.get((customer_id, day), Decimal('0'))
+        if expected != actual:
+            mismatches.append(f"customer {customer_id} on {day}: stored Rs. {actual}, orders say Rs. {expected}")
+    return mismatches
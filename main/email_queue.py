@@ -0,0 +1,330 @@
+"""
+Outbound Email Queue for Farm2Home
+- enqueue_email() / enqueue_emails() store fully rendered emails in the
+  OutboundEmail table (used by the send_* helpers in main/utils.py, so
+  requests never talk SMTP)
+- BatchEmailSender sends a list of messages over a small pool of persistent
+  SMTP connections, isolating failures per message
+- EmailQueueWorker claims due emails in batches and delivers them through a
+  BatchEmailSender, retrying failures with exponential backoff; deliveries
+  and failures are counted per template (main/metrics.py)
+Run the worker: python manage.py process_email_queue
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import InterfaceError, OperationalError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .metrics import EMAILS_FAILED, EMAILS_SENT
+from .models import OutboundEmail
+
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away on retry (e.g. the mailbox does not exist)
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused,)
+
+
+def enqueue_email(kind, to_email, subject, text_message, html_message=''):
+    """
+    Queue an email for delivery by the process_email_queue worker
+
+    Args:
+        kind: Short label for the email type (welcome, order_confirmation, ...)
+        to_email: Recipient address
+        subject: Subject line
+        text_message: Plain text body
+        html_message: Optional HTML alternative
+
+    Returns:
+        OutboundEmail: The queued email
+    """
+    return OutboundEmail.objects.create(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body_text=text_message,
+        body_html=html_message,
+    )
+
+
+def enqueue_emails(emails):
+    """
+    Queue many emails with a single INSERT
+
+    Args:
+        emails: iterable of (kind, to_email, subject, text_message, html_message)
+
+    Returns:
+        int: Number of emails queued
+    """
+    queued = OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            kind=kind,
+            to_email=to_email,
+            subject=subject,
+            body_text=text_message,
+            body_html=html_message,
+        )
+        for kind, to_email, subject, text_message, html_message in emails
+    ])
+    return len(queued)
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt: base * 2^(attempts - 1), capped"""
+    base = getattr(settings, 'EMAIL_QUEUE_RETRY_DELAY', 60)
+    cap = getattr(settings, 'EMAIL_QUEUE_MAX_RETRY_DELAY', 60 * 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim_due_emails(batch_size):
+    """
+    Claim up to batch_size due emails for this worker
+
+    Pending emails whose next attempt is due are claimed, as are emails left
+    in SENDING by a worker that died mid-batch (claimed longer ago than
+    EMAIL_QUEUE_CLAIM_TIMEOUT). On PostgreSQL, SKIP LOCKED lets several
+    workers drain the queue without picking the same rows.
+
+    Returns:
+        list: OutboundEmail instances now marked SENDING
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'EMAIL_QUEUE_CLAIM_TIMEOUT', 10 * 60))
+    claimable = (
+        Q(status='PENDING', next_attempt_at__lte=now)
+        | Q(status='SENDING', claimed_at__lt=stale)
+    )
+
+    with transaction.atomic():
+        email_ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('next_attempt_at', 'email_id')
+            .values_list('email_id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(claimable, email_id__in=email_ids).update(
+            status='SENDING', claimed_at=now
+        )
+
+    return list(
+        OutboundEmail.objects.filter(email_id__in=email_ids, status='SENDING', claimed_at=now)
+    )
+
+
+class BatchEmailSender:
+    """
+    Sends batches of messages over a pool of reusable SMTP connections
+
+    Each connection is opened (TLS handshake + login) once and reused for
+    every message it sends until an error that may have broken it, so a
+    batch of 1,000 emails costs pool_size logins instead of 1,000. With more
+    than one connection the batch is split between them and sent in parallel.
+    Every message succeeds or fails on its own - one bad address or dropped
+    connection never takes the rest of the batch down with it.
+    """
+
+    def __init__(self, pool_size=None, connection_factory=None):
+        self.pool_size = max(1, pool_size or getattr(settings, 'EMAIL_SMTP_POOL_SIZE', 2))
+        self.connection_factory = connection_factory or (lambda: get_connection(fail_silently=False))
+        self._connections = [None] * self.pool_size
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _get_connection(self, slot):
+        connection = self._connections[slot]
+        if connection is None:
+            connection = self.connection_factory()
+            connection.open()
+            self._connections[slot] = connection
+            with self._lock:
+                self.connections_opened += 1
+        return connection
+
+    def _close_connection(self, slot):
+        connection = self._connections[slot]
+        self._connections[slot] = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """Close every pooled connection (ignoring errors from dead ones)"""
+        for slot in range(self.pool_size):
+            self._close_connection(slot)
+
+    def _send_chunk(self, slot, indexed_messages):
+        results = []
+        for index, message in indexed_messages:
+            try:
+                if not self._get_connection(slot).send_messages([message]):
+                    raise smtplib.SMTPException('Message was not accepted for delivery')
+            except PERMANENT_ERRORS as e:
+                results.append((index, e))
+            except Exception as e:
+                # The connection may be unusable now - reopen it for the next message
+                self._close_connection(slot)
+                results.append((index, e))
+            else:
+                results.append((index, None))
+        return results
+
+    def send(self, messages):
+        """
+        Send every message, spreading them over the connection pool
+
+        Returns:
+            list: One entry per message, in order - None if it was sent,
+                  otherwise the exception that stopped it
+        """
+        indexed = list(enumerate(messages))
+        slots = min(self.pool_size, len(indexed))
+        if slots == 0:
+            return []
+
+        if slots == 1:
+            chunks = [self._send_chunk(0, indexed)]
+        else:
+            with ThreadPoolExecutor(max_workers=slots) as executor:
+                chunks = list(executor.map(
+                    self._send_chunk, range(slots), [indexed[i::slots] for i in range(slots)]
+                ))
+
+        results = [None] * len(indexed)
+        for chunk in chunks:
+            for index, error in chunk:
+                results[index] = error
+        return results
+
+
+def build_message(email):
+    """EmailMultiAlternatives for a queued OutboundEmail"""
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body_text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+    )
+    if email.body_html:
+        message.attach_alternative(email.body_html, 'text/html')
+    return message
+
+
+class EmailQueueWorker:
+    """
+    Delivers queued emails in batches through a BatchEmailSender
+
+    Pooled connections are kept open while there is work, closed when the
+    queue runs dry and reopened on demand.
+    """
+
+    def __init__(self, batch_size=None, sender=None):
+        self.batch_size = batch_size or getattr(settings, 'EMAIL_QUEUE_BATCH_SIZE', 50)
+        self.max_attempts = getattr(settings, 'EMAIL_QUEUE_MAX_ATTEMPTS', 5)
+        self.sender = sender or BatchEmailSender()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def close(self):
+        self.sender.close()
+
+    def process_batch(self):
+        """
+        Claim and deliver one batch of due emails
+
+        Returns:
+            int: Number of emails processed (sent, retried or failed)
+        """
+        emails = claim_due_emails(self.batch_size)
+        if not emails:
+            return 0
+
+        # Build every message before the first one goes out
+        messages = [build_message(email) for email in emails]
+        results = self.sender.send(messages)
+
+        delivered = [email.email_id for email, error in zip(emails, results) if error is None]
+        self.record_success(delivered)
+        for email, error in zip(emails, results):
+            if error is None:
+                EMAILS_SENT.inc(template=email.kind)
+            else:
+                self.record_failure(email, error, permanent=isinstance(error, PERMANENT_ERRORS))
+        return len(emails)
+
+    def record_success(self, email_ids):
+        if not email_ids:
+            return
+        OutboundEmail.objects.filter(email_id__in=email_ids).update(
+            status='SENT',
+            attempts=F('attempts') + 1,
+            sent_at=timezone.now(),
+            claimed_at=None,
+            last_error='',
+        )
+        self.sent += len(email_ids)
+
+    def record_failure(self, email, error, permanent=False):
+        EMAILS_FAILED.inc(template=email.kind)
+        attempts = email.attempts + 1
+        update = {
+            'attempts': attempts,
+            'claimed_at': None,
+            'last_error': f"{type(error).__name__}: {error}",
+        }
+        if permanent or attempts >= self.max_attempts:
+            update['status'] = 'FAILED'
+            self.failed += 1
+        else:
+            update['status'] = 'PENDING'
+            update['next_attempt_at'] = timezone.now() + retry_delay(attempts)
+            self.retried += 1
+        OutboundEmail.objects.filter(email_id=email.email_id).update(**update)
+
+    def run(self, poll_interval=None, once=False):
+        """
+        Drain the queue, then keep polling for new emails
+
+        Args:
+            poll_interval: Seconds to wait when the queue is empty
+            once: Stop as soon as no due emails are left
+        """
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'EMAIL_QUEUE_POLL_INTERVAL', 5)
+        try:
+            while True:
+                # Between batches, as between requests: drop a connection that
+                # broke (database restart) or outlived CONN_MAX_AGE - unless a
+                # caller's transaction is still using it
+                if not connection.in_atomic_block:
+                    close_old_connections()
+                try:
+                    processed = self.process_batch()
+                except (OperationalError, InterfaceError):
+                    if once:
+                        raise
+                    logger.warning('database_unavailable', exc_info=True, extra={'retry_in': poll_interval})
+                    time.sleep(poll_interval)
+                    continue
+                if processed:
+                    continue
+                # Queue is empty - don't hold idle SMTP connections open
+                self.close()
+                if once:
+                    return
+                time.sleep(poll_interval)
+        finally:
+            self.close()
@@ -0,0 +1,98 @@
+"""
+Email Rendering for Farm2Home
+- Every email is a pair of templates: templates/emails/<name>.html and a
+  hand-written templates/emails/<name>.txt for the plain text part (no more
+  strip_tags() over the rendered HTML)
+- Both templates are compiled once per process and reused for every email
+- render_emails() renders a whole batch against the compiled pair with a
+  single template Context
+Used by the send_* helpers in main/utils.py
+"""
+
+import threading
+from pathlib import Path
+
+from django.template import Context, engines
+from django.utils.autoreload import file_changed
+
+
+# name -> (html Template, text Template)
+_compiled_templates = {}
+_compile_lock = threading.Lock()
+
+
+def get_email_templates(name):
+    """
+    Compiled (html, text) templates for an email, loaded on first use
+
+    Args:
+        name: Template name without extension, e.g. 'order_confirmation'
+
+    Returns:
+        tuple: (html_template, text_template) django.template.base.Template objects
+    """
+    templates = _compiled_templates.get(name)
+    if templates is None:
+        with _compile_lock:
+            templates = _compiled_templates.get(name)
+            if templates is None:
+                engine = engines['django'].engine
+                templates = (
+                    engine.get_template(f'emails/{name}.html'),
+                    engine.get_template(f'emails/{name}.txt'),
+                )
+                _compiled_templates[name] = templates
+    return templates
+
+
+def clear_email_template_cache():
+    """Forget every compiled email template (they are recompiled on next use)"""
+    with _compile_lock:
+        _compiled_templates.clear()
+
+
+def render_email(name, context):
+    """
+    Render one email
+
+    Args:
+        name: Template name without extension
+        context: dict of template variables
+
+    Returns:
+        tuple: (plain_message, html_message)
+    """
+    return render_emails(name, [context])[0]
+
+
+def render_emails(name, contexts):
+    """
+    Render the same email for many contexts in one pass (batch sends)
+
+    The templates are looked up once and a single Context is reused, with
+    each email's variables pushed on top of it and popped afterwards.
+
+    Args:
+        name: Template name without extension
+        contexts: iterable of dicts of template variables
+
+    Returns:
+        list: (plain_message, html_message) per context, in order
+    """
+    html_template, text_template = get_email_templates(name)
+    context = Context()
+    rendered = []
+    for values in contexts:
+        with context.push(values):
+            rendered.append((text_template.render(context).strip() + '\n', html_template.render(context)))
+    return rendered
+
+
+def _reset_on_template_change(sender, file_path, **kwargs):
+    # Keep runserver's template autoreload working for email templates. Returning
+    # None leaves the restart decision to Django's own template_changed receiver.
+    if Path(file_path).suffix in ('.html', '.txt'):
+        clear_email_template_cache()
+
+
+file_changed.connect(_reset_on_template_change, dispatch_uid='email_template_cache_reset')
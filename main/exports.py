@@ -0,0 +1,294 @@
+"""
+Order Exports for Farm2Home
+Streams orders joined with their customers and items - one row per order
+item - to CSV, JSONL or Parquet without holding them in memory:
+- export_rows() reads every row with one joined query through
+  .iterator(chunk_size=...) (a named server-side cursor on PostgreSQL)
+- the writers encode rows as they arrive, optionally gzip-compressed;
+  Parquet (needs pyarrow) is written one row group per chunk
+- export_partitions() splits a date range into day or month partitions and
+  exports them in parallel worker processes, one file per partition
+Files are written under a .part name and renamed once complete, so a
+half-written export is never mistaken for a finished one.
+Run: python manage.py export_orders --month 2025-01 --format csv --gzip
+"""
+
+import csv
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+
+# (column, OrderItem lookup) - one row per order item
+EXPORT_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('order_date', 'order__order_date'),
+    ('status', 'order__status'),
+    ('payment', 'order__payment'),
+    ('order_total', 'order__total_amount'),
+    ('customer_id', 'order__customer_id'),
+    ('customer_name', 'order__customer__name'),
+    ('customer_email', 'order__customer__email'),
+    ('customer_phone', 'order__customer__phone'),
+    ('item_id', 'item_id'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product__name'),
+    ('quantity', 'quantity'),
+    ('price', 'price'),
+)
+COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+ORDER_DATE = COLUMN_NAMES.index('order_date')
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Rows fetched per round trip (and rows per Parquet row group)
+EXPORT_CHUNK_SIZE = 10000
+
+
+# ==================== READING ====================
+
+def export_rows(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Order item rows (tuples in EXPORT_COLUMNS order) for orders placed in
+    [start, end), oldest first, read chunk_size rows at a time
+    """
+    items = OrderItem.objects.all()
+    if start is not None:
+        items = items.filter(order__order_date__gte=start)
+    if end is not None:
+        items = items.filter(order__order_date__lt=end)
+    return items.order_by('order__order_date', 'order_id', 'item_id').values_list(
+        *[lookup for _, lookup in EXPORT_COLUMNS]
+    ).iterator(chunk_size=chunk_size)
+
+
+def order_date_range():
+    """(first, last) order date, or (None, None) without orders"""
+    first = Order.objects.order_by('order_date').values_list('order_date', flat=True).first()
+    last = Order.objects.order_by('-order_date').values_list('order_date', flat=True).first()
+    return first, last
+
+
+def day_start(day):
+    """Aware datetime for the start of a date in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def partition_ranges(start, end, partition):
+    """
+    Split [start, end) into day or month partitions
+
+    Returns:
+        list: (label, start, end) tuples - label is 2025-01-31 or 2025-01
+    """
+    ranges = []
+    day = timezone.localtime(start).date()
+    if partition == 'month':
+        day = day.replace(day=1)
+    while day_start(day) < end:
+        if partition == 'month':
+            following = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+            label = day.strftime('%Y-%m')
+        else:
+            following = day + timedelta(days=1)
+            label = day.isoformat()
+        ranges.append((label, max(start, day_start(day)), min(end, day_start(following))))
+        day = following
+    return ranges
+
+
+# ==================== WRITERS ====================
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _with_iso_date(row):
+    """The row with order_date in ISO 8601 (str() would use a space separator)"""
+    row = list(row)
+    row[ORDER_DATE] = row[ORDER_DATE].isoformat()
+    return row
+
+
+def _json_default(value):
+    """Decimals keep their exact digits as strings, dates are ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class CSVExportWriter:
+    extension = 'csv'
+
+    def __init__(self, path, compress=False):
+        if compress:
+            self.file = gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMN_NAMES)
+
+    def write(self, rows):
+        # csv writes Decimals with str() and None as an empty field
+        self.writer.writerows(map(_with_iso_date, rows))
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLExportWriter:
+    extension = 'jsonl'
+
+    def __init__(self, path, compress=False):
+        if compress:
+            self.file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.writelines(
+            json.dumps(dict(zip(COLUMN_NAMES, row)), default=_json_default, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """Columnar output, one row group per chunk (requires pyarrow)"""
+    extension = 'parquet'
+
+    def __init__(self, path, compress=False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        self.pa = pa
+        money = pa.decimal128(10, 2)
+        self.schema = pa.schema([
+            ('order_id', pa.int64()),
+            ('order_date', pa.timestamp('us', tz='UTC')),
+            ('status', pa.string()),
+            ('payment', pa.string()),
+            ('order_total', money),
+            ('customer_id', pa.int64()),
+            ('customer_name', pa.string()),
+            ('customer_email', pa.string()),
+            ('customer_phone', pa.string()),
+            ('item_id', pa.int64()),
+            ('product_id', pa.int64()),
+            ('product_name', pa.string()),
+            ('quantity', pa.int64()),
+            ('price', money),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='gzip' if compress else 'snappy')
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_WRITERS = {
+    'csv': CSVExportWriter,
+    'jsonl': JSONLExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def export_filename(label, fmt, compress=False):
+    """orders-<label>.<ext>, plus .gz for compressed CSV / JSONL"""
+    name = f"orders-{label}.{EXPORT_WRITERS[fmt].extension}"
+    return name + '.gz' if compress and fmt != 'parquet' else name
+
+
+# ==================== EXPORTING ====================
+
+def export_range(path, fmt, start=None, end=None, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export the order items of orders placed in [start, end) to one file
+
+    Args:
+        path: Output file
+        fmt: 'csv', 'jsonl' or 'parquet'
+        start, end: Aware datetimes (None for no bound)
+        compress: gzip the output (Parquet: gzip column compression)
+        chunk_size: Rows fetched (and written) at a time
+
+    Returns:
+        int: Number of rows written
+    """
+    partial = f"{path}.part"
+    writer = EXPORT_WRITERS[fmt](partial, compress)
+    written = 0
+    try:
+        for batch in _batches(export_rows(start, end, chunk_size), chunk_size):
+            writer.write(batch)
+            written += len(batch)
+    except BaseException:
+        writer.close()
+        os.remove(partial)
+        raise
+    writer.close()
+    os.replace(partial, path)
+    return written
+
+
+def _export_job(job):
+    """Worker process entry point: export one partition"""
+    try:
+        return job[0], export_range(*job)
+    finally:
+        connections.close_all()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def export_partitions(directory, fmt, start, end, partition='day', workers=1,
+                      compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export [start, end) as one file per day or month partition
+
+    With workers > 1 the partitions are exported in parallel processes, each
+    with its own database connection.
+
+    Returns:
+        list: (path, rows written) per partition, oldest first
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = [
+        (os.path.join(directory, export_filename(label, fmt, compress)), fmt,
+         partition_start, partition_end, compress, chunk_size)
+        for label, partition_start, partition_end in partition_ranges(start, end, partition)
+    ]
+    if workers <= 1 or len(jobs) <= 1:
+        return [(job[0], export_range(*job)) for job in jobs]
+
+    # Worker processes must not share this process's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_export_job, jobs))
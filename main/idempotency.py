@@ -0,0 +1,188 @@
+"""
+Idempotency Keys for Farm2Home
+POST endpoints decorated with @idempotent accept an Idempotency-Key header.
+The first request with a key runs the view and its response is stored for
+IDEMPOTENCY_KEY_TTL seconds; a retry with the same key and body gets the
+stored response back without running the view again (no second order, stock
+update, email or payment intent).
+- Concurrent duplicates: a unique (scope, key) row picks one winner; the
+  others wait up to IDEMPOTENCY_WAIT_TIMEOUT for its response and get 409 if
+  it is still running after that
+- The same key with a different body gets 422
+- Server errors (5xx) are not stored, so the client can retry them
+- A winner that died mid-request releases the key after IDEMPOTENCY_LOCK_TIMEOUT
+Expired keys are deleted by: python manage.py purge_idempotency_keys
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while waiting for a concurrent duplicate to finish
+WAIT_POLL_INTERVAL = 0.05
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def request_fingerprint(request):
+    """SHA-256 of the method, path and request body (key order ignored)"""
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    payload = f"{request.method} {request.path}\n{body}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Try to become the request that runs the view for this key
+
+    Returns:
+        tuple: (record, claimed) - claimed is True when this request won
+    """
+    now = timezone.now()
+    ttl = timedelta(seconds=_setting('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                scope=scope, key=key, fingerprint=fingerprint,
+                locked_at=now, expires_at=now + ttl,
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if record is None:
+        # Deleted (expired or failed) between our INSERT and SELECT - try again
+        return _claim(scope, key, fingerprint)
+
+    stale = now - timedelta(seconds=_setting('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    if record.expires_at <= now or (record.status == 'IN_PROGRESS' and record.locked_at < stale):
+        # Expired, or the winner died mid-request: take the key over. The
+        # conditional UPDATE makes sure only one waiter does.
+        taken = IdempotencyKey.objects.filter(
+            idempotency_id=record.idempotency_id, locked_at=record.locked_at, status=record.status,
+        ).update(
+            fingerprint=fingerprint, status='IN_PROGRESS', response_status=None, response_body=None,
+            locked_at=now, expires_at=now + ttl,
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+        record.refresh_from_db()
+
+    return record, False
+
+
+def _wait_for_response(record):
+    """Poll a key claimed by a concurrent request until it completes or times out"""
+    deadline = time.monotonic() + _setting('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+    while record.status != 'COMPLETED' and time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(idempotency_id=record.idempotency_id).first()
+        if record is None:
+            # The winner failed with a server error and gave the key up
+            return None
+    return record
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(record, response):
+    """Save the winner's response, or give the key up if it is a server error"""
+    if response.status_code >= 500 or not hasattr(response, 'data'):
+        IdempotencyKey.objects.filter(idempotency_id=record.idempotency_id).delete()
+        return
+    body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+    IdempotencyKey.objects.filter(idempotency_id=record.idempotency_id).update(
+        status='COMPLETED', response_status=response.status_code, response_body=body,
+    )
+
+
+def idempotent(scope):
+    """
+    Make a DRF function view honour the Idempotency-Key header
+    Place it below @api_view so request.data is available:
+
+        @api_view(['POST'])
+        @idempotent('checkout.create_order')
+        def create_checkout_order(request): ...
+
+    Requests without the header run as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({
+                    'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            fingerprint = request_fingerprint(request)
+            record, claimed = _claim(scope, key, fingerprint)
+
+            if not claimed:
+                if record.fingerprint != fingerprint:
+                    return Response({
+                        'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'
+                    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                record = _wait_for_response(record)
+                if record is None:
+                    # The first attempt failed - this retry runs the view itself
+                    return wrapper(request, *args, **kwargs)
+                if record.status != 'COMPLETED':
+                    return Response({
+                        'error': 'A request with this Idempotency-Key is still being processed'
+                    }, status=status.HTTP_409_CONFLICT)
+                return _replay(record)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(idempotency_id=record.idempotency_id).delete()
+                raise
+            _store(record, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete expired idempotency keys, one batch at a time
+
+    Returns:
+        int: Number of keys deleted
+    """
+    deleted = 0
+    while True:
+        expired = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('idempotency_id', flat=True)[:batch_size]
+        )
+        if not expired:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(idempotency_id__in=expired).delete()[0]
@@ -0,0 +1,271 @@
+"""
+Inventory Reservation for Farm2Home
+Checkout, cart holds, the hold sweeper and the admin restock action change
+Inventory.stock_available through adjust_stock(), which is safe under
+concurrent checkouts:
+- the inventory rows involved are locked in product_id order first, so two
+  transactions touching overlapping products always queue up instead of
+  deadlocking (SELECT ... ORDER BY product_id FOR UPDATE on PostgreSQL)
+- stock is changed with one conditional UPDATE that never takes more than
+  is left, so nothing is ever oversold and stock never goes negative
+Setting an absolute stock level (InventoryViewSet updates, InventoryAdmin
+edits and its clear_stock action) still writes the row directly - a
+stock count entered by staff wins over whatever was reserved meanwhile.
+Cancelling an order only changes its status; its stock is not given back.
+
+Cart holds: adding a product to the server-side cart takes the stock out of
+stock_available into a StockHold for CART_HOLD_TIMEOUT seconds. Checkout turns
+the customer's holds into the order; release_expired_holds() (run by
+`python manage.py release_stock_holds`) gives abandoned holds back.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Inventory, StockHold
+from .signals import catalog_products_changed
+
+
+class InsufficientStockError(Exception):
+    """Raised when there is not enough stock left to take"""
+
+    def __init__(self, shortages):
+        # shortages: list of (product name, available, requested)
+        self.shortages = shortages
+        super().__init__('; '.join(
+            f"Insufficient stock for {name}. Available: {available}, Requested: {requested}"
+            for name, available, requested in shortages
+        ))
+
+
+def hold_timeout():
+    """How long a cart hold keeps its stock"""
+    return timedelta(seconds=getattr(settings, 'CART_HOLD_TIMEOUT', 15 * 60))
+
+
+def lock_inventory(product_ids):
+    """
+    Lock the inventory rows of these products in product_id order
+    Must run inside transaction.atomic(). A no-op on databases without
+    SELECT ... FOR UPDATE (SQLite locks the whole database on write instead).
+    """
+    list(
+        Inventory.objects.select_for_update()
+        .filter(product_id__in=product_ids)
+        .order_by('product_id')
+        .values_list('product_id', flat=True)
+    )
+
+
+def adjust_stock(changes):
+    """
+    Apply stock changes to many products with one conditional UPDATE
+
+        UPDATE inventory SET stock_available = stock_available + CASE ... END
+        WHERE (product_id = 1 AND stock_available >= 2) OR product_id IN (...)
+
+    Rows without enough stock for a negative change are not touched, so a
+    short row count means the stock ran out. Runs in its own atomic block
+    (a savepoint when nested) - on a shortfall nothing is changed.
+
+    Args:
+        changes: dict of product_id -> signed quantity
+                 (negative takes stock, positive gives it back)
+
+    Raises:
+        InsufficientStockError: if any product doesn't have enough stock left
+    """
+    changes = {product_id: change for product_id, change in changes.items() if change}
+    if not changes:
+        return
+
+    takes = [Q(product_id=product_id, stock_available__gte=-change)
+             for product_id, change in changes.items() if change < 0]
+    gives = [product_id for product_id, change in changes.items() if change > 0]
+    if gives:
+        takes.append(Q(product_id__in=gives))
+
+    delta = Case(
+        *[When(product_id=product_id, then=Value(change)) for product_id, change in changes.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+    with transaction.atomic():
+        lock_inventory(sorted(changes))
+        updated = Inventory.objects.filter(reduce(or_, takes)).update(
+            stock_available=F('stock_available') + delta
+        )
+
+        if updated != len(changes):
+            # Undo the rows that did have enough before reading the stock back
+            transaction.set_rollback(True)
+
+    if updated != len(changes):
+        # Rare path: find out which products ran short for the error message
+        shortages = [
+            (inventory.product.name, inventory.stock_available, -changes[inventory.product_id])
+            for inventory in Inventory.objects.select_related('product').filter(product_id__in=changes)
+            if inventory.stock_available < -changes[inventory.product_id]
+        ]
+        raise InsufficientStockError(shortages or [('Unknown product', 0, 0)])
+
+    # queryset.update() skips the Inventory post_save signal
+    catalog_products_changed(changes)
+
+
+def reserve_stock(quantities):
+    """
+    Take stock for an order (all or nothing)
+
+    Args:
+        quantities: dict of product_id -> quantity to take
+
+    Raises:
+        InsufficientStockError: if any product doesn't have enough stock left
+    """
+    adjust_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+
+
+def return_stock(quantities):
+    """Give stock back (released cart holds)"""
+    adjust_stock(dict(quantities))
+
+
+# ==================== CART HOLDS ====================
+
+def hold_stock(customer_id, product_id, quantity):
+    """
+    Hold `quantity` of a product for a customer's cart
+
+    Sets the hold to exactly `quantity` (taking or giving back only the
+    difference from the current hold) and restarts its timeout. A quantity of
+    0 releases the hold.
+
+    Raises:
+        InsufficientStockError: if the extra quantity isn't in stock
+    """
+    with transaction.atomic():
+        hold = (
+            StockHold.objects.select_for_update()
+            .filter(customer_id=customer_id, product_id=product_id)
+            .first()
+        )
+        held = hold.quantity if hold else 0
+        adjust_stock({product_id: held - quantity})
+
+        if quantity <= 0:
+            if hold:
+                hold.delete()
+            return None
+
+        expires_at = timezone.now() + hold_timeout()
+        if hold:
+            StockHold.objects.filter(hold_id=hold.hold_id).update(quantity=quantity, expires_at=expires_at)
+            hold.quantity, hold.expires_at = quantity, expires_at
+            return hold
+        return StockHold.objects.create(
+            customer_id=customer_id, product_id=product_id, quantity=quantity, expires_at=expires_at
+        )
+
+
+def held_quantity(customer_id, product_id):
+    """Quantity of a product currently held for a customer (0 if none)"""
+    hold = StockHold.objects.filter(customer_id=customer_id, product_id=product_id).first()
+    return hold.quantity if hold else 0
+
+
+def release_holds(customer_id, product_ids=None):
+    """
+    Give a customer's held stock back (cart item removed or cart cleared)
+
+    Returns:
+        int: Number of holds released
+    """
+    with transaction.atomic():
+        holds = StockHold.objects.select_for_update().filter(customer_id=customer_id)
+        if product_ids is not None:
+            holds = holds.filter(product_id__in=product_ids)
+        holds = list(holds.order_by('product_id'))
+        _give_back(holds)
+    return len(holds)
+
+
+def release_hold_ids(hold_ids):
+    """Give the stock of specific holds back (admin action)"""
+    with transaction.atomic():
+        holds = list(StockHold.objects.select_for_update().filter(hold_id__in=hold_ids).order_by('hold_id'))
+        _give_back(holds)
+    return len(holds)
+
+
+def checkout_stock(customer_id, quantities):
+    """
+    Take the stock for an order, using the customer's cart holds first
+
+    Held stock is already out of stock_available, so only the part of each
+    line not covered by a hold is taken; anything held beyond the order (or
+    for products not ordered) is given back, since checkout empties the cart.
+    All of it is a single stock UPDATE.
+
+    Args:
+        customer_id: Customer placing the order (None for a new customer)
+        quantities: dict of product_id -> ordered quantity
+
+    Raises:
+        InsufficientStockError: if the stock not covered by holds ran out
+    """
+    with transaction.atomic():
+        holds = []
+        if customer_id:
+            holds = list(
+                StockHold.objects.select_for_update()
+                .filter(customer_id=customer_id)
+                .order_by('product_id')
+            )
+
+        changes = {product_id: -quantity for product_id, quantity in quantities.items()}
+        for hold in holds:
+            changes[hold.product_id] = changes.get(hold.product_id, 0) + hold.quantity
+
+        adjust_stock(changes)
+        if holds:
+            StockHold.objects.filter(hold_id__in=[hold.hold_id for hold in holds]).delete()
+
+
+def release_expired_holds(batch_size=500):
+    """
+    Give the stock of expired holds back, one batch at a time
+
+    Holds being converted by a checkout right now are locked and skipped
+    (SKIP LOCKED), so a hold is never both ordered and released.
+
+    Returns:
+        int: Number of holds released in this batch
+    """
+    with transaction.atomic():
+        holds = list(
+            StockHold.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=timezone.now())
+            .order_by('hold_id')[:batch_size]
+        )
+        _give_back(holds)
+    return len(holds)
+
+
+def _give_back(holds):
+    """Return the stock of these (locked) holds and delete them"""
+    if not holds:
+        return
+    quantities = OrderedDict()
+    for hold in holds:
+        quantities[hold.product_id] = quantities.get(hold.product_id, 0) + hold.quantity
+    return_stock(quantities)
+    StockHold.objects.filter(hold_id__in=[hold.hold_id for hold in holds]).delete()
@@ -0,0 +1,364 @@
+"""
+Synthetic Load Data for Farm2Home
+Generates production-like volumes of customers, addresses, carts, orders and
+order items to benchmark against (python manage.py generate_load_data):
+- product popularity follows a Zipf distribution: a few best sellers and a
+  long tail; seasonal products sell mostly in their own season
+- order volume follows the calendar: busier summers, weekends and daytime
+  hours, and a business that grows over the history
+- customer activity is skewed as well - most orders come from regulars
+- statuses follow order age: recent orders are still pending or on the way,
+  older ones delivered, a few cancelled
+Rows are inserted with bulk_create in large batches. Orders can be generated
+by several processes in parallel, each for its own share of the customers.
+Generated customers have an @LOAD_EMAIL_DOMAIN email and the password
+LOAD_PASSWORD (so load tests can log in); delete_load_data() removes them and
+everything they own. The customer stats rollup is rebuilt for them at the end.
+"""
+
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .customer_stats import rebuild_customer_stats
+from .models import Address, Cart, Customer, Order, OrderItem, Product
+
+
+LOAD_EMAIL_DOMAIN = 'load.farm2home.test'
+LOAD_PASSWORD = 'farm2home-load'
+
+SUMMER_MONTHS = range(4, 10)  # April - September
+OFF_SEASON_WEIGHT = 0.15      # Seasonal products out of season sell ~7x less
+SUMMER_VOLUME = 1.3           # Orders per day in summer vs winter
+WEEKEND_VOLUME = 1.25         # Orders per day on Saturday / Sunday
+STARTING_VOLUME = 0.5         # Orders per day at the start of the history vs today
+
+# Share of orders placed in each hour of the day
+HOUR_WEIGHTS = (1, 1, 1, 1, 1, 2, 4, 6, 8, 10, 11, 12, 12, 11, 10, 10, 11, 12, 13, 12, 10, 7, 4, 2)
+
+ITEM_COUNT_DECAY = 0.7                   # P(order has n distinct products) ~ 0.7^n
+QUANTITY_WEIGHTS = (50, 25, 12, 8, 5)    # Quantity 1 - 5 of each product
+ADDRESS_COUNT_WEIGHTS = (15, 55, 22, 8)  # Customers with 0 - 3 saved addresses
+MAX_CART_ITEMS = 6
+CUSTOMER_SKEW = 0.7                      # Zipf exponent of customer activity
+CANCELLED_SHARE = 0.05
+CARD_SHARE = 0.4
+
+FIRST_NAMES = (
+    'Ayesha', 'Fatima', 'Hira', 'Sana', 'Zainab', 'Maryam', 'Iqra', 'Amna', 'Mahnoor', 'Khadija',
+    'Ali', 'Ahmed', 'Hassan', 'Usman', 'Bilal', 'Hamza', 'Omar', 'Saad', 'Imran', 'Faisal',
+)
+LAST_NAMES = (
+    'Khan', 'Ahmed', 'Malik', 'Hussain', 'Sheikh', 'Qureshi', 'Butt', 'Chaudhry', 'Raza', 'Siddiqui',
+    'Iqbal', 'Mirza', 'Baig', 'Abbasi', 'Javed',
+)
+CITIES = (
+    ('Lahore', '54000'), ('Karachi', '74000'), ('Islamabad', '44000'), ('Rawalpindi', '46000'),
+    ('Faisalabad', '38000'), ('Multan', '60000'), ('Peshawar', '25000'), ('Quetta', '87300'),
+)
+STREETS = ('Main Boulevard', 'Canal Road', 'Mall Road', 'Jinnah Avenue', 'University Road', 'GT Road')
+
+
+def zipf_weights(count, exponent):
+    """Weight of rank 1..count under a Zipf distribution"""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def season_of(day):
+    return 'SUMMER' if day.month in SUMMER_MONTHS else 'WINTER'
+
+
+def load_customers():
+    """Customers created by the generator"""
+    return Customer.objects.filter(email__endswith=f'@{LOAD_EMAIL_DOMAIN}')
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the generated values of auto_now / auto_now_add fields"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class LoadSampler:
+    """Draws products, dates, statuses and quantities with the distributions above"""
+
+    def __init__(self, products, days, zipf, max_items, now, rng):
+        """
+        Args:
+            products: list of (product_id, price, season), most popular first
+            days: Days of order history, ending now
+            zipf: Zipf exponent of product popularity
+            max_items: Most distinct products in one order
+        """
+        self.rng = rng
+        self.now = now
+        self.products = products
+
+        popularity = zipf_weights(len(products), zipf)
+        self.product_weights = {
+            season: list(accumulate(
+                weight * (1 if product_season in (season, 'ALL_YEAR') else OFF_SEASON_WEIGHT)
+                for weight, (_, _, product_season) in zip(popularity, products)
+            ))
+            for season in ('SUMMER', 'WINTER')
+        }
+
+        today = timezone.localdate(now)
+        self.days = [today - timedelta(days=days_ago) for days_ago in range(days - 1, -1, -1)]
+        self.day_weights = list(accumulate(
+            (SUMMER_VOLUME if season_of(day) == 'SUMMER' else 1)
+            * (WEEKEND_VOLUME if day.weekday() >= 5 else 1)
+            * (STARTING_VOLUME + (1 - STARTING_VOLUME) * position / max(days - 1, 1))
+            for position, day in enumerate(self.days)
+        ))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+        self.item_counts = range(1, max_items + 1)
+        self.item_count_weights = list(accumulate(ITEM_COUNT_DECAY ** n for n in self.item_counts))
+        self.quantities = range(1, len(QUANTITY_WEIGHTS) + 1)
+        self.quantity_weights = list(accumulate(QUANTITY_WEIGHTS))
+
+    def products_for(self, day, count):
+        """`count` distinct products, drawn by popularity in the season of `day`"""
+        weights = self.product_weights[season_of(day)]
+        count = min(count, len(self.products))
+        chosen = {}
+        while len(chosen) < count:
+            product = self.rng.choices(self.products, cum_weights=weights)[0]
+            chosen[product[0]] = product
+        return list(chosen.values())
+
+    def order_date(self):
+        day = self.rng.choices(self.days, cum_weights=self.day_weights)[0]
+        hour = self.rng.choices(range(24), cum_weights=self.hour_weights)[0]
+        moment = timezone.make_aware(datetime.combine(day, time(hour))) + timedelta(seconds=self.rng.randrange(3600))
+        return min(moment, self.now)
+
+    def item_count(self):
+        return self.rng.choices(self.item_counts, cum_weights=self.item_count_weights)[0]
+
+    def quantity(self):
+        return self.rng.choices(self.quantities, cum_weights=self.quantity_weights)[0]
+
+    def status(self, order_date):
+        if self.rng.random() < CANCELLED_SHARE:
+            return 'CANCELLED'
+        age = self.now - order_date
+        if age < timedelta(days=1):
+            return self.rng.choice(('PENDING', 'CONFIRMED'))
+        if age < timedelta(days=3):
+            return self.rng.choice(('CONFIRMED', 'SHIPPED'))
+        return 'DELIVERED'
+
+    def payment(self):
+        if self.rng.random() < CARD_SHARE:
+            return f"Card ending in {self.rng.randrange(10000):04d}"
+        return "Cash on Delivery"
+
+
+# ==================== GENERATION ====================
+
+def create_customers(count, batch_size, rng):
+    """
+    Insert `count` customers (numbered after any earlier load customers)
+
+    Returns:
+        list: Their customer ids
+    """
+    # Hashing is deliberately slow, so every customer shares one hash
+    password = make_password(LOAD_PASSWORD)
+    first = load_customers().count()
+    customer_ids = []
+    for start in range(first, first + count, batch_size):
+        customers = []
+        for number in range(start, min(start + batch_size, first + count)):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            customers.append(Customer(
+                name=f"{first_name} {last_name}",
+                email=f"{first_name.lower()}.{last_name.lower()}.{number}@{LOAD_EMAIL_DOMAIN}",
+                phone=f"03{rng.randrange(10 ** 9):09d}",
+                password=password,
+            ))
+        with transaction.atomic():
+            customer_ids.extend(customer.customer_id for customer in Customer.objects.bulk_create(customers))
+    return customer_ids
+
+
+def create_customer_activity(customer_ids, order_count, options, seed):
+    """
+    Addresses, carts and `order_count` orders (with items) for these customers
+
+    Args:
+        customer_ids: The customers (shuffled, so activity isn't tied to id)
+        options: dict with products, days, zipf, max_items, cart_share,
+            batch_size and now (see generate_load_data())
+        seed: Random seed for this share
+
+    Returns:
+        Counter: Rows created per table
+    """
+    rng = random.Random(seed)
+    sampler = LoadSampler(options['products'], options['days'], options['zipf'], options['max_items'],
+                          options['now'], rng)
+    batch_size = options['batch_size']
+    created = Counter()
+
+    customer_ids = list(customer_ids)
+    rng.shuffle(customer_ids)
+
+    with explicit_timestamps(Order._meta.get_field('order_date'),
+                             Address._meta.get_field('created_at'), Address._meta.get_field('updated_at')):
+        # Saved addresses (the first one is the default) and open carts
+        addresses, carts = [], []
+        for customer_id in customer_ids:
+            address_count = rng.choices(range(len(ADDRESS_COUNT_WEIGHTS)), weights=ADDRESS_COUNT_WEIGHTS)[0]
+            for position in range(address_count):
+                city, postal_code = rng.choice(CITIES)
+                created_at = sampler.order_date()
+                addresses.append(Address(
+                    customer_id=customer_id, label=('HOME', 'WORK', 'OTHER')[position],
+                    address_line=f"House {rng.randint(1, 999)}, {rng.choice(STREETS)}",
+                    city=city, postal_code=postal_code, phone=f"03{rng.randrange(10 ** 9):09d}",
+                    is_default=position == 0, created_at=created_at, updated_at=created_at,
+                ))
+            if rng.random() < options['cart_share']:
+                for product_id, _, _ in sampler.products_for(timezone.localdate(sampler.now),
+                                                             rng.randint(1, MAX_CART_ITEMS)):
+                    carts.append(Cart(customer_id=customer_id, product_id=product_id, quantity=sampler.quantity()))
+        created['addresses'] += len(Address.objects.bulk_create(addresses, batch_size=batch_size))
+        created['carts'] += len(Cart.objects.bulk_create(carts, batch_size=batch_size))
+        del addresses, carts
+
+        # Orders, placed mostly by the most active customers
+        activity = list(accumulate(zipf_weights(len(customer_ids), CUSTOMER_SKEW)))
+        for start in range(0, order_count, batch_size):
+            orders, lines = [], []
+            for _ in range(min(batch_size, order_count - start)):
+                order_date = sampler.order_date()
+                products = sampler.products_for(timezone.localdate(order_date), sampler.item_count())
+                quantities = [sampler.quantity() for _ in products]
+                orders.append(Order(
+                    customer_id=rng.choices(customer_ids, cum_weights=activity)[0],
+                    order_date=order_date,
+                    status=sampler.status(order_date),
+                    payment=sampler.payment(),
+                    total_amount=sum(price * quantity for (_, price, _), quantity in zip(products, quantities)),
+                ))
+                lines.append(list(zip(products, quantities)))
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                items = OrderItem.objects.bulk_create([
+                    OrderItem(order_id=order.order_id, product_id=product_id, quantity=quantity, price=price)
+                    for order, order_lines in zip(orders, lines)
+                    for (product_id, price, _), quantity in order_lines
+                ], batch_size=batch_size)
+            created['orders'] += len(orders)
+            created['order items'] += len(items)
+    return created
+
+
+def _activity_job(job):
+    """Worker process entry point: one share of the customers"""
+    try:
+        return create_customer_activity(*job)
+    finally:
+        connections.close_all()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def generate_load_data(customers, orders, days=365, max_items=8, zipf=1.1, cart_share=0.2,
+                       batch_size=5000, workers=1, seed=42):
+    """
+    Generate load data (see module docstring)
+
+    Args:
+        customers: Customers to create
+        orders: Orders to create between them
+        days: Days of order history, ending now
+        max_items: Most distinct products in one order
+        zipf: Zipf exponent of product popularity (higher = more concentrated)
+        cart_share: Share of customers with an open cart
+        batch_size: Rows per bulk_create
+        workers: Processes creating addresses, carts and orders in parallel
+        seed: Random seed - the same seed gives the same data
+
+    Returns:
+        Counter: Rows created per table
+
+    Raises:
+        ValueError: if there are no active products to order
+    """
+    rng = random.Random(seed)
+    products = list(Product.objects.filter(is_active=True).order_by('product_id').values_list(
+        'product_id', 'price', 'season'
+    ))
+    if not products:
+        raise ValueError("There are no active products - run populate_products first")
+    # Popularity rank: the first product is the best seller
+    rng.shuffle(products)
+
+    customer_ids = create_customers(customers, batch_size, rng)
+    options = {
+        'products': products, 'days': days, 'zipf': zipf, 'max_items': max_items,
+        'cart_share': cart_share, 'batch_size': batch_size, 'now': timezone.now(),
+    }
+    shares = max(1, min(workers, len(customer_ids)))
+    jobs = [
+        (customer_ids[share::shares], orders // shares + (share < orders % shares), options, seed + share + 1)
+        for share in range(shares)
+    ]
+    if shares == 1:
+        results = [create_customer_activity(*job) for job in jobs]
+    else:
+        # Worker processes must not share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=shares, initializer=_init_worker) as pool:
+            results = list(pool.map(_activity_job, jobs))
+
+    created = Counter(customers=len(customer_ids))
+    for result in results:
+        created.update(result)
+
+    # bulk_create bypasses the customer stats hooks
+    rebuild_customer_stats(load_customers().values('customer_id'), batch_size)
+    return created
+
+
+def delete_load_data(batch_size=5000):
+    """
+    Delete every load customer with their orders, addresses, carts and stats
+
+    Returns:
+        int: Customers deleted
+    """
+    deleted = 0
+    while True:
+        customer_ids = list(load_customers().values_list('customer_id', flat=True)[:batch_size])
+        if not customer_ids:
+            return deleted
+        with transaction.atomic():
+            OrderItem.objects.filter(order__customer_id__in=customer_ids).delete()
+            # Raw delete: Order.delete() would send a post_delete signal per order
+            # (their rollup rows go with the customers below)
+            orders = Order.objects.filter(customer_id__in=customer_ids)
+            orders._raw_delete(orders.db)
+            Customer.objects.filter(customer_id__in=customer_ids).delete()
+        deleted += len(customer_ids)
@@ -0,0 +1,207 @@
+"""
+Django management command to compare database connection modes
+Sends --requests requests to an endpoint through Django's WSGI handler - so
+request_started / request_finished open and close connections exactly as
+under gunicorn (the test client skips that) - in each mode:
+- per-request: CONN_MAX_AGE = 0, a new connection for every request
+- persistent: CONN_MAX_AGE = DB_CONN_MAX_AGE (60 if that is 0), health checks on
+- pool: a psycopg 3 pool of --pool-size connections (PostgreSQL with
+  psycopg[pool] installed only)
+and reports latency and connections opened (log lines go to os.devnull).
+With --restart (PostgreSQL) the persistent connection is then terminated from
+the server side, as a database restart would, and the next request must
+reconnect and succeed.
+Run: python manage.py benchmark_db_connections --requests 500 [--restart]
+"""
+
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.benchmarks import ENDPOINTS, benchmark_context, percentile
+from main.structured_logging import redirect_logs
+
+MODES = ['per-request', 'persistent', 'pool']
+
+# Endpoints that leave the database unchanged (requests here are committed)
+READ_ENDPOINTS = [endpoint.name for endpoint in ENDPOINTS if endpoint.name != 'create_checkout_order']
+
+
+class HandlerClient:
+    """The part of the test client the benchmark endpoints use, served by a real WSGIHandler"""
+
+    def __init__(self):
+        self.handler = WSGIHandler()
+        self.factory = RequestFactory()
+
+    def send(self, request):
+        response = self.handler(request.environ, lambda status, headers: None)
+        try:
+            for _ in response:
+                pass
+        finally:
+            # Sends request_finished, which closes (or keeps) the connection
+            response.close()
+        return response
+
+    def get(self, path, data=None, **extra):
+        return self.send(self.factory.get(path, data, **extra))
+
+    def post(self, path, data=None, content_type='application/json', **extra):
+        return self.send(self.factory.post(path, data, content_type=content_type, **extra))
+
+
+def pool_available():
+    """PostgreSQL through psycopg 3 with psycopg_pool installed"""
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    if not is_psycopg3:
+        return False
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request, persistent and pooled database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300,
+                            help='Timed requests per mode')
+        parser.add_argument('--endpoint', default='customer_profile_api', choices=READ_ENDPOINTS,
+                            help='Endpoint to request')
+        parser.add_argument('--pool-size', type=int, default=None,
+                            help='Connections in the pool (default: DB_POOL_SIZE, or 4)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Check that a persistent connection recovers from a server-side disconnect')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+        if settings.DATABASES['default'].get('OPTIONS', {}).get('pool'):
+            raise CommandError("Run without DB_POOL_SIZE - the command switches between the modes itself")
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"🔌 DATABASE CONNECTION MODES ({connection.vendor})"))
+        self.stdout.write("=" * 70)
+
+        modes = MODES if pool_available() else MODES[:2]
+        if len(modes) < len(MODES):
+            self.stdout.write("   pool: skipped (needs PostgreSQL with psycopg[pool])")
+
+        endpoint = next(endpoint for endpoint in ENDPOINTS if endpoint.name == options['endpoint'])
+        client = HandlerClient()
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        results = {}
+        setup_test_environment()
+        connection_created.connect(count_connection)
+        try:
+            context = benchmark_context()
+            with open(os.devnull, 'w') as devnull, redirect_logs(devnull):
+                for mode in modes:
+                    with self.connection_mode(mode, options):
+                        opened.clear()
+                        results[mode] = self.time_requests(client, endpoint, context, options['requests'])
+                        if mode == 'pool':
+                            results[mode]['connections'] = connection.pool.get_stats().get('connections_num', 0)
+                        else:
+                            results[mode]['connections'] = len(opened)
+                        if mode == 'persistent' and options['restart']:
+                            self.check_restart(client, endpoint, context, opened)
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            connection_created.disconnect(count_connection)
+            teardown_test_environment()
+
+        self.stdout.write(f"   {'mode':<12} | {'p50 ms':>8} | {'p95 ms':>8} | {'connections':>11}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"   {mode:<12} | {result['p50_ms']:>8.3f} | {result['p95_ms']:>8.3f} | {result['connections']:>11}"
+            )
+        self.stdout.write("=" * 70)
+
+        setup_ms = results['per-request']['p50_ms'] - results['persistent']['p50_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Connection setup costs {setup_ms:.3f} ms per request "
+            f"({setup_ms / results['per-request']['p50_ms'] * 100:.1f}% of the per-request median)"
+        ))
+
+    @contextmanager
+    def connection_mode(self, mode, options):
+        """Switch the default connection to `mode` for the block"""
+        settings_dict = connection.settings_dict
+        saved = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+        connection.close()
+        settings_dict['CONN_HEALTH_CHECKS'] = True
+        settings_dict['CONN_MAX_AGE'] = 0
+        if mode == 'persistent':
+            settings_dict['CONN_MAX_AGE'] = settings.DB_CONN_MAX_AGE or 60
+        elif mode == 'pool':
+            size = options['pool_size'] or settings.DB_POOL_SIZE or 4
+            settings_dict['OPTIONS'] = {**saved['OPTIONS'], 'pool': {
+                'min_size': size, 'max_size': size, 'timeout': settings.DB_POOL_TIMEOUT,
+            }}
+        try:
+            yield
+        finally:
+            connection.close()
+            if mode == 'pool':
+                connection.close_pool()
+            settings_dict.update(saved)
+
+    def time_requests(self, client, endpoint, context, requests):
+        def call():
+            response = endpoint.request(client, context)
+            if response.status_code >= 400:
+                raise CommandError(f"{endpoint.name} returned {response.status_code}")
+
+        for _ in range(min(requests, 10)):
+            call()
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {'p50_ms': statistics.median(timings), 'p95_ms': percentile(timings, 0.95)}
+
+    def check_restart(self, client, endpoint, context, opened):
+        """Terminate the persistent connection server-side; the next request must reconnect"""
+        if connection.vendor != 'postgresql':
+            self.stdout.write("   restart check: skipped (PostgreSQL only)")
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            backend_pid = cursor.fetchone()[0]
+        killer = connections.create_connection('default')
+        try:
+            with killer.cursor() as cursor:
+                cursor.execute('SELECT pg_terminate_backend(%s)', [backend_pid])
+        finally:
+            killer.close()
+
+        before = len(opened)
+        response = endpoint.request(client, context)
+        if response.status_code >= 400 or len(opened) != before + 1:
+            raise CommandError(
+                f"After a server-side disconnect {endpoint.name} returned {response.status_code} "
+                f"and opened {len(opened) - before} connection(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("   restart check: the next request reconnected and succeeded"))
@@ -0,0 +1,116 @@
+"""
+Django management command to benchmark per-message email rendering cost
+Compares the old path (render_to_string() + strip_tags() for the plain text
+part) with the precompiled HTML + text template pairs in
+main/email_rendering.py, one at a time and as a batch
+Run: python manage.py benchmark_email_rendering --messages 500 --items 12
+"""
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from main.email_rendering import get_email_templates, render_email, render_emails
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Benchmark render_to_string + strip_tags against precompiled email templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500,
+                            help='Emails rendered per run')
+        parser.add_argument('--items', type=int, default=12,
+                            help='Line items in each order confirmation')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per strategy (best run is reported)')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        repeat = options['repeat']
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("✉️  EMAIL RENDERING BENCHMARK"))
+        self.stdout.write("=" * 70)
+
+        emails = [
+            ('order_confirmation', self.confirmation_contexts(count, options['items'])),
+            ('welcome', [{'customer_name': f'Customer {i}'} for i in range(count)]),
+            ('password_reset', [
+                {'customer_name': f'Customer {i}', 'reset_link': f'http://localhost:8000/auth/reset-password/{i:032x}/'}
+                for i in range(count)
+            ]),
+        ]
+
+        for name, contexts in emails:
+            get_email_templates(name)  # compile outside the timed runs
+
+            def before():
+                for context in contexts:
+                    html_message = render_to_string(f'emails/{name}.html', context)
+                    strip_tags(html_message)
+
+            def single():
+                for context in contexts:
+                    render_email(name, context)
+
+            def batch():
+                render_emails(name, contexts)
+
+            self.stdout.write(f"\n📨 {name} ({len(contexts):,} emails, per message):")
+            baseline = self.best_of(before, repeat) / len(contexts)
+            self.stdout.write(f"   {'render_to_string + strip_tags':32} {baseline * 1e6:9.1f} µs")
+            for label, fn in (('Precompiled, one at a time', single), ('Precompiled, batch', batch)):
+                elapsed = self.best_of(fn, repeat) / len(contexts)
+                self.stdout.write(
+                    f"   {label:32} {elapsed * 1e6:9.1f} µs | "
+                    + self.style.SUCCESS(f"{baseline / elapsed:5.1f}x faster")
+                )
+
+        self.stdout.write("\n" + "=" * 70)
+
+    def confirmation_contexts(self, count, item_count):
+        """Order confirmation contexts like _order_confirmation_context() builds"""
+        products = list(Product.objects.order_by('product_id')[:item_count])
+        if not products:
+            products = [Product(name=f'Product {i}', price=Decimal('150.00')) for i in range(item_count)]
+
+        items = []
+        for i in range(item_count):
+            product = products[i % len(products)]
+            quantity = i % 3 + 1
+            items.append({
+                'product': product,
+                'quantity': quantity,
+                'price': f"{product.price:,.2f}",
+                'subtotal': f"{(quantity * product.price):,.2f}",
+            })
+
+        return [
+            {
+                'customer_name': f'Customer {i}',
+                'order_id': 1000 + i,
+                'order_date': 'January 05, 2026 at 10:30 AM',
+                'total_amount': '4,250.00',
+                'payment_method': 'Card' if i % 2 else 'Cash on Delivery',
+                'items': items,
+                'shipping_name': f'Customer {i}',
+                'shipping_phone': '03001234567',
+                'shipping_address': f'House {i}, Street 5, Gulberg',
+                'shipping_city': 'Lahore',
+                'shipping_zip': '54000',
+            }
+            for i in range(count)
+        ]
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
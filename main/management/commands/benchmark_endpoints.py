@@ -0,0 +1,86 @@
+"""
+Django management command to benchmark the hot API endpoints
+Runs the endpoint suite in main/benchmarks.py (catalog, checkout cart,
+checkout, order history, profile, login) against the generate_load_data
+dataset and prints p50/p95/p99 latency, queries and peak allocation per
+endpoint. --output stores the results as JSON; --baseline compares against a
+stored run and fails on regressions.
+Run: python manage.py generate_load_data --customers 10000 --orders 100000
+     python manage.py benchmark_endpoints --output benchmarks/baseline.json
+     python manage.py benchmark_endpoints --baseline benchmarks/baseline.json
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.benchmarks import ENDPOINT_NAMES, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latency, queries and allocations of the hot API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Untimed requests per endpoint first')
+        parser.add_argument('--endpoint', nargs='*', choices=ENDPOINT_NAMES, dest='endpoints',
+                            help='Only these endpoints (default: all)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 / allocation growth over the baseline (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"⏱️  ENDPOINT BENCHMARKS ({connection.vendor})"))
+        self.stdout.write("=" * 70)
+
+        # Test client requests need the test environment (testserver host, locmem email)
+        setup_test_environment()
+        try:
+            results = run_benchmarks(options['requests'], options['warmup'], options['endpoints'])
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"   {'endpoint':<28} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'queries':>7} | {'alloc KB':>8}"
+        )
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f"   {name:<28} | {result['p50_ms']:>8.2f} | {result['p95_ms']:>8.2f} | "
+                f"{result['p99_ms']:>8.2f} | {result['queries']:>7} | {result['alloc_kb']:>8.0f}"
+            )
+        self.stdout.write("=" * 70)
+
+        if options['output']:
+            directory = os.path.dirname(options['output'])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"💾 Results written to {options['output']}")
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read baseline {options['baseline']}: {e}")
+            regressions = compare_results(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"   {regression}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"✅ No regressions against {options['baseline']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ Benchmarks complete"))
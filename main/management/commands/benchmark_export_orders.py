@@ -0,0 +1,162 @@
+"""
+Django management command to benchmark the bulk order export
+Creates a synthetic dataset of --items order items (--items-per-order each,
+spread over --days days), then exports it with main/exports.py:
+  - single process, one file
+  - partitioned by day across --workers processes
+for each --formats, and reports time, rows/s and output size. Every export
+must contain exactly --items rows.
+The dataset has to be committed (worker processes use their own database
+connections), so it is tagged and deleted again at the end.
+Run: python manage.py benchmark_export_orders --items 5000000 --workers 4
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.exports import export_filename, export_partitions, export_range
+from main.models import Customer, Product, Order, OrderItem
+
+# Synthetic customers / products the orders are spread over
+CUSTOMERS = 1000
+PRODUCTS = 50
+
+# Orders created per bulk_create round
+BATCH_ORDERS = 5000
+
+TAG = 'export-benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark single-process and parallel partitioned order exports on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000000,
+                            help='Order items (export rows) to create')
+        parser.add_argument('--items-per-order', type=int, default=4,
+                            help='Items per order')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Days the orders are spread over (= day partitions)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Processes for the partitioned export')
+        parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'],
+                            choices=['csv', 'jsonl', 'parquet'],
+                            help='Formats to benchmark')
+
+    def handle(self, *args, **options):
+        items = options['items']
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"📦 ORDER EXPORT BENCHMARK ({connection.vendor}, {items:,} items)"
+        ))
+        self.stdout.write("=" * 70)
+
+        if Customer.objects.filter(email__startswith=f'{TAG}-').exists():
+            self.cleanup()
+        directory = tempfile.mkdtemp(prefix='farm2home-export-')
+        try:
+            start = time.perf_counter()
+            first, last = self.make_fixtures(items, options['items_per_order'], options['days'])
+            self.stdout.write(f"🌱 Created {items:,} order items in {time.perf_counter() - start:.1f} s")
+            end = last + timedelta(microseconds=1)
+
+            results = []
+            for fmt in options['formats']:
+                try:
+                    results.append((f"{fmt}, 1 process", self.measure(
+                        lambda: self.export_single(directory, fmt, first, end)
+                    )))
+                    results.append((f"{fmt}, {options['workers']} workers by day", self.measure(
+                        lambda: export_partitions(
+                            os.path.join(directory, 'days'), fmt, first, end, 'day', options['workers'])
+                    )))
+                except ImportError as e:
+                    raise CommandError(str(e))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            self.cleanup()
+
+        self.stdout.write(f"   {'export':<26} | {'seconds':>8} | {'rows/s':>10} | {'MB':>8} | {'files':>5}")
+        for name, (elapsed, rows, size, files) in results:
+            self.stdout.write(
+                f"   {name:<26} | {elapsed:>8.2f} | {rows / elapsed:>10,.0f} | {size / 2**20:>8.1f} | {files:>5}"
+            )
+            if rows != items:
+                raise CommandError(f"{name}: exported {rows:,} rows, expected {items:,}")
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"✅ Every export contains all {items:,} order items"))
+
+    def export_single(self, directory, fmt, start, end):
+        path = os.path.join(directory, export_filename('all', fmt))
+        return [(path, export_range(path, fmt, start, end))]
+
+    def measure(self, fn):
+        """(seconds, rows, bytes, files) of one export; its files are removed afterwards"""
+        start = time.perf_counter()
+        results = fn()
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(path) for path, _ in results)
+        for path, _ in results:
+            os.remove(path)
+        return elapsed, sum(rows for _, rows in results), size, len(results)
+
+    def make_fixtures(self, items, items_per_order, days):
+        """Committed orders for `items` order items; returns the (first, last) order date"""
+        with transaction.atomic():
+            customers = Customer.objects.bulk_create([
+                Customer(name=f'Export Benchmark {i}', email=f'{TAG}-{i}@example.com', phone='03000000000')
+                for i in range(CUSTOMERS)
+            ])
+            products = Product.objects.bulk_create([
+                Product(name=f'Export Benchmark Product {i}', local_name='Export', category='vegetables',
+                        season='ALL_YEAR', price=Decimal('120.00') + i, slug=f'{TAG}-product-{i}')
+                for i in range(PRODUCTS)
+            ])
+
+        # Dated well in the past, so the export range only contains benchmark orders
+        last = timezone.make_aware(datetime(2001, 12, 31, 12))
+        created = 0
+        while created < items:
+            with transaction.atomic():
+                count = min(BATCH_ORDERS, -(-(items - created) // items_per_order))
+                orders = Order.objects.bulk_create([
+                    Order(customer=customers[i % CUSTOMERS], status='DELIVERED', payment='Cash on Delivery',
+                          total_amount=Decimal('0.00'))
+                    for i in range(created, created + count)
+                ])
+                order_items = []
+                for order in orders:
+                    for _ in range(min(items_per_order, items - created)):
+                        product = products[created % PRODUCTS]
+                        order_items.append(OrderItem(order=order, product=product, quantity=created % 5 + 1,
+                                                     price=product.price))
+                        created += 1
+                OrderItem.objects.bulk_create(order_items, batch_size=2000)
+
+                # order_date is auto_now_add, so backdate the orders one day at a time
+                order_ids = [order.order_id for order in orders]
+                for days_ago in range(days):
+                    Order.objects.filter(order_id__in=order_ids[days_ago::days]).update(
+                        order_date=last - timedelta(days=days_ago)
+                    )
+        return last - timedelta(days=days - 1), last
+
+    def cleanup(self):
+        """Delete the benchmark data (bulk_create bypassed the customer stats hooks, so no rollup rows exist)"""
+        customer_ids = list(Customer.objects.filter(email__startswith=f'{TAG}-').values_list('customer_id', flat=True))
+        with transaction.atomic():
+            OrderItem.objects.filter(order__customer_id__in=customer_ids).delete()
+            # Raw delete: Order.delete() would send a post_delete signal per order
+            orders = Order.objects.filter(customer_id__in=customer_ids)
+            orders._raw_delete(orders.db)
+            Customer.objects.filter(customer_id__in=customer_ids).delete()
+            Product.objects.filter(slug__startswith=f'{TAG}-product-').delete()
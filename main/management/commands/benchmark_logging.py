@@ -0,0 +1,165 @@
+"""
+Django management command to benchmark request logging at a target rate
+Simulates --rate checkout requests per second, spread over --threads threads,
+for --seconds, and logs what one checkout logs:
+- print: the 13 print() lines the checkout view and email helper used to
+  write to stdout
+- pipeline: the structured events (checkout_received, email_queued,
+  order_created, request) through QueueLogHandler (main/structured_logging.py)
+Both write line-buffered to the same kind of file, like a terminal or pipe.
+Reports the rate reached and the time each request spent logging (p50 / p99 /
+max); the pipeline must keep the rate without dropping records.
+Run: python manage.py benchmark_logging --rate 2000 --seconds 5
+"""
+
+import logging
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmarks import percentile
+from main.structured_logging import QueueLogHandler, new_request_id, request_id_var
+
+
+def _print_request(i):
+    """The print() calls of one checkout before the structured logging"""
+    print("=" * 60)
+    print("🛒 CREATING ORDER - Request received")
+    print("=" * 60)
+    print(f"📦 Items: {3}")
+    print(f"👤 Customer ID: {i}")
+    print(f"📧 Email: customer{i}@example.com")
+    print(f"💳 Payment: {'4242'}...")
+    print("=" * 60)
+    print(f"📬 Order confirmation email queued for customer{i}@example.com (Order #{i})")
+    print(f"✅ Order #{i} created successfully!")
+    print(f"📦 Total: Rs. {i * 10}.00")
+    print(f"🛒 Cart cleared for customer #{i}")
+    print("=" * 60)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark print() against the structured logging pipeline at a target request rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=int, default=2000,
+                            help='Simulated requests per second')
+        parser.add_argument('--seconds', type=float, default=5,
+                            help='Duration of each run')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Request threads (like gunicorn gthread workers)')
+        parser.add_argument('--mode', nargs='*', choices=['print', 'pipeline'], default=['print', 'pipeline'],
+                            help='What to run')
+
+    def handle(self, *args, **options):
+        if options['rate'] < 1 or options['threads'] < 1:
+            raise CommandError("--rate and --threads must be at least 1")
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"📝 LOGGING THROUGHPUT ({options['rate']} req/s, {options['threads']} threads)"
+        ))
+        self.stdout.write("=" * 70)
+
+        logger = logging.getLogger('main.benchmark_logging')
+        results = {}
+        for mode in options['mode']:
+            with tempfile.TemporaryFile('w', buffering=1, encoding='utf-8') as output:
+                if mode == 'print':
+                    with redirect_stdout(output):
+                        results[mode] = self.run(_print_request, options)
+                    results[mode]['dropped'] = 0
+                    continue
+
+                handler = QueueLogHandler(
+                    output, queue_size=settings.LOG_QUEUE_SIZE, debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE,
+                )
+                logger.handlers = [handler]
+                logger.setLevel(logging.DEBUG)
+                logger.propagate = False
+                try:
+                    results[mode] = self.run(lambda i: self.log_request(logger, i), options)
+                    start = time.perf_counter()
+                    handler.flush()
+                    results[mode]['drain_ms'] = (time.perf_counter() - start) * 1000
+                    results[mode]['dropped'] = handler.dropped_total
+                finally:
+                    logger.handlers = []
+                    handler.close()
+
+        self.stdout.write(
+            f"   {'mode':<9} | {'req/s':>7} | {'p50 us':>8} | {'p99 us':>8} | {'max us':>8} | {'dropped':>7}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"   {mode:<9} | {result['rate']:>7.0f} | {result['p50_us']:>8.1f} | "
+                f"{result['p99_us']:>8.1f} | {result['max_us']:>8.1f} | {result['dropped']:>7}"
+            )
+        if 'pipeline' in results:
+            self.stdout.write(f"   Writer thread drained its queue {results['pipeline']['drain_ms']:.1f} ms after the run")
+        self.stdout.write("=" * 70)
+
+        pipeline = results.get('pipeline')
+        if pipeline:
+            if pipeline['dropped']:
+                raise CommandError(f"The pipeline dropped {pipeline['dropped']} record(s)")
+            if pipeline['rate'] < options['rate'] * 0.98:
+                raise CommandError(f"The pipeline reached {pipeline['rate']:.0f} of {options['rate']} req/s")
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Pipeline kept {pipeline['rate']:.0f} req/s, "
+                f"p99 {pipeline['p99_us']:.1f} us of logging per request"
+            ))
+
+    def log_request(self, logger, i):
+        """The structured events of one checkout"""
+        token = request_id_var.set(new_request_id())
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('checkout_received', extra={'items': 3, 'customer_id': i, 'payment': 'card'})
+            logger.debug('email_queued', extra={'template': 'order_confirmation', 'order_id': i})
+            logger.info('order_created', extra={'order_id': i, 'customer_id': i, 'total_amount': f'{i * 10}.00'})
+            logger.info('request', extra={
+                'method': 'POST', 'path': '/api/checkout/create-order/', 'view': 'main:create_checkout_order',
+                'status': 201, 'total_ms': 12.5, 'db_ms': 4.2, 'queries': 18, 'repeated_queries': [],
+            })
+        finally:
+            request_id_var.reset(token)
+
+    def run(self, log_request, options):
+        """Drive log_request at the target rate; per-request logging time and the rate reached"""
+        threads = options['threads']
+        interval = threads / options['rate']
+        per_thread = max(1, round(options['rate'] * options['seconds'] / threads))
+        timings = [[] for _ in range(threads)]
+
+        def worker(index):
+            next_request = time.perf_counter()
+            for n in range(per_thread):
+                delay = next_request - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                start = time.perf_counter()
+                log_request(n * threads + index)
+                timings[index].append(time.perf_counter() - start)
+                next_request += interval
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        all_timings = sorted(timing * 10 ** 6 for thread_timings in timings for timing in thread_timings)
+        return {
+            'rate': len(all_timings) / elapsed,
+            'p50_us': statistics.median(all_timings),
+            'p99_us': percentile(all_timings, 0.99),
+            'max_us': all_timings[-1],
+        }
@@ -0,0 +1,154 @@
+"""
+Django management command to benchmark order history paging
+Creates a customer with enough orders for --last-page pages and times
+fetching + serializing page 1 and the last page of their order history with
+the keyset cursor (main/pagination.py) and with the OFFSET paging it
+replaces. Keyset latency should stay flat; OFFSET grows with the page number
+(and with the table - on PostgreSQL with a large order table the gap is far
+wider than on a small SQLite file). The last page is also fetched through
+/api/customer/orders/ to check it returns the same orders.
+Everything runs in a transaction that is rolled back, so no data is left behind.
+Run: python manage.py benchmark_order_pagination --page-size 20 --last-page 500
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from main.customer_stats import rebuild_customer_stats
+from main.models import Customer, Product, Order, OrderItem
+from main.orders import order_items_prefetch
+from main.pagination import encode_cursor, decode_cursor, orders_after
+from main.serializers import OrderDetailSerializer
+from main.views import customer_orders_api
+
+# Order dates are spread over this many days (many orders share a timestamp)
+DAYS_OF_HISTORY = 365
+
+
+class Command(BaseCommand):
+    help = 'Benchmark keyset against OFFSET paging of a long order history (page 1 vs the last page)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20,
+                            help='Orders per page')
+        parser.add_argument('--last-page', type=int, default=500,
+                            help='Deepest page to time (the customer gets exactly this many pages)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per page (best run is reported)')
+        parser.add_argument('--max-ratio', type=float, default=3.0,
+                            help='Fail if the keyset last page is this many times slower than page 1')
+
+    def handle(self, *args, **options):
+        page_size, last_page = options['page_size'], options['last_page']
+        count = page_size * last_page
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"📄 ORDER HISTORY PAGING BENCHMARK ({connection.vendor}, {count:,} orders)"
+        ))
+        self.stdout.write("=" * 70)
+
+        with transaction.atomic():
+            customer = self.make_fixtures(count)
+            orders = Order.objects.filter(customer=customer)
+
+            # Position of the last order before the last page
+            order_date, order_id = orders.order_by('-order_date', '-order_id').values_list(
+                'order_date', 'order_id'
+            )[(last_page - 1) * page_size - 1]
+            cursors = {1: None, last_page: encode_cursor(order_date, order_id)}
+
+            results = []
+            for page in (1, last_page):
+                keyset = self.best_of(lambda: self.keyset_page(orders, page_size, cursors[page]), options['repeat'])
+                offset = self.best_of(lambda: self.offset_page(orders, page_size, page), options['repeat'])
+                results.append((page, keyset, offset))
+
+            # Both strategies and the endpoint must return the same orders
+            expected = self.offset_page(orders, page_size, last_page)
+            if self.keyset_page(orders, page_size, cursors[last_page]) != expected:
+                raise CommandError("Keyset and OFFSET paging returned different orders for the last page")
+            if self.endpoint_page(customer, page_size, cursors[last_page]) != expected:
+                raise CommandError("/api/customer/orders/ returned different orders for the last page")
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"   {'page':>6} | {'keyset ms':>10} | {'OFFSET ms':>10}")
+        for page, keyset, offset in results:
+            self.stdout.write(f"   {page:>6} | {keyset * 1000:>10.2f} | {offset * 1000:>10.2f}")
+        self.stdout.write("=" * 70)
+
+        ratio = results[1][1] / results[0][1]
+        if ratio > options['max_ratio']:
+            raise CommandError(f"Keyset page {last_page} is {ratio:.1f}x slower than page 1")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Keyset page {last_page} costs {ratio:.2f}x page 1 "
+            f"(OFFSET: {results[1][2] / results[0][2]:.2f}x)"
+        ))
+
+    def make_fixtures(self, count):
+        """A customer with `count` one-item orders spread over DAYS_OF_HISTORY days"""
+        customer = Customer.objects.create(
+            name='Paging Benchmark', email='paging-benchmark@example.com', phone='03000000000'
+        )
+        product = Product.objects.create(
+            name='Paging Benchmark Product', local_name='Paging', category='vegetables',
+            season='ALL_YEAR', price=Decimal('120.00'), slug='paging-benchmark-product',
+        )
+        orders = Order.objects.bulk_create([
+            Order(customer=customer, status='DELIVERED', total_amount=Decimal('240.00'))
+            for _ in range(count)
+        ], batch_size=1000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=2, price=product.price) for order in orders
+        ], batch_size=1000)
+
+        # order_date is auto_now_add, so backdate the orders one day at a time
+        now = timezone.now()
+        order_ids = [order.order_id for order in orders]
+        for days_ago in range(DAYS_OF_HISTORY):
+            Order.objects.filter(order_id__in=order_ids[days_ago::DAYS_OF_HISTORY]).update(
+                order_date=now - timedelta(days=days_ago)
+            )
+        # bulk_create bypasses the customer stats hooks (the endpoint reports the total)
+        rebuild_customer_stats([customer.customer_id])
+        return customer
+
+    def keyset_page(self, orders, page_size, cursor):
+        """One page after the cursor position"""
+        if cursor:
+            orders = orders_after(orders, *decode_cursor(cursor))
+        else:
+            orders = orders.order_by('-order_date', '-order_id')
+        page_orders = orders.prefetch_related(order_items_prefetch())[:page_size]
+        return [order['order_id'] for order in OrderDetailSerializer(page_orders, many=True).data]
+
+    def endpoint_page(self, customer, page_size, cursor):
+        """One page through the real endpoint"""
+        params = {'customer_id': customer.customer_id, 'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        response = customer_orders_api(RequestFactory().get('/api/customer/orders/', params))
+        return [order['order_id'] for order in response.data['data']]
+
+    def offset_page(self, orders, page_size, page):
+        """The same page with LIMIT/OFFSET, as page-number pagination would fetch it"""
+        offset = (page - 1) * page_size
+        page_orders = orders.prefetch_related(order_items_prefetch()).order_by(
+            '-order_date', '-order_id'
+        )[offset:offset + page_size]
+        return [order['order_id'] for order in OrderDetailSerializer(page_orders, many=True).data]
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,116 @@
+"""
+Django management command to benchmark the fast path product renderers
+Compares ProductCatalogSerializer / ProductListSerializer against the
+values()-based row renderers on synthetic in-memory products
+Run: python manage.py benchmark_product_renderers --sizes 1000 10000
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from main.models import Product, Inventory
+from main.serializers import (
+    ProductCatalogSerializer, ProductListSerializer,
+    ProductCatalogRowRenderer, ProductListRowRenderer,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DRF product serializers against the values()-based fast path renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000],
+                            help='Number of products to render per run')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per measurement (best time is reported)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("⏱️  PRODUCT RENDERER BENCHMARK"))
+        self.stdout.write("=" * 70)
+
+        for size in options['sizes']:
+            products = self.make_products(size)
+            catalog_rows = [self.as_row(p, ProductCatalogRowRenderer.value_fields) for p in products]
+            list_rows = [self.as_row(p, ProductListRowRenderer.value_fields) for p in products]
+
+            self.stdout.write(f"\n📦 {size:,} products")
+            self.compare(
+                'Catalog',
+                lambda: ProductCatalogSerializer(products, many=True).data,
+                lambda: ProductCatalogRowRenderer().render_many(catalog_rows),
+                options['repeat'],
+            )
+            self.compare(
+                'List',
+                lambda: ProductListSerializer(products, many=True).data,
+                lambda: ProductListRowRenderer().render_many(list_rows),
+                options['repeat'],
+            )
+
+        self.stdout.write("\n" + "=" * 70)
+
+    def compare(self, label, serializer_fn, renderer_fn, repeat):
+        renderer = JSONRenderer()
+        if renderer.render(serializer_fn()) != renderer.render(renderer_fn()):
+            self.stdout.write(self.style.ERROR(f"   ❌ {label}: outputs differ"))
+            return
+
+        slow = self.best_of(serializer_fn, repeat)
+        fast = self.best_of(renderer_fn, repeat)
+        self.stdout.write(
+            f"   {label:8} serializer {slow * 1000:9.2f} ms | "
+            f"renderer {fast * 1000:8.2f} ms | "
+            + self.style.SUCCESS(f"{slow / fast:5.1f}x faster")
+        )
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def make_products(self, size):
+        """Build unsaved products with their inventory relation cached"""
+        rng = random.Random(size)
+        categories = [choice[0] for choice in Product.CATEGORY_CHOICES]
+        seasons = [choice[0] for choice in Product.SEASON_CHOICES]
+
+        products = []
+        for i in range(1, size + 1):
+            category = rng.choice(categories)
+            product = Product(
+                product_id=i,
+                name=f'Product {i}',
+                local_name=f'Local {i}',
+                category=category,
+                price=Decimal(rng.randint(20, 2000)),
+                discount=Decimal(rng.choice([0, 5, 10])),
+                season=rng.choice(seasons),
+                image='' if i % 10 == 0 else f'images/{category}/product-{i}.png',
+                slug=f'product-{i}',
+            )
+            if i % 25:
+                product.inventory = Inventory(product=product, stock_available=rng.randint(0, 200))
+            products.append(product)
+        return products
+
+    def as_row(self, product, fields):
+        """Equivalent of a values_list() tuple for an in-memory product"""
+        row = []
+        for field in fields:
+            if field == 'inventory__stock_available':
+                try:
+                    row.append(product.inventory.stock_available)
+                except Inventory.DoesNotExist:
+                    row.append(None)
+            else:
+                row.append(getattr(product, field))
+        return tuple(row)
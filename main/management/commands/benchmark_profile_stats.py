@@ -0,0 +1,139 @@
+"""
+Django management command to check and benchmark the customer profile stats
+Creates a customer with many orders spread over the last 90 days, then:
+  - pins customer_profile_api to at most --max-queries queries (fails otherwise)
+  - times it against the old path (prefetch all orders + four aggregates)
+  - checks it returns the same total spent, order count and growth, and that
+    the customer stats rollup it reads matches the orders
+Everything runs in a transaction that is rolled back, so no data is left behind.
+Run: python manage.py benchmark_profile_stats --orders 10000
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from main.customer_stats import rebuild_customer_stats, verify_customer_stats
+from main.models import Customer, Order
+from main.views import customer_profile_api
+
+# Order dates are spread over this many days, covering both growth windows
+DAYS_OF_HISTORY = 90
+
+
+class Command(BaseCommand):
+    help = 'Pin the customer profile to 1-2 queries and benchmark it for a customer with many orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000,
+                            help='Orders placed by the benchmark customer')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per strategy (best run is reported)')
+        parser.add_argument('--max-queries', type=int, default=2,
+                            help='Most queries customer_profile_api may run')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"👤 CUSTOMER PROFILE STATS BENCHMARK ({connection.vendor}, {options['orders']:,} orders)"
+        ))
+        self.stdout.write("=" * 70)
+
+        with transaction.atomic():
+            customer = self.make_fixtures(options['orders'])
+            request = RequestFactory().get('/api/customer/profile/', {'customer_id': customer.customer_id})
+
+            with CaptureQueriesContext(connection) as legacy_queries:
+                expected = self.legacy_profile(customer.customer_id)
+            with CaptureQueriesContext(connection) as queries:
+                response = customer_profile_api(request)
+            data = response.data['data']
+
+            legacy_time = self.best_of(lambda: self.legacy_profile(customer.customer_id), options['repeat'])
+            new_time = self.best_of(lambda: customer_profile_api(request), options['repeat'])
+            mismatches = verify_customer_stats([customer.customer_id])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"   {'strategy':<36} | {'queries':>7} | {'ms':>8}")
+        self.stdout.write(f"   {'prefetch + 4 aggregates (old)':<36} | {len(legacy_queries):>7} | {legacy_time * 1000:>8.1f}")
+        self.stdout.write(f"   {'customer stats rollup':<36} | {len(queries):>7} | {new_time * 1000:>8.1f}")
+        self.stdout.write(
+            f"\n   total_spent={data['total_spent']} total_orders={data['total_orders']} "
+            f"growth_percentage={data['growth_percentage']}"
+        )
+        self.stdout.write("=" * 70)
+
+        actual = (data['total_spent'], data['total_orders'], data['growth_percentage'])
+        if actual != expected:
+            raise CommandError(f"Profile stats differ from the old computation: {actual} != {expected}")
+        if mismatches:
+            raise CommandError(f"Customer stats rollup doesn't match the orders: {mismatches[0]}")
+        if len(queries) > options['max_queries']:
+            raise CommandError(
+                f"customer_profile_api ran {len(queries)} queries (at most {options['max_queries']} allowed)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Profile stats in {len(queries)} quer{'y' if len(queries) == 1 else 'ies'}, "
+            f"{legacy_time / new_time:.1f}x faster than before"
+        ))
+
+    def make_fixtures(self, count):
+        """A customer with `count` orders spread over DAYS_OF_HISTORY days (rolled back afterwards)"""
+        customer = Customer.objects.create(
+            name='Profile Benchmark', email='profile-benchmark@example.com', phone='03000000000'
+        )
+        orders = Order.objects.bulk_create([
+            Order(customer=customer, status='DELIVERED', total_amount=Decimal('250.00') + (i % 40) * 5)
+            for i in range(count)
+        ], batch_size=1000)
+
+        # order_date is auto_now_add, so backdate the orders one day at a time
+        now = timezone.now()
+        order_ids = [order.order_id for order in orders]
+        for days_ago in range(DAYS_OF_HISTORY):
+            Order.objects.filter(order_id__in=order_ids[days_ago::DAYS_OF_HISTORY]).update(
+                order_date=now - timedelta(days=days_ago, hours=1)
+            )
+        # bulk_create and update() bypass the rollup hooks
+        rebuild_customer_stats([customer.customer_id])
+        return customer
+
+    def legacy_profile(self, customer_id):
+        """The profile statistics as computed before: one query per figure"""
+        customer = Customer.objects.prefetch_related('orders').get(customer_id=customer_id)
+        now = timezone.now()
+        last_30_days = now - timedelta(days=30)
+        previous_60_to_30_days = now - timedelta(days=60)
+
+        total = customer.orders.aggregate(total=Sum('total_amount'))['total']
+        total_orders = customer.orders.count()
+        recent_spending = customer.orders.filter(
+            order_date__gte=last_30_days
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+        previous_spending = customer.orders.filter(
+            order_date__gte=previous_60_to_30_days, order_date__lt=last_30_days
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+
+        if previous_spending > 0:
+            growth = round(((recent_spending - previous_spending) / previous_spending) * 100, 1)
+        elif recent_spending > 0:
+            growth = 100.0
+        else:
+            growth = 0.0
+        return float(total) if total else 0.0, total_orders, growth
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
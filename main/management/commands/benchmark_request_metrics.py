@@ -0,0 +1,108 @@
+"""
+Django management command to measure the overhead of RequestMetricsMiddleware
+Times endpoints from the benchmark suite (main/benchmarks.py) through two test
+clients - MIDDLEWARE with and without main.middleware.RequestMetricsMiddleware
+(sampling at --sample-rate) - alternating request by request, so drift hits
+both alike, and compares their median latency. Log lines go through the usual
+writer thread (main/structured_logging.py) to os.devnull.
+Run: python manage.py benchmark_request_metrics --requests 500 [--sample-rate 1]
+"""
+
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.benchmarks import ENDPOINTS, benchmark_context
+from main.structured_logging import redirect_logs
+
+METRICS_MIDDLEWARE = 'main.middleware.RequestMetricsMiddleware'
+
+# Read-only endpoints timed by default
+DEFAULT_ENDPOINTS = ['catalog_products_api', 'checkout_cart_api', 'customer_orders_api', 'customer_profile_api']
+
+
+class Command(BaseCommand):
+    help = 'Measure the latency overhead of the request metrics middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300,
+                            help='Timed requests per endpoint and client')
+        parser.add_argument('--sample-rate', type=float,
+                            help='Sample rate of the instrumented client (default: REQUEST_METRICS_SAMPLE_RATE)')
+        parser.add_argument('--endpoint', nargs='*', dest='endpoints', default=DEFAULT_ENDPOINTS,
+                            choices=[endpoint.name for endpoint in ENDPOINTS],
+                            help='Endpoints to time')
+        parser.add_argument('--max-overhead', type=float, default=1.0,
+                            help='Fail if the middleware adds more than this percentage')
+
+    def handle(self, *args, **options):
+        if METRICS_MIDDLEWARE not in settings.MIDDLEWARE:
+            raise CommandError(f"{METRICS_MIDDLEWARE} is not in MIDDLEWARE")
+
+        sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE if options['sample_rate'] is None else options['sample_rate']
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"🔬 REQUEST METRICS OVERHEAD (sample rate {sample_rate:g})"
+        ))
+        self.stdout.write("=" * 70)
+
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in options['endpoints']]
+
+        setup_test_environment()
+        try:
+            context = benchmark_context()
+            plain = self.make_client([m for m in settings.MIDDLEWARE if m != METRICS_MIDDLEWARE], 0)
+            instrumented = self.make_client(settings.MIDDLEWARE, sample_rate)
+
+            timings = {(name, endpoint.name): [] for name in ('plain', 'instrumented') for endpoint in endpoints}
+            with open(os.devnull, 'w') as devnull, redirect_logs(devnull):
+                for endpoint in endpoints:
+                    # Alternate request by request, so drift hits both clients alike
+                    for _ in range(options['requests']):
+                        for name, client in (('plain', plain), ('instrumented', instrumented)):
+                            timings[name, endpoint.name].append(self.time_request(client, endpoint, context))
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"   {'endpoint':<28} | {'plain ms':>9} | {'metrics ms':>10} | {'overhead':>8}")
+        total_plain = total_instrumented = 0
+        for endpoint in endpoints:
+            plain_ms = statistics.median(timings['plain', endpoint.name])
+            instrumented_ms = statistics.median(timings['instrumented', endpoint.name])
+            total_plain += plain_ms
+            total_instrumented += instrumented_ms
+            self.stdout.write(
+                f"   {endpoint.name:<28} | {plain_ms:>9.3f} | {instrumented_ms:>10.3f} | "
+                f"{(instrumented_ms / plain_ms - 1) * 100:>7.2f}%"
+            )
+        overhead = (total_instrumented / total_plain - 1) * 100
+        self.stdout.write("=" * 70)
+
+        if overhead > options['max_overhead']:
+            raise CommandError(f"The middleware adds {overhead:.2f}% (limit {options['max_overhead']:g}%)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Middleware overhead {overhead:.2f}% of median latency (limit {options['max_overhead']:g}%)"
+        ))
+
+    def make_client(self, middleware, sample_rate):
+        """A test client whose middleware chain is built with these settings"""
+        with override_settings(MIDDLEWARE=middleware, REQUEST_METRICS_SAMPLE_RATE=sample_rate):
+            client = Client()
+            client.handler.load_middleware()
+        return client
+
+    def time_request(self, client, endpoint, context):
+        start = time.perf_counter()
+        response = endpoint.request(client, context)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f"{endpoint.name} returned {response.status_code}")
+        return elapsed
@@ -0,0 +1,211 @@
+"""
+Django management command to benchmark batched SMTP delivery
+Starts a local SMTP stand-in server that counts connections and messages,
+then sends the same batch of rendered shipping notifications:
+  1. one connection per message (what send_mail() does)
+  2. BatchEmailSender with a single pooled connection
+  3. BatchEmailSender with --pool-size pooled connections
+A few recipients are refused by the stand-in to show that one bad message
+never affects the rest of the batch.
+Run: python manage.py benchmark_smtp_delivery --messages 1000
+"""
+
+import socketserver
+import threading
+import time
+from decimal import Decimal
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main.email_queue import BatchEmailSender, PERMANENT_ERRORS, build_message
+from main.models import Customer, Order, OutboundEmail
+from main.email_rendering import render_emails
+from main.utils import _order_shipped_context
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts everything except 'reject' recipients"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.record('connections')
+        # Stand-in for the TCP + TLS handshake and AUTH round trips
+        time.sleep(server.handshake_delay)
+        self.reply('220 localhost SMTP stand-in ready')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb in ('HELO', 'MAIL', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                if 'reject' in command.lower():
+                    self.reply('550 No such user')
+                else:
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                server.record('messages')
+                # Stand-in for the server's per-message round trip
+                time.sleep(server.message_delay)
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded SMTP stand-in listening on a free localhost port"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0, message_delay=0.0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.message_delay = message_delay
+        self._lock = threading.Lock()
+        self.counts = {'connections': 0, 'messages': 0}
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'connections': 0, 'messages': 0}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-message SMTP connections against pooled batch delivery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000,
+                            help='Number of emails to send per run')
+        parser.add_argument('--pool-size', type=int, default=4,
+                            help='Connections for the pooled run')
+        parser.add_argument('--handshake-ms', type=float, default=20.0,
+                            help='Simulated connect + TLS + login cost per connection')
+        parser.add_argument('--message-ms', type=float, default=2.0,
+                            help='Simulated server round trip per message')
+        parser.add_argument('--reject-every', type=int, default=100,
+                            help='Every Nth recipient is refused by the server (0 = none)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("📮 BATCHED SMTP DELIVERY BENCHMARK"))
+        self.stdout.write("=" * 70)
+
+        server = LocalSMTPServer(
+            handshake_delay=options['handshake_ms'] / 1000,
+            message_delay=options['message_ms'] / 1000,
+        ).start()
+        try:
+            messages = self.make_messages(options['messages'], options['reject_every'])
+            self.stdout.write(
+                f"📦 {len(messages):,} rendered shipping emails | "
+                f"stand-in on port {server.port} | "
+                f"{options['handshake_ms']:.0f} ms handshake, "
+                f"{options['message_ms']:.0f} ms per message\n"
+            )
+
+            def factory():
+                return get_connection(
+                    'django.core.mail.backends.smtp.EmailBackend',
+                    host='127.0.0.1', port=server.port, username='', password='',
+                    use_tls=False, use_ssl=False, fail_silently=False, timeout=10,
+                )
+
+            self.run('Connection per message', server, lambda: self.send_individually(factory, messages))
+            for pool_size in sorted({1, options['pool_size']}):
+                sender = BatchEmailSender(pool_size=pool_size, connection_factory=factory)
+
+                def send_batch(sender=sender):
+                    try:
+                        return sender.send(messages)
+                    finally:
+                        sender.close()
+
+                self.run(f'Batch sender, pool of {pool_size}', server, send_batch)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write("=" * 70)
+
+    def run(self, label, server, send):
+        server.reset()
+        start = time.perf_counter()
+        results = send()
+        elapsed = time.perf_counter() - start
+
+        failed = sum(1 for error in results if error is not None)
+        self.stdout.write(self.style.SUCCESS(f"▶️  {label}"))
+        self.stdout.write(
+            f"   {elapsed:7.2f} s | {len(results) / elapsed:8.1f} msg/s | "
+            f"connections: {server.counts['connections']:,} | "
+            f"delivered: {server.counts['messages']:,} | refused: {failed}"
+        )
+
+    def send_individually(self, factory, messages):
+        """Open, send and close a connection per message, like send_mail()"""
+        results = []
+        for message in messages:
+            try:
+                factory().send_messages([message])
+            except PERMANENT_ERRORS as e:
+                results.append(e)
+            else:
+                results.append(None)
+        return results
+
+    def make_messages(self, count, reject_every):
+        """Render shipping notifications for unsaved orders"""
+        orders = []
+        for i in range(1, count + 1):
+            rejected = reject_every and i % reject_every == 0
+            customer = Customer(
+                customer_id=i,
+                name=f'Customer {i}',
+                email=f'reject-{i}@example.com' if rejected else f'customer{i}@example.com',
+            )
+            orders.append(Order(
+                order_id=i, customer=customer,
+                order_date=timezone.now(), total_amount=Decimal('1250.00'),
+            ))
+
+        rendered = render_emails('order_shipped', [
+            _order_shipped_context(order, f'TRK{order.order_id:06d}') for order in orders
+        ])
+        return [
+            build_message(OutboundEmail(
+                to_email=order.customer.email,
+                subject=f'Your Order #{order.order_id} Has Been Shipped! 🚚',
+                body_text=plain_message, body_html=html_message,
+            ))
+            for order, (plain_message, html_message) in zip(orders, rendered)
+        ]
@@ -0,0 +1,94 @@
+"""
+Django management command to compare buffered and streamed list responses
+Creates --rows customers and renders all of them through CustomerViewSet:
+  - buffered: serializer(many=True).data + JSONRenderer (the whole list in memory)
+  - streamed: ?stream=1 and Accept: application/x-ndjson (main/streaming.py)
+and reports time and peak Python memory (tracemalloc) for each. The streamed
+peak should stay flat as --rows grows; the buffered one grows with it.
+Everything runs in a transaction that is rolled back, so no data is left behind.
+Run: python manage.py benchmark_streaming --rows 100000
+"""
+
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from main.models import Customer
+from main.serializers import CustomerSerializer
+from main.views import CustomerViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory and time of buffered and streamed list responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Customers to list')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"🌊 STREAMING LIST BENCHMARK ({connection.vendor}, {options['rows']:,} rows)"
+        ))
+        self.stdout.write("=" * 70)
+
+        with transaction.atomic():
+            Customer.objects.bulk_create([
+                Customer(name=f'Stream Benchmark {i}', email=f'stream-benchmark-{i}@example.com',
+                         phone='03000000000')
+                for i in range(options['rows'])
+            ], batch_size=2000)
+            total = Customer.objects.count()
+
+            factory = RequestFactory()
+            view = CustomerViewSet.as_view({'get': 'list'})
+            strategies = [
+                ('buffered (many=True + JSONRenderer)', self.buffered),
+                ('streamed JSON array (?stream=1)', lambda keep_body=True: self.streamed(
+                    view, factory.get('/api/customers/', {'stream': '1'}), keep_body)),
+                ('streamed NDJSON (Accept header)', lambda keep_body=True: self.streamed(
+                    view, factory.get('/api/customers/', HTTP_ACCEPT='application/x-ndjson'), keep_body)),
+            ]
+            results = [(name,) + self.measure(fn) for name, fn in strategies]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"   {'strategy':<38} | {'seconds':>7} | {'peak MB':>8} | {'bytes out':>12}")
+        for name, elapsed, peak, body in results:
+            self.stdout.write(f"   {name:<38} | {elapsed:>7.2f} | {peak / 2**20:>8.1f} | {len(body):>12,}")
+
+        array, ndjson = results[1][3], results[2][3]
+        if len(json.loads(array)) != total or len(ndjson.splitlines()) != total:
+            raise CommandError(f"Streamed responses don't contain all {total} customers")
+        if json.loads(array) != json.loads(results[0][3]):
+            raise CommandError("Streamed JSON differs from the buffered response")
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Streaming peak {results[1][2] / 2**20:.1f} MB vs {results[0][2] / 2**20:.1f} MB buffered"
+        ))
+
+    def buffered(self, keep_body=True):
+        data = CustomerSerializer(Customer.objects.all(), many=True).data
+        return JSONRenderer().render(data)
+
+    def streamed(self, view, request, keep_body=True):
+        """Consume the response; without keep_body each piece is dropped, as a socket write would"""
+        parts = []
+        for chunk in view(request).streaming_content:
+            if keep_body:
+                parts.append(chunk)
+        return b''.join(parts)
+
+    def measure(self, fn):
+        """(seconds, peak traced bytes, body) - timed and measured without keeping the body"""
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(keep_body=False)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak, fn()
@@ -0,0 +1,130 @@
+"""
+Django management command to benchmark catalog search-as-you-type suggestions
+Compares the prefix trie behind /api/catalog/suggest/ with the icontains query
+the catalog search used before it
+Run: python manage.py benchmark_suggest --sizes 1000 10000 100000
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.test import RequestFactory
+
+from main.catalog import catalog_engine
+from main.models import Product
+from main.search import ProductSuggestTrie
+from main.views import catalog_suggest_api
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the autocomplete prefix trie against an icontains query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=8,
+                            help='Suggestions per lookup')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Passes over the prefix list (best pass is reported)')
+        parser.add_argument('--sizes', nargs='*', type=int, default=[10000, 100000],
+                            help='Synthetic catalog sizes for the trie scaling run')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        repeat = options['repeat']
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("⏱️  AUTOCOMPLETE BENCHMARK"))
+        self.stdout.write("=" * 70)
+
+        names = list(Product.objects.filter(is_active=True).values_list('name', 'local_name'))
+        prefixes = self.make_prefixes(names)
+        if not prefixes:
+            self.stdout.write(self.style.WARNING("⚠️  No active products - nothing to benchmark"))
+            return
+
+        snapshot = catalog_engine.snapshot()
+        trie = snapshot.suggest_trie
+        factory = RequestFactory()
+
+        def trie_lookup():
+            for prefix in prefixes:
+                trie.suggest(prefix, limit)
+
+        def endpoint():
+            for prefix in prefixes:
+                request = factory.get('/api/catalog/suggest/', {'q': prefix, 'limit': limit})
+                catalog_suggest_api(request).render()
+
+        def icontains():
+            for prefix in prefixes:
+                list(
+                    Product.objects.filter(is_active=True)
+                    .filter(Q(name__icontains=prefix) | Q(local_name__icontains=prefix))
+                    .values('product_id', 'name', 'local_name', 'slug', 'image')[:limit]
+                )
+
+        self.stdout.write(
+            f"\n📦 {len(snapshot):,} active products, {len(prefixes):,} prefixes (per lookup):"
+        )
+        icontains_time = self.best_of(icontains, repeat) / len(prefixes)
+        for label, fn in (('Trie lookup', trie_lookup), ('Suggest endpoint', endpoint)):
+            elapsed = self.best_of(fn, repeat) / len(prefixes)
+            self.stdout.write(
+                f"   {label:18} {elapsed * 1e6:9.1f} µs | "
+                + self.style.SUCCESS(f"{icontains_time / elapsed:7.1f}x faster than icontains")
+            )
+        self.stdout.write(f"   {'icontains query':18} {icontains_time * 1e6:9.1f} µs")
+
+        for size in options['sizes']:
+            self.benchmark_synthetic(size, limit, repeat)
+
+        self.stdout.write("\n" + "=" * 70)
+
+    def benchmark_synthetic(self, size, limit, repeat):
+        """Build a trie over synthetic product names to show how lookups scale"""
+        rng = random.Random(size)
+        syllables = ['ka', 'la', 'ma', 'ri', 'to', 'pa', 'shi', 'go', 'ban', 'dar', 'mir', 'chi']
+
+        def word():
+            return ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+        names = [
+            (i, f'{word().title()} {word().title()}', word().title())
+            for i in range(1, size + 1)
+        ]
+
+        start = time.perf_counter()
+        trie = ProductSuggestTrie(names)
+        build_time = time.perf_counter() - start
+
+        prefixes = self.make_prefixes([(name, local) for _, name, local in names[:500]])
+
+        def lookup():
+            for prefix in prefixes:
+                trie.suggest(prefix, limit)
+
+        elapsed = self.best_of(lookup, repeat) / len(prefixes)
+        self.stdout.write(
+            f"\n🧪 Synthetic {size:,} products: build {build_time * 1000:,.0f} ms | "
+            f"lookup {elapsed * 1e6:.1f} µs"
+        )
+
+    def make_prefixes(self, names):
+        """1-4 character prefixes of every English and local name"""
+        prefixes = set()
+        for name, local_name in names:
+            for text in (name, local_name):
+                text = text.lower()
+                for length in range(1, min(len(text), 4) + 1):
+                    prefixes.add(text[:length])
+        return sorted(prefixes)
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
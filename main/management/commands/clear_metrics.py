@@ -0,0 +1,22 @@
+"""
+Django management command to clear the Prometheus metrics files
+Every server process keeps its metrics in its own file in METRICS_DIR (see
+main/metrics.py) and the files outlive the process; run this before the
+server starts so totals begin at zero
+Run: python manage.py clear_metrics && gunicorn Farm2Home.wsgi
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.metrics import clear_metrics_dir
+
+
+class Command(BaseCommand):
+    help = 'Delete the per-process metrics files in METRICS_DIR'
+
+    def handle(self, *args, **options):
+        deleted = clear_metrics_dir()
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 Deleted {deleted} metrics file(s) from {settings.METRICS_DIR}"
+        ))
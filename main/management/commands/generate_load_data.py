@@ -0,0 +1,84 @@
+"""
+Django management command to generate synthetic load data
+Creates customers with addresses, carts, orders and order items in realistic
+proportions (Zipf product popularity, seasonal ordering - see
+main/load_data.py) on top of the products from populate_products, so
+benchmarks can run against production-sized tables.
+Load customers log in with their email and the password in LOAD_PASSWORD;
+--clear removes everything generated earlier first (with --customers 0, only that).
+Run: python manage.py generate_load_data --customers 100000 --orders 1000000 --workers 4
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main.load_data import LOAD_EMAIL_DOMAIN, LOAD_PASSWORD, delete_load_data, generate_load_data
+
+
+class Command(BaseCommand):
+    help = 'Generate customers, addresses, carts, orders and order items for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000,
+                            help='Customers to create')
+        parser.add_argument('--orders', type=int, default=100000,
+                            help='Orders to create between them')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Days of order history, ending today')
+        parser.add_argument('--max-items', type=int, default=8,
+                            help='Most distinct products in one order')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Zipf exponent of product popularity (higher = fewer best sellers)')
+        parser.add_argument('--cart-share', type=float, default=0.2,
+                            help='Share of customers with an open cart')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows inserted per query')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating orders in parallel (PostgreSQL)')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed (the same seed gives the same data)')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated load data first')
+
+    def handle(self, *args, **options):
+        if options['customers'] < 1 and not options['clear']:
+            raise CommandError("--customers must be at least 1 (use --customers 0 --clear to only delete)")
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"🏭 LOAD DATA GENERATOR ({connection.vendor})"))
+        self.stdout.write("=" * 70)
+
+        if options['clear']:
+            start = time.perf_counter()
+            deleted = delete_load_data(options['batch_size'])
+            self.stdout.write(f"🗑️  Deleted {deleted:,} load customer(s) and their data in "
+                              f"{time.perf_counter() - start:.1f} s")
+        if options['customers'] < 1:
+            return
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("⚠️  SQLite allows one writer at a time - using 1 worker"))
+            workers = 1
+
+        start = time.perf_counter()
+        try:
+            created = generate_load_data(
+                options['customers'], options['orders'], days=options['days'],
+                max_items=options['max_items'], zipf=options['zipf'], cart_share=options['cart_share'],
+                batch_size=options['batch_size'], workers=workers, seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for table in ('customers', 'addresses', 'carts', 'orders', 'order items'):
+            self.stdout.write(f"   {table:<12} {created[table]:>12,}")
+        rows = sum(created.values())
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Created {rows:,} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s)"
+        ))
+        self.stdout.write(f"   Log in as any *@{LOAD_EMAIL_DOMAIN} customer with password '{LOAD_PASSWORD}'")
@@ -0,0 +1,54 @@
+"""
+Django management command to deliver queued outbound emails
+Keeps one SMTP connection open while there is work, retries failures with
+exponential backoff and records the delivery status of every email
+Run: python manage.py process_email_queue [--once] [--batch-size 50]
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from main.email_queue import EmailQueueWorker
+from main.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound emails (runs until stopped unless --once is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no due emails are left instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails claimed per batch (default: EMAIL_QUEUE_BATCH_SIZE)')
+        parser.add_argument('--poll-interval', type=int, default=None,
+                            help='Seconds to wait when the queue is empty (default: EMAIL_QUEUE_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("📬 OUTBOUND EMAIL WORKER"))
+        self.stdout.write("=" * 70)
+        self.show_queue()
+
+        worker = EmailQueueWorker(batch_size=options['batch_size'])
+        try:
+            worker.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write("\n⏹️  Stopped")
+
+        self.stdout.write("-" * 70)
+        self.stdout.write(self.style.SUCCESS(f"✅ Sent: {worker.sent}"))
+        if worker.retried:
+            self.stdout.write(self.style.WARNING(f"🔁 Scheduled for retry: {worker.retried}"))
+        if worker.failed:
+            self.stdout.write(self.style.ERROR(f"❌ Failed permanently: {worker.failed}"))
+        self.show_queue()
+        self.stdout.write("=" * 70)
+
+    def show_queue(self):
+        counts = dict(
+            OutboundEmail.objects.values_list('status').annotate(total=Count('email_id')).order_by()
+        )
+        summary = ', '.join(
+            f"{label}: {counts.get(value, 0)}" for value, label in OutboundEmail.STATUS_CHOICES
+        )
+        self.stdout.write(f"📊 Queue - {summary}")
@@ -0,0 +1,25 @@
+"""
+Django management command to delete expired idempotency keys
+Stored responses for Idempotency-Key requests are kept for IDEMPOTENCY_KEY_TTL
+seconds (see main/idempotency.py); run this from cron to evict the rest
+Run: python manage.py purge_idempotency_keys
+"""
+
+from django.core.management.base import BaseCommand
+
+from main.idempotency import purge_expired_keys
+from main.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys whose stored response has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Keys deleted per query')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 Deleted {deleted} expired idempotency key(s), {IdempotencyKey.objects.count()} left"
+        ))
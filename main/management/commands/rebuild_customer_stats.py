@@ -0,0 +1,59 @@
+"""
+Django management command to rebuild and verify the customer stats rollup
+CustomerStats and CustomerDailySpend are kept up to date as orders change
+(see main/customer_stats.py); this recomputes them from the orders in bulk -
+after imports or other writes that bypass the hooks - and checks the result
+Run: python manage.py rebuild_customer_stats [--verify-only] [--customer 12 ...]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.customer_stats import rebuild_customer_stats, verify_customer_stats
+
+# Mismatches printed before the rest are summarised
+MAX_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the customer stats rollup from the orders and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Only compare the rollup with the orders, change nothing')
+        parser.add_argument('--customer', nargs='*', type=int, dest='customer_ids',
+                            help='Only these customer ids (default: everyone)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows inserted per query')
+
+    def handle(self, *args, **options):
+        customer_ids = options['customer_ids'] or None
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("📈 CUSTOMER STATS ROLLUP"))
+        self.stdout.write("=" * 70)
+
+        if not options['verify_only']:
+            start = time.perf_counter()
+            customers, days = rebuild_customer_stats(customer_ids, options['batch_size'])
+            self.stdout.write(
+                f"🔨 Rebuilt {customers:,} customer row(s) and {days:,} daily row(s) "
+                f"in {time.perf_counter() - start:.2f} s"
+            )
+
+        start = time.perf_counter()
+        mismatches = verify_customer_stats(customer_ids)
+        self.stdout.write(f"🔍 Verified in {time.perf_counter() - start:.2f} s")
+        for mismatch in mismatches[:MAX_SHOWN]:
+            self.stdout.write(self.style.WARNING(f"   {mismatch}"))
+        if len(mismatches) > MAX_SHOWN:
+            self.stdout.write(self.style.WARNING(f"   ... and {len(mismatches) - MAX_SHOWN} more"))
+
+        self.stdout.write("=" * 70)
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} rollup row(s) don't match the orders"
+                + ("" if not options['verify_only'] else " - run without --verify-only to rebuild")
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Customer stats match the orders"))
@@ -0,0 +1,78 @@
+"""
+Django management command to give the stock of expired cart holds back
+Cart lines hold their stock for CART_HOLD_TIMEOUT seconds; this sweeper
+returns abandoned holds to inventory (see main/inventory.py)
+Run: python manage.py release_stock_holds [--once] [--interval 60]
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, close_old_connections, connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from main.inventory import release_expired_holds
+from main.models import StockHold
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart stock holds (runs until stopped unless --once is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no expired holds are left instead of polling')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Holds released per transaction')
+        parser.add_argument('--interval', type=int, default=None,
+                            help='Seconds between sweeps (default: STOCK_HOLD_SWEEP_INTERVAL)')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'STOCK_HOLD_SWEEP_INTERVAL', 60)
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS("🔓 STOCK HOLD SWEEPER"))
+        self.stdout.write("=" * 70)
+        self.show_holds()
+
+        released = 0
+        try:
+            while True:
+                # Drop a connection that broke (database restart) or outlived CONN_MAX_AGE
+                if not connection.in_atomic_block:
+                    close_old_connections()
+                try:
+                    batch = release_expired_holds(options['batch_size'])
+                except (OperationalError, InterfaceError) as e:
+                    if options['once']:
+                        raise
+                    self.stdout.write(self.style.WARNING(f"   Database unavailable ({e}) - retrying in {interval}s"))
+                    time.sleep(interval)
+                    continue
+                released += batch
+                if batch:
+                    self.stdout.write(f"   Released {batch} expired hold(s)")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("\n⏹️  Stopped")
+
+        self.stdout.write("-" * 70)
+        self.stdout.write(self.style.SUCCESS(f"✅ Released: {released}"))
+        self.show_holds()
+        self.stdout.write("=" * 70)
+
+    def show_holds(self):
+        now = timezone.now()
+        active = StockHold.objects.filter(expires_at__gt=now).aggregate(
+            holds=Count('hold_id'), units=Sum('quantity')
+        )
+        expired = StockHold.objects.filter(expires_at__lte=now).count()
+        self.stdout.write(
+            f"📊 Holds - active: {active['holds'] or 0} ({active['units'] or 0} units), expired: {expired}"
+        )
@@ -0,0 +1,211 @@
+"""
+Django management command to stress-test concurrent checkouts
+Fires hundreds of parallel create_checkout_order requests at a few scarce
+products - every order buys several of them, listed in random order - and
+checks that:
+  - stock is never oversold: units sold + units held == initial stock - final stock
+  - stock never goes negative
+  - no request failed with a deadlock or any other server error
+Half of the customers put their items in the server-side cart first, so
+cart holds are converted by checkout under the same load.
+Meant for PostgreSQL (SQLite serializes every write, so it proves little).
+Test data is created with a unique tag and deleted afterwards.
+Run: python manage.py stress_checkout --orders 400 --threads 32 --stock 150
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import RequestFactory
+
+from main.inventory import hold_stock
+from main.models import Customer, Product, Inventory, Order, OrderItem, Cart, OutboundEmail, StockHold
+from main.views import create_checkout_order
+
+
+class Command(BaseCommand):
+    help = 'Fire parallel checkouts at scarce stock and verify no oversell and no deadlock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=400,
+                            help='Checkout requests to fire')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='Requests in flight at once')
+        parser.add_argument('--products', type=int, default=4,
+                            help='Scarce products every order draws from')
+        parser.add_argument('--stock', type=int, default=150,
+                            help='Initial stock of each product')
+        parser.add_argument('--max-quantity', type=int, default=3,
+                            help='Largest quantity per order line')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the test products, customers and orders')
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"🏋️  CONCURRENT CHECKOUT STRESS TEST ({connection.vendor})"))
+        self.stdout.write("=" * 70)
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                "⚠️  Not PostgreSQL: writes are serialized, so row locking is not really exercised"
+            ))
+
+        tag = uuid.uuid4().hex[:8]
+        products, customers = self.make_fixtures(tag, options)
+        product_ids = [product.product_id for product in products]
+        try:
+            held = self.fill_carts(customers[::2], product_ids, options['max_quantity'])
+            requests = self.make_requests(customers, product_ids, options['max_quantity'])
+
+            self.stdout.write(
+                f"🔥 {len(requests):,} checkouts, {options['threads']} in flight, "
+                f"{len(products)} products x {options['stock']} units, {held} units in cart holds"
+            )
+            start = time.perf_counter()
+            results = self.fire(requests, options['threads'])
+            elapsed = time.perf_counter() - start
+
+            statuses = Counter(code for code, _ in results)
+            self.stdout.write(
+                f"   {elapsed:.2f} s | " + ' | '.join(f"HTTP {code}: {count}" for code, count in sorted(statuses.items()))
+            )
+            self.verify(products, options['stock'], results)
+        finally:
+            if not options['keep']:
+                self.cleanup(tag, products, customers)
+            connection.close()
+
+        self.stdout.write("=" * 70)
+
+    def make_fixtures(self, tag, options):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Stress {tag} Product {i}', local_name='', category='vegetables',
+                season='ALL_YEAR', price=Decimal('50.00') + i, slug=f'stress-{tag}-{i}',
+            )
+            for i in range(options['products'])
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(product=product, stock_available=options['stock']) for product in products
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f'Stress {tag} {i}', email=f'stress-{tag}-{i}@example.com', phone='03001234567')
+            for i in range(options['orders'])
+        ])
+        return products, customers
+
+    def fill_carts(self, customers, product_ids, max_quantity):
+        """Put items in these customers' carts, holding their stock"""
+        rng = random.Random(1)
+        held = 0
+        for customer in customers:
+            product_id = rng.choice(product_ids)
+            quantity = rng.randint(1, max_quantity)
+            Cart.objects.create(customer=customer, product_id=product_id, quantity=quantity)
+            hold_stock(customer.customer_id, product_id, quantity)
+            held += quantity
+        return held
+
+    def make_requests(self, customers, product_ids, max_quantity):
+        rng = random.Random(2)
+        requests = []
+        for customer in customers:
+            lines = rng.sample(product_ids, rng.randint(1, len(product_ids)))  # random lock order
+            for cart_item in Cart.objects.filter(customer=customer):
+                if cart_item.product_id not in lines:
+                    lines.append(cart_item.product_id)
+            requests.append({
+                'customer_id': customer.customer_id,
+                'shipping': {
+                    'fullName': customer.name, 'email': customer.email, 'phone': customer.phone,
+                    'address': 'House 1, Street 1', 'city': 'Lahore', 'zipCode': '54000',
+                },
+                'billing': {},
+                'items': [{'product_id': product_id, 'quantity': rng.randint(1, max_quantity)}
+                          for product_id in lines],
+            })
+        return requests
+
+    def fire(self, requests, threads):
+        """Post every checkout from a pool of threads, all starting together"""
+        factory = RequestFactory()
+        barrier = threading.Barrier(min(threads, len(requests)))
+
+        def checkout(data):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                request = factory.post('/api/checkout/create-order/', json.dumps(data),
+                                       content_type='application/json')
+                response = create_checkout_order(request)
+                return response.status_code, response.data
+            except Exception as e:
+                return 500, {'error': f"{type(e).__name__}: {e}"}
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return list(executor.map(checkout, requests))
+
+    def verify(self, products, initial_stock, results):
+        failures = []
+
+        errors = [data for code, data in results if code >= 500]
+        deadlocks = [data for data in errors if 'deadlock' in json.dumps(data, default=str).lower()]
+        if deadlocks:
+            failures.append(f"{len(deadlocks)} deadlocks")
+        if errors:
+            failures.append(f"{len(errors)} server errors, e.g. {errors[0]}")
+
+        product_ids = [product.product_id for product in products]
+        sold = dict(
+            OrderItem.objects.filter(product_id__in=product_ids)
+            .values_list('product_id').annotate(units=Sum('quantity')).order_by()
+        )
+        held = dict(
+            StockHold.objects.filter(product_id__in=product_ids)
+            .values_list('product_id').annotate(units=Sum('quantity')).order_by()
+        )
+        stock = dict(Inventory.objects.filter(product_id__in=product_ids).values_list('product_id', 'stock_available'))
+
+        self.stdout.write(f"\n   {'product':>8} | {'sold':>5} | {'held':>5} | {'left':>5} | {'initial':>7}")
+        for product_id in product_ids:
+            units_sold, units_held, left = sold.get(product_id, 0), held.get(product_id, 0), stock[product_id]
+            self.stdout.write(
+                f"   {product_id:>8} | {units_sold:>5} | {units_held:>5} | {left:>5} | {initial_stock:>7}"
+            )
+            if left < 0:
+                failures.append(f"product {product_id} has negative stock")
+            if units_sold + units_held + left != initial_stock:
+                failures.append(
+                    f"product {product_id}: sold {units_sold} + held {units_held} + left {left} != {initial_stock}"
+                )
+
+        created = sum(1 for code, _ in results if code == 201)
+        orders = Order.objects.filter(order_items__product_id__in=product_ids).distinct().count()
+        if created != orders:
+            failures.append(f"{created} checkouts succeeded but {orders} orders exist")
+
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {created} orders placed, no oversell, no deadlocks, every unit accounted for"
+        ))
+
+    def cleanup(self, tag, products, customers):
+        customer_ids = [customer.customer_id for customer in customers]
+        StockHold.objects.filter(customer_id__in=customer_ids).delete()
+        Order.objects.filter(customer_id__in=customer_ids).delete()
+        Customer.objects.filter(customer_id__in=customer_ids).delete()
+        Product.objects.filter(product_id__in=[product.product_id for product in products]).delete()
+        OutboundEmail.objects.filter(to_email__startswith=f'stress-{tag}-').delete()
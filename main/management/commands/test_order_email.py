@@ -1,11 +1,13 @@
 """
 Django management command to test order confirmation email
+Queues the email and then runs the email queue worker once to deliver it
 Run: python manage.py test_order_email
 """
 
 from django.core.management.base import BaseCommand
 from main.models import Customer, Product, Order, OrderItem
 from main.utils import send_order_confirmation_email
+from main.email_queue import EmailQueueWorker
 from decimal import Decimal
 
 
@@ -90,6 +92,12 @@ class Command(BaseCommand):
             
             success = send_order_confirmation_email(order)
             
+            if success:
+                # Deliver it now instead of waiting for process_email_queue
+                worker = EmailQueueWorker()
+                worker.run(once=True)
+                success = worker.sent > 0
+            
             if success:
                 self.stdout.write("-" * 70)
                 self.stdout.write(self.style.SUCCESS("✅ Order confirmation email sent successfully!"))
@@ -102,7 +110,7 @@ class Command(BaseCommand):
                 self.stdout.write(f"   Payment: {order.payment}")
                 self.stdout.write(f"   Shipping: {order.shipping_info['address']}, {order.shipping_info['city']}")
             else:
-                self.stdout.write(self.style.ERROR("❌ Failed to send email. Check error message above."))
+                self.stdout.write(self.style.ERROR("❌ Failed to send email. Check the Outbound emails admin for the error."))
             
             self.stdout.write("\n" + "=" * 70)
             self.stdout.write(self.style.SUCCESS("✅ TEST COMPLETED"))
@@ -0,0 +1,324 @@
+"""
+Prometheus Metrics for Farm2Home
+Counters, gauges and histograms served at /internal/metrics in the Prometheus
+text format:
+- every process (gunicorn worker, email queue worker) keeps its values in its
+  own memory-mapped file in METRICS_DIR - an update is a write into that
+  mapping under a per-process lock, never a lock shared between processes
+- the metrics view reads every file in the directory and merges them:
+  counters and histograms are summed, gauges report the most recent value
+Files outlive their process so counts from restarted workers aren't lost;
+clear the directory before the server starts (python manage.py clear_metrics)
+or the previous run's totals carry over.
+"""
+
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+# File layout: a header with the bytes in use, then one entry per sample -
+# key length, JSON key padded to 8 bytes, value and time of the last update
+_HEADER = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<dd')
+INITIAL_FILE_SIZE = 64 * 1024
+
+# Seconds - request latency and database time per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _padded(offset):
+    return (offset + 7) & ~7
+
+
+def _read_entries(data):
+    """(key, value offset) of every entry in a metrics file's bytes"""
+    used = _HEADER.unpack_from(data, 0)[0]
+    offset = _HEADER.size
+    while offset < used:
+        length = _KEY_LENGTH.unpack_from(data, offset)[0]
+        key_start = offset + _KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode('utf-8')
+        offset = _padded(key_start + length)
+        yield key, offset
+        offset += _VALUE.size
+
+
+class MetricsFile:
+    """
+    One process's metric values in a memory-mapped file
+    Only the owning process writes to it; readers may look at it any time,
+    entries are complete before the header counts them.
+    """
+
+    def __init__(self, directory, pid):
+        self.directory = directory
+        self.pid = pid
+        self.path = os.path.join(directory, f'metrics-{pid}.db')
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        if self._size == 0:
+            self._size = INITIAL_FILE_SIZE
+            os.ftruncate(self._fd, self._size)
+        self._map = mmap.mmap(self._fd, self._size)
+        if _HEADER.unpack_from(self._map, 0)[0] == 0:
+            _HEADER.pack_into(self._map, 0, _HEADER.size)
+        # A restarted worker that got the same pid continues its predecessor's file
+        self._offsets = dict(_read_entries(self._map))
+
+    def _add(self, key):
+        encoded = key.encode('utf-8')
+        used = _HEADER.unpack_from(self._map, 0)[0]
+        value_offset = _padded(used + _KEY_LENGTH.size + len(encoded))
+        end = value_offset + _VALUE.size
+        if end > self._size:
+            while end > self._size:
+                self._size *= 2
+            self._map.close()
+            os.ftruncate(self._fd, self._size)
+            self._map = mmap.mmap(self._fd, self._size)
+        _KEY_LENGTH.pack_into(self._map, used, len(encoded))
+        self._map[used + _KEY_LENGTH.size:used + _KEY_LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, value_offset, 0.0, 0.0)
+        _HEADER.pack_into(self._map, 0, end)
+        self._offsets[key] = value_offset
+        return value_offset
+
+    def inc(self, key, amount):
+        with self._lock:
+            offset = self._offsets.get(key) or self._add(key)
+            value = _VALUE.unpack_from(self._map, offset)[0]
+            _VALUE.pack_into(self._map, offset, value + amount, time.time())
+
+    def set(self, key, value):
+        with self._lock:
+            offset = self._offsets.get(key) or self._add(key)
+            _VALUE.pack_into(self._map, offset, value, time.time())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _open_metrics_file():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsFile(settings.METRICS_DIR, os.getpid())
+        return _store
+
+
+def _metrics_file():
+    """This process's MetricsFile, opened on first use"""
+    return _store or _open_metrics_file()
+
+
+def _forget_metrics_file(**kwargs):
+    """A forked worker (or a new METRICS_DIR) starts a file of its own"""
+    global _store
+    if kwargs.get('setting', 'METRICS_DIR') == 'METRICS_DIR':
+        _store = None
+
+
+os.register_at_fork(after_in_child=_forget_metrics_file)
+setting_changed.connect(_forget_metrics_file)
+
+
+def read_samples(directory):
+    """{key: (value, updated)} of every metrics file in `directory`, per file"""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.db')):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if len(data) < _HEADER.size:
+            continue
+        yield {key: _VALUE.unpack_from(data, offset) for key, offset in _read_entries(data)}
+
+
+def clear_metrics_dir(directory=None):
+    """Delete every metrics file (run before the server starts)"""
+    deleted = 0
+    for path in glob.glob(os.path.join(directory or settings.METRICS_DIR, 'metrics-*.db')):
+        os.remove(path)
+        deleted += 1
+    return deleted
+
+
+# ==================== METRIC TYPES ====================
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def _key(self, suffix, labels):
+        """The file key of one sample, cached per label values"""
+        cache_key = (suffix, *labels.items())
+        key = self._keys.get(cache_key)
+        if key is None:
+            if set(labels) != set(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+            key = json.dumps([self.name, suffix, [str(labels[name]) for name in self.labelnames]])
+            self._keys[cache_key] = key
+        return key
+
+
+class Counter(Metric):
+    """A total that only goes up"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _metrics_file().inc(self._key('', labels), amount)
+
+
+class Gauge(Metric):
+    """A value that is set; across processes the most recently set one wins"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        _metrics_file().set(self._key('', labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Set the gauge to the seconds the block took (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.set(time.perf_counter() - start, **labels)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values over fixed buckets
+    Each observation updates one bucket; cumulative counts are built when
+    the metrics are rendered.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_labels = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+
+    def observe(self, value, **labels):
+        store = _metrics_file()
+        bucket = self.bucket_labels[bisect.bisect_left(self.buckets, value)]
+        store.inc(self._key(bucket, labels), 1)
+        store.inc(self._key('_sum', labels), value)
+
+
+# ==================== FARM2HOME METRICS ====================
+
+VIEW_LATENCY = Histogram(
+    'farm2home_view_latency_seconds', 'Time to serve a request, by view', ['view'], LATENCY_BUCKETS,
+)
+VIEW_DB_TIME = Histogram(
+    'farm2home_view_db_seconds', 'Database time of sampled requests, by view', ['view'], DB_TIME_BUCKETS,
+)
+ORDERS_CREATED = Counter(
+    'farm2home_orders_created_total', 'Orders created through checkout',
+)
+CHECKOUT_FAILURES = Counter(
+    'farm2home_checkout_failures_total', 'Checkout requests that did not create an order, by exception',
+    ['exception'],
+)
+EMAILS_SENT = Counter(
+    'farm2home_emails_sent_total', 'Emails delivered by the email queue, by template', ['template'],
+)
+EMAILS_FAILED = Counter(
+    'farm2home_emails_failed_total', 'Failed email delivery attempts, by template', ['template'],
+)
+STRIPE_CALL_SECONDS = Gauge(
+    'farm2home_stripe_call_seconds', 'Duration of the latest Stripe API call, by call', ['call'],
+)
+
+
+# ==================== EXPOSITION ====================
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"') + '"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def collect(directory=None):
+    """
+    Merged samples of all processes
+
+    Returns:
+        dict: {metric name: {(suffix, label values): value}}
+    """
+    merged, updated = {}, {}
+    for samples in read_samples(directory or settings.METRICS_DIR):
+        for key, (value, timestamp) in samples.items():
+            name, suffix, label_values = json.loads(key)
+            metric = REGISTRY.get(name)
+            if metric is None:
+                continue  # Renamed or removed since the file was written
+            values = merged.setdefault(name, {})
+            sample = (suffix, tuple(label_values))
+            if metric.kind == 'gauge':
+                if timestamp >= updated.get((name, sample), 0):
+                    values[sample] = value
+                    updated[name, sample] = timestamp
+            else:
+                values[sample] = values.get(sample, 0.0) + value
+    return merged
+
+
+def render_metrics(directory=None):
+    """All registered metrics in the Prometheus text exposition format (0.0.4)"""
+    merged = collect(directory)
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        values = merged.get(name, {})
+        if metric.kind != 'histogram':
+            for (_, label_values), value in sorted(values.items()):
+                lines.append(f'{name}{_format_labels(zip(metric.labelnames, label_values))} {_format_value(value)}')
+            continue
+        for label_values in sorted({label_values for _, label_values in values}):
+            pairs = list(zip(metric.labelnames, label_values))
+            count = 0.0
+            for bucket in metric.bucket_labels:
+                count += values.get((bucket, label_values), 0.0)
+                lines.append(f'{name}_bucket{_format_labels(pairs + [("le", bucket)])} {_format_value(count)}')
+            lines.append(f'{name}_sum{_format_labels(pairs)} {_format_value(values.get(("_sum", label_values), 0.0))}')
+            lines.append(f'{name}_count{_format_labels(pairs)} {_format_value(count)}')
+    return '\n'.join(lines) + '\n'
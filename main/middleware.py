@@ -0,0 +1,173 @@
+"""
+Request Middleware for Farm2Home
+RequestIDMiddleware gives every request an ID (the caller's X-Request-ID or a
+new one) that is stamped on its log lines (main/structured_logging.py) and
+echoed in the X-Request-ID response header.
+RequestMetricsMiddleware records, for a sample of requests (REQUEST_METRICS_SAMPLE_RATE):
+- the view that handled it, total wall time and time spent in the database
+- the number of queries, through a database execute wrapper
+- repeated queries: statements run REQUEST_METRICS_DUPLICATE_THRESHOLD or more
+  times with only their parameters changing - the signature of an N+1 loop
+and reports them
+- in a Server-Timing header (db, app and total), shown by the browser's
+  developer tools next to the request
+- as one "request" event on the main.requests logger (WARNING when the request
+  repeated queries or took longer than REQUEST_METRICS_SLOW_MS)
+- in the farm2home_view_db_seconds histogram (main/metrics.py)
+Every request, sampled or not, is timed into farm2home_view_latency_seconds.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import VIEW_DB_TIME, VIEW_LATENCY
+from .structured_logging import new_request_id, request_id_var
+
+logger = logging.getLogger('main.requests')
+
+# Placeholder lists of any length - IN (%s, %s, ...) - and numeric literals
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:%s|\?)(?:\s*,\s*(?:%s|\?))*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+# X-Request-ID values accepted from callers (anything else gets a new ID)
+_REQUEST_ID_RE = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Characters of a repeated statement included in the log line
+SQL_PREVIEW_LENGTH = 200
+
+
+def query_fingerprint(sql):
+    """
+    Normalized statement and a short hash of it
+    Statements that differ only in parameters, IN-list length or numeric
+    literals (LIMIT 21) share a fingerprint.
+    """
+    normalized = _NUMBER_RE.sub('?', _PLACEHOLDER_LIST_RE.sub('(...)', sql))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+
+def view_name(request):
+    """Namespaced name of the view that handled the request ('unmatched' for 404s)"""
+    match = request.resolver_match
+    return match.view_name if match else 'unmatched'
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing every statement"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """[(fingerprint, count, normalized sql)] run at least `threshold` times, most first"""
+        if self.count < threshold:
+            return []
+        counts, examples = Counter(), {}
+        for sql, count in self.statements.items():
+            fingerprint, normalized = query_fingerprint(sql)
+            counts[fingerprint] += count
+            examples.setdefault(fingerprint, normalized)
+        return [
+            (fingerprint, count, examples[fingerprint])
+            for fingerprint, count in counts.most_common()
+            if count >= threshold
+        ]
+
+
+class RequestIDMiddleware:
+    """Sets the request ID for log correlation (see module docstring)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID_RE.fullmatch(request_id):
+            request_id = new_request_id()
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request timing and query instrumentation (see module docstring)
+    Put it right after RequestIDMiddleware, so the timings cover the other
+    middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        self.duplicate_threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        self.slow_ms = settings.REQUEST_METRICS_SLOW_MS
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            VIEW_LATENCY.observe(time.perf_counter() - start, view=view_name(request))
+            return response
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        view = view_name(request)
+        VIEW_LATENCY.observe(total, view=view)
+        VIEW_DB_TIME.observe(recorder.duration, view=view)
+        total_ms = total * 1000
+        db_ms = recorder.duration * 1000
+
+        timing = (
+            f'db;dur={db_ms:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total_ms - db_ms:.2f}, total;dur={total_ms:.2f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        repeated = recorder.repeated(self.duplicate_threshold)
+        level = logging.WARNING if repeated or total_ms >= self.slow_ms else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, 'request', extra={
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'db_ms': round(db_ms, 2),
+                'queries': recorder.count,
+                'repeated_queries': [
+                    {'fingerprint': fingerprint, 'count': count, 'sql': sql[:SQL_PREVIEW_LENGTH]}
+                    for fingerprint, count, sql in repeated
+                ],
+            })
+        return response
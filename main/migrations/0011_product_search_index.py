@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# Trigram index over the product search document used by main/search.py.
+# The expression must match SEARCH_DOCUMENT_SQL exactly for PostgreSQL to use
+# it for both LIKE '%term%' and the word similarity operator (<%).
+SEARCH_DOCUMENT_SQL = (
+    "LOWER(name || ' ' || local_name || ' ' || category || ' ' || COALESCE(slug, ''))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases use the in-memory search index instead
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS main_product_search_trgm '
+        f'ON main_product USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS main_product_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_delete_paymentmethod'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
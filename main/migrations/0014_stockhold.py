@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('hold_id', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='main.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='main.product')),
+            ],
+            options={
+                'ordering': ['hold_id'],
+                'indexes': [models.Index(fields=['expires_at'], name='stock_hold_expires_idx')],
+                'unique_together': {('customer', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_customer_stats(apps, schema_editor):
+    # Same as main.customer_stats.rebuild_customer_stats(), on the historical models
+    Order = apps.get_model('main', 'Order')
+    CustomerStats = apps.get_model('main', 'CustomerStats')
+    CustomerDailySpend = apps.get_model('main', 'CustomerDailySpend')
+
+    totals = Order.objects.order_by().values('customer_id').annotate(
+        total_orders=Count('order_id'),
+        total_spent=Sum('total_amount'),
+    )
+    CustomerStats.objects.bulk_create([
+        CustomerStats(customer_id=row['customer_id'], total_orders=row['total_orders'],
+                      total_spent=row['total_spent'] or 0)
+        for row in totals
+    ], batch_size=1000)
+
+    days = (
+        Order.objects.order_by().annotate(day=TruncDate('order_date'))
+        .values('customer_id', 'day').annotate(amount_spent=Sum('total_amount'))
+    )
+    CustomerDailySpend.objects.bulk_create([
+        CustomerDailySpend(customer_id=row['customer_id'], day=row['day'], amount_spent=row['amount_spent'])
+        for row in days if row['amount_spent']
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main.customer')),
+                ('total_orders', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Customer stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerDailySpend',
+            fields=[
+                ('daily_spend_id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('amount_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spend', to='main.customer')),
+            ],
+            options={
+                'unique_together': {('customer', 'day')},
+            },
+        ),
+        migrations.RunPython(build_customer_stats, migrations.RunPython.noop),
+    ]
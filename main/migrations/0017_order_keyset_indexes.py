@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_customerstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-order_date', '-order_id'], name='order_customer_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-order_date', '-order_id'], name='order_date_keyset_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_customer_date_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 import uuid
 from datetime import timedelta
 from django.utils import timezone
@@ -10,6 +11,14 @@ class Customer(models.Model):
     phone = models.CharField(max_length=15)
     password = models.CharField(max_length=128)  # Stores hashed password
 
+    class Meta:
+        indexes = [
+            # email__iexact compiles to UPPER(email) = UPPER(%s) on PostgreSQL
+            # (login, signup and password reset lookups)
+            models.Index(Upper('email'), name='customer_email_upper_idx'),
+            models.Index(fields=['phone'], name='customer_phone_idx'),  # Signup duplicate check
+        ]
+
     def __str__(self):
         return self.name
 
@@ -40,6 +49,14 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Active catalog in "featured" order (category, name)
+            models.Index(fields=['is_active', 'category', 'name'], name='product_active_cat_name_idx'),
+            models.Index(fields=['season'], name='product_season_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),  # Price filters and sorts
+        ]
+
     def __str__(self):
         return self.name
     
@@ -75,6 +92,15 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     payment = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # A customer's orders, most recent first, paged on (order_date, order_id)
+            # (order history endpoints - see main/pagination.py)
+            models.Index(fields=['customer', '-order_date', '-order_id'], name='order_customer_keyset_idx'),
+            # All orders, same paging (OrderViewSet without a customer filter)
+            models.Index(fields=['-order_date', '-order_id'], name='order_date_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.order_id} - {self.customer.name}"
 
@@ -99,6 +125,10 @@ class Cart(models.Model):
     class Meta:
         unique_together = ('customer', 'product')  # Prevent duplicate cart items
         ordering = ['-cart_id']  # Order by newest first to fix pagination warning
+        indexes = [
+            # A customer's cart in default ordering
+            models.Index(fields=['customer', '-cart_id'], name='cart_customer_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer.name} - {self.product.name} (x{self.quantity})"
@@ -126,6 +156,10 @@ class Address(models.Model):
         verbose_name = 'Address'
         verbose_name_plural = 'Addresses'
         ordering = ['-is_default', '-created_at']
+        indexes = [
+            # A customer's addresses, default first (address book, checkout)
+            models.Index(fields=['customer', '-is_default', '-created_at'], name='address_customer_default_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.name} - {self.label} ({self.city})"
@@ -149,6 +183,9 @@ class PasswordResetToken(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='reset_token_customer_idx'),
+        ]
     
     def __str__(self):
         return f"Reset token for {self.customer.email} - {self.token}"
@@ -164,3 +201,135 @@ class PasswordResetToken(models.Model):
         self.is_used = True
         self.save()
 
+
+
+class OutboundEmail(models.Model):
+    """
+    Durable outbound email queue
+    Emails are rendered and stored here by the send_* helpers in main/utils.py
+    and delivered by the process_email_queue worker (see main/email_queue.py)
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    email_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=50)  # welcome, order_confirmation, password_reset, ...
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # When a worker picked it up
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['email_id']
+        indexes = [
+            # Worker poll: due emails in queue order
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {self.to_email} ({self.status})"
+
+
+class StockHold(models.Model):
+    """
+    Stock set aside for a customer's cart until expires_at
+    Held quantities are already taken out of Inventory.stock_available; an
+    order consumes them and the release_stock_holds sweeper gives expired
+    ones back (see main/inventory.py)
+    """
+    hold_id = models.AutoField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="stock_holds")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_holds")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('customer', 'product')  # One hold per cart line
+        ordering = ['hold_id']
+        indexes = [
+            # Sweeper: expired holds
+            models.Index(fields=['expires_at'], name='stock_hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} for {self.customer.name}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a POST sent with an Idempotency-Key header
+    Retries with the same key are answered from here instead of running the
+    view again (see main/idempotency.py)
+    """
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In progress'),
+        ('COMPLETED', 'Completed'),
+    ]
+
+    idempotency_id = models.AutoField(primary_key=True)
+    scope = models.CharField(max_length=100)  # Endpoint the key was used on
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request body
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    response_status = models.PositiveIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    locked_at = models.DateTimeField(default=timezone.now)  # When the running request claimed it
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('scope', 'key')  # One winner per key
+        indexes = [
+            # Eviction: expired keys
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.key} ({self.status})"
+
+
+class CustomerStats(models.Model):
+    """
+    Lifetime order statistics of a customer, kept up to date as orders are
+    placed, edited or deleted (see main/customer_stats.py)
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    total_orders = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Customer stats"
+
+    def __str__(self):
+        return f"{self.customer.name}: {self.total_orders} orders, Rs. {self.total_spent}"
+
+
+class CustomerDailySpend(models.Model):
+    """
+    Amount a customer spent per day
+    The 30-day growth on the account page sums at most 60 of these rows
+    instead of the customer's whole order history
+    """
+    daily_spend_id = models.AutoField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="daily_spend")
+    day = models.DateField()
+    amount_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('customer', 'day')  # Also serves the per-customer date range lookups
+
+    def __str__(self):
+        return f"{self.customer.name} on {self.day}: Rs. {self.amount_spent}"
@@ -0,0 +1,96 @@
+"""
+Order Placement for Farm2Home
+Set-based building blocks used by the order serializers, so placing an order
+costs the same handful of queries whether the cart holds 1 item or 30:
+- load_order_products() reads every product and its inventory in one query
+- stock is taken for all products in one conditional UPDATE (see
+  main/inventory.py)
+- create_order_items() inserts every line item with one bulk_create
+- order_items_prefetch() loads the line items of many orders in one query
+"""
+
+from collections import OrderedDict
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Product, OrderItem
+
+
+def order_quantities(items):
+    """
+    Total quantity per product, in first-seen order
+    A product listed twice in one cart is checked and reserved as one line
+
+    Args:
+        items: list of {'product_id': ..., 'quantity': ...} dicts
+
+    Returns:
+        OrderedDict: product_id -> total quantity
+    """
+    quantities = OrderedDict()
+    for item in items:
+        product_id = item['product_id']
+        quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+    return quantities
+
+
+def load_order_products(product_ids, active_only=True):
+    """
+    Load the products for an order together with their inventory (one query)
+
+    Args:
+        product_ids: iterable of product ids
+        active_only: Skip inactive products
+
+    Returns:
+        dict: product_id -> Product (with inventory select_related)
+    """
+    products = Product.objects.select_related('inventory').filter(product_id__in=set(product_ids))
+    if active_only:
+        products = products.filter(is_active=True)
+    return {product.product_id: product for product in products}
+
+
+def order_total(items):
+    """Sum of quantity * price over all items"""
+    return sum((item['quantity'] * item['price'] for item in items), 0)
+
+
+def create_order_items(order, items):
+    """
+    Insert every line item with one bulk_create
+
+    The items are then loaded into order.order_items (with their products)
+    in one query, so the confirmation email and response serializer don't
+    run a query per item.
+
+    Args:
+        order: Saved Order instance
+        items: list of {'product_id': ..., 'quantity': ..., 'price': ...} dicts
+
+    Returns:
+        list: The created OrderItem instances
+    """
+    order_items = OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product_id=item['product_id'],
+            quantity=item['quantity'],
+            price=item['price'],
+        )
+        for item in items
+    ])
+    prefetch_related_objects([order], order_items_prefetch())
+    return order_items
+
+
+def order_items_prefetch():
+    """
+    Prefetch for an order's line items together with their products
+    Loads the items of any number of orders with one query; the order
+    serializers read only order.order_items.all(), so they add no queries.
+
+        Order.objects.filter(...).prefetch_related(order_items_prefetch())
+    """
+    return Prefetch('order_items', queryset=OrderItem.objects.select_related('product').order_by('item_id'))
+
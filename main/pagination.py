@@ -0,0 +1,132 @@
+"""
+Keyset (Cursor) Pagination for Farm2Home
+Order lists are paged on (order_date, order_id), newest first. The cursor is
+the position of the last order on the page, and the next page is
+
+    WHERE order_date <= :date AND NOT (order_date = :date AND order_id >= :id)
+    ORDER BY order_date DESC, order_id DESC LIMIT :page_size
+
+which walks the (customer, -order_date, -order_id) index from that position,
+so page 500 costs the same as page 1 (OFFSET would read and throw away every
+row before the page). Orders placed while a customer is paging never shift
+or repeat rows on later pages. Paging is forward-only.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(order_date, order_id):
+    """Opaque cursor for the position of an order"""
+    position = f"{order_date.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Position (order_date, order_id) of a cursor from encode_cursor()
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        position = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+        order_date, order_id = position.rsplit('|', 1)
+        order_date, order_id = datetime.fromisoformat(order_date), int(order_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if timezone.is_naive(order_date):
+        order_date = timezone.make_aware(order_date)
+    return order_date, order_id
+
+
+def orders_after(queryset, order_date, order_id):
+    """Orders that come after this position, newest first"""
+    return queryset.filter(order_date__lte=order_date).exclude(
+        order_date=order_date, order_id__gte=order_id
+    ).order_by('-order_date', '-order_id')
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    DRF pagination class for order lists (see module docstring)
+
+    Query Parameters:
+    - cursor: next_cursor of the previous page (omit for the first page)
+    - page_size: orders per page (default PAGE_SIZE, at most max_page_size)
+
+    Response: {"next": <url or null>, "next_cursor": <cursor or null>, "results": [...]}
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                order_date, order_id = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = orders_after(queryset, order_date, order_id)
+        else:
+            queryset = queryset.order_by('-order_date', '-order_id')
+
+        # One extra row tells us whether there is a next page
+        orders = list(queryset[:self.page_size + 1])
+        self.has_next = len(orders) > self.page_size
+        orders = orders[:self.page_size]
+        self.next_cursor = (
+            encode_cursor(orders[-1].order_date, orders[-1].order_id) if self.has_next else None
+        )
+        return orders
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_cursor(self):
+        return self.next_cursor
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,421 @@
+"""
+Product Search for Farm2Home
+Relevance-ranked product search over name, local name, category and slug
+with word-prefix and fuzzy (trigram) matching
+
+Backends:
+- PostgreSQL: pg_trgm word_similarity, served by a GIN trigram index on the
+  search document (migration 0011_product_search_index)
+- Anything else (SQLite test runs): a pure-Python trigram index built from
+  the in-memory catalog snapshot, kept in sync by the catalog signals
+
+Both backends score a match the same way:
+    word_similarity(term, document)
+    + 2.0 if the product name starts with the term
+    + 1.5 else if any word of the document starts with the term
+    + 1.0 else if the document contains the term
+A product matches if it contains the term or its word similarity reaches
+WORD_SIMILARITY_THRESHOLD (pg_trgm's default, so "tomatoe" finds Tomato).
+"""
+
+import heapq
+import re
+from collections import Counter
+from math import ceil
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField
+
+from .models import Product
+
+
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+# pg_trgm treats alphanumerics as word characters (underscore is not)
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Must match the indexed expression in migration 0011 exactly
+SEARCH_DOCUMENT_SQL = (
+    "LOWER(name || ' ' || local_name || ' ' || category || ' ' || COALESCE(slug, ''))"
+)
+
+
+def normalize_search_term(term):
+    """Lowercase and collapse whitespace in a search term"""
+    return ' '.join((term or '').lower().split())
+
+
+def search_document(name, local_name, category, slug):
+    """Python equivalent of SEARCH_DOCUMENT_SQL"""
+    return f"{name} {local_name} {category} {slug or ''}".lower()
+
+
+def word_trigrams(word):
+    """pg_trgm style trigrams of a single word (padded '  word ')"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_set(text):
+    """pg_trgm style trigram set of a string"""
+    result = set()
+    for word in _WORD_RE.findall(text.lower()):
+        result |= word_trigrams(word)
+    return result
+
+
+def _match_bonus(term, name, document):
+    if name.lower().startswith(term):
+        return 2.0
+    if (' ' + document).find(' ' + term) != -1:
+        return 1.5
+    if term in document:
+        return 1.0
+    return 0.0
+
+
+class ProductSearchIndex:
+    """
+    Pure-Python trigram index over product search documents
+
+    - vocabulary: word -> pg_trgm trigram set, shared by every product using it
+    - postings: trigram -> words, used to find fuzzy candidates per word rather
+      than per product (the vocabulary grows far slower than the catalog)
+    - substrings: raw 3-character window -> product ids, used to narrow
+      "contains" checks to products that can possibly contain the term
+    """
+
+    def __init__(self, documents, threshold=WORD_SIMILARITY_THRESHOLD):
+        """
+        Args:
+            documents: iterable of (product_id, name, local_name, category, slug)
+        """
+        self.threshold = threshold
+        self.names = {}
+        self.sort_names = {}
+        self.documents = {}
+        self.document_words = {}
+        self.vocabulary = {}
+        self.word_products = {}
+        self.postings = {}
+        self.substrings = {}
+
+        for product_id, name, local_name, category, slug in documents:
+            document = search_document(name, local_name, category, slug)
+            self.names[product_id] = name
+            self.sort_names[product_id] = name.lower()
+            self.documents[product_id] = document
+
+            doc_words = tuple(_WORD_RE.findall(document))
+            self.document_words[product_id] = doc_words
+            for word in doc_words:
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = trigrams = frozenset(word_trigrams(word))
+                    for trigram in trigrams:
+                        self.postings.setdefault(trigram, []).append(word)
+                self.word_products.setdefault(word, set()).add(product_id)
+            for i in range(len(document) - 2):
+                self.substrings.setdefault(document[i:i + 3], set()).add(product_id)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the index from catalog snapshot ProductRecords"""
+        return cls(
+            (r.product_id, r.row_summer['name'], r.row_summer['variety'],
+             r.row_summer['category'], r.row_summer['slug'])
+            for r in records
+        )
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _containing(self, term):
+        """Product ids whose document contains term"""
+        if len(term) < 3:
+            return {pid for pid, doc in self.documents.items() if term in doc}
+        lists = [self.substrings.get(term[i:i + 3]) for i in range(len(term) - 2)]
+        if not all(lists):
+            return set()
+        candidates = set.intersection(*sorted(lists, key=len))
+        return {pid for pid in candidates if term in self.documents[pid]}
+
+    def _extent_similarity(self, query, span, product_id, extent_scores):
+        """Most query trigrams found in any run of `span` words of a product"""
+        words = self.document_words[product_id]
+        vocabulary = self.vocabulary
+        best = 0
+        for i in range(len(words)):
+            extent = words[i:i + span]
+            # Many products share words, so each extent is scored only once
+            score = extent_scores.get(extent)
+            if score is None:
+                trigrams = frozenset().union(*[vocabulary[w] for w in extent])
+                score = extent_scores[extent] = len(query & trigrams)
+            if score > best:
+                best = score
+        return best
+
+    def _shared_trigrams(self, query, span, containing):
+        """
+        Count the query trigrams each candidate product shares with its best
+        matching word (or run of `span` words for multi-word queries)
+
+        Returns:
+            dict: product_id -> shared trigram count
+        """
+        counts = Counter()
+        for trigram in query:
+            counts.update(self.postings.get(trigram, ()))
+
+        # Shared trigrams bound the word similarity from above, so only words
+        # sharing enough of them can produce a fuzzy match
+        needed = ceil(round(self.threshold * len(query) / span, 6))
+
+        shared = {}
+        if span == 1:
+            # Visit words best first - the first score a product gets is its best
+            for word, count in sorted(counts.items(), key=lambda item: -item[1]):
+                for product_id in self.word_products[word]:
+                    if product_id not in shared:
+                        shared[product_id] = count
+            return {
+                product_id: count for product_id, count in shared.items()
+                if count >= needed or product_id in containing
+            }
+
+        candidates = set(containing)
+        for word, count in counts.items():
+            if count >= needed:
+                candidates.update(self.word_products[word])
+        extent_scores = {}
+        for product_id in candidates:
+            shared[product_id] = self._extent_similarity(query, span, product_id, extent_scores)
+        return shared
+
+    def search(self, term, limit=None):
+        """
+        Search the index
+
+        Returns:
+            list: Matching product ids, best match first
+        """
+        term = normalize_search_term(term)
+        if not term:
+            return []
+
+        query = trigram_set(term)
+        span = max(1, len(_WORD_RE.findall(term)))
+        containing = self._containing(term)
+        shared = self._shared_trigrams(query, span, containing) if query else {}
+
+        ranked = []
+        for product_id in containing.union(shared):
+            similarity = shared.get(product_id, 0) / len(query) if query else 0.0
+            if similarity < self.threshold and product_id not in containing:
+                continue
+            name = self.names[product_id]
+            score = similarity + _match_bonus(term, name, self.documents[product_id])
+            ranked.append((-score, self.sort_names[product_id], product_id))
+
+        ranked = heapq.nsmallest(limit, ranked) if limit else sorted(ranked)
+        return [product_id for _, _, product_id in ranked]
+
+
+# ==================== AUTOCOMPLETE ====================
+
+MAX_SUGGESTIONS = 20
+
+# Suggestion ranks: whole English name, whole local name, any later word
+_NAME, _LOCAL_NAME, _WORD = 0, 1, 2
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+
+class ProductSuggestTrie:
+    """
+    Prefix trie over English and local (Urdu) product names for search-as-you-type
+
+    Every product is inserted under its full name, its full local name and
+    from the start of each later word ("gourd" finds Bitter Gourd). Each node
+    stores the best MAX_SUGGESTIONS products for its prefix, so a lookup is a
+    walk of len(prefix) dictionary steps with no sorting at query time.
+    """
+
+    def __init__(self, names, max_suggestions=MAX_SUGGESTIONS):
+        """
+        Args:
+            names: iterable of (product_id, name, local_name)
+        """
+        self.max_suggestions = max_suggestions
+        self.root = _TrieNode()
+
+        for product_id, name, local_name in names:
+            sort_name = name.lower()
+            for rank, text in ((_NAME, name), (_LOCAL_NAME, local_name)):
+                words = normalize_search_term(text).split()
+                for i in range(len(words)):
+                    entry = (rank if i == 0 else _WORD, sort_name, product_id)
+                    self._insert(' '.join(words[i:]), entry)
+
+        self._finalize(self.root)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the trie from catalog snapshot ProductRecords"""
+        return cls(
+            (r.product_id, r.row_summer['name'], r.row_summer['variety'])
+            for r in records
+        )
+
+    def _insert(self, key, entry):
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.entries.append(entry)
+
+    def _finalize(self, root):
+        """Sort, de-duplicate and trim the entries of every node"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            product_ids = []
+            seen = set()
+            for _, _, product_id in sorted(node.entries):
+                if product_id not in seen:
+                    seen.add(product_id)
+                    product_ids.append(product_id)
+                    if len(product_ids) == self.max_suggestions:
+                        break
+            node.entries = product_ids
+            stack.extend(node.children.values())
+
+    def suggest(self, prefix, limit=8):
+        """
+        Look up products whose name, local name or a word of either starts
+        with prefix
+
+        Returns:
+            list: Product ids, best suggestion first
+        """
+        node = self.root
+        for char in normalize_search_term(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.entries[:limit]
+
+
+def suggest_products(prefix, limit=8):
+    """
+    Search-as-you-type suggestions from the catalog snapshot's prefix trie
+
+    Returns:
+        list: dicts with id, name, variety, category, slug and image
+    """
+    from .catalog import catalog_engine
+    snapshot = catalog_engine.snapshot()
+
+    suggestions = []
+    for product_id in snapshot.suggest_trie.suggest(prefix, limit):
+        row = snapshot.records[product_id].row_summer
+        suggestions.append({
+            'id': row['id'],
+            'name': row['name'],
+            'variety': row['variety'],
+            'category': row['category'],
+            'slug': row['slug'],
+            'image': row['image'],
+        })
+    return suggestions
+
+
+# ==================== POSTGRESQL BACKEND ====================
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search_postgres(term, limit=None):
+    """Ranked search using pg_trgm; WHERE clause is served by the GIN index"""
+    escaped = _like_escape(term)
+    sql = f"""
+        SELECT product_id FROM (
+            SELECT product_id, name,
+                   word_similarity(%(term)s, {SEARCH_DOCUMENT_SQL}) +
+                   CASE WHEN LOWER(name) LIKE %(prefix)s THEN 2.0
+                        WHEN ' ' || {SEARCH_DOCUMENT_SQL} LIKE %(word_prefix)s THEN 1.5
+                        WHEN {SEARCH_DOCUMENT_SQL} LIKE %(contains)s THEN 1.0
+                        ELSE 0 END AS score
+            FROM {Product._meta.db_table}
+            WHERE is_active
+              AND ({SEARCH_DOCUMENT_SQL} LIKE %(contains)s
+                   OR %(term)s <%% {SEARCH_DOCUMENT_SQL})
+        ) ranked
+        ORDER BY score DESC, LOWER(name), product_id
+    """
+    params = {
+        'term': term,
+        'prefix': escaped + '%',
+        'word_prefix': '% ' + escaped + '%',
+        'contains': '%' + escaped + '%',
+    }
+    if limit:
+        sql += ' LIMIT %(limit)s'
+        params['limit'] = limit
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def use_postgres_search():
+    """True when searches should be answered by PostgreSQL"""
+    backend = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'postgres'
+
+
+# ==================== PUBLIC API ====================
+
+def search_products(term, limit=None, snapshot=None):
+    """
+    Relevance-ranked search over active products
+
+    Args:
+        term: Search string (typos allowed)
+        limit: Optional maximum number of results
+        snapshot: CatalogSnapshot to search when using the in-memory backend
+                  (defaults to the current catalog snapshot)
+
+    Returns:
+        list: Matching product ids, best match first
+    """
+    term = normalize_search_term(term)
+    if not term:
+        return []
+
+    if use_postgres_search():
+        return _search_postgres(term, limit)
+
+    if snapshot is None:
+        from .catalog import catalog_engine
+        snapshot = catalog_engine.snapshot()
+    return snapshot.search_index.search(term, limit)
+
+
+def relevance_ordering(product_ids):
+    """ORDER BY expression that keeps querysets in search_products() order"""
+    return Case(
+        *[When(product_id=product_id, then=Value(position))
+          for position, product_id in enumerate(product_ids)],
+        default=Value(len(product_ids)),
+        output_field=IntegerField(),
+    )
@@ -1,5 +1,10 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import serializers
-from .models import Customer, Product, Inventory, Order, OrderItem, Cart, Address
+from .models import Customer, Product, Inventory, Order, OrderItem, Cart, Address, StockHold
+from .inventory import InsufficientStockError, checkout_stock, held_quantity, reserve_stock
+from .orders import load_order_products, order_quantities, order_total, create_order_items
+from .customer_stats import order_stats, growth_percentage
 
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -33,49 +38,33 @@ class CustomerProfileSerializer(serializers.ModelSerializer):
                   'total_spent', 'total_orders', 'growth_percentage']
         read_only_fields = ['customer_id']
     
+    def _stats(self, obj):
+        """
+        Order statistics from the customer stats rollup, read once per customer
+        Annotated by customer_profile_api (one query for the whole profile);
+        otherwise one query of its own (see main/customer_stats.py)
+        """
+        stats = getattr(obj, '_order_stats', None)
+        if stats is None:
+            stats = obj._order_stats = order_stats(obj)
+        return stats
+    
     def get_total_spent(self, obj):
         """Calculate total amount spent by customer across all orders"""
-        from django.db.models import Sum
-        total = obj.orders.aggregate(total=Sum('total_amount'))['total']
+        total = self._stats(obj)['total_spent']
         return float(total) if total else 0.0
     
     def get_total_orders(self, obj):
         """Get total number of orders for this customer"""
-        return obj.orders.count()
+        return self._stats(obj)['total_orders']
     
     def get_growth_percentage(self, obj):
         """
         Calculate growth percentage based on recent vs older orders
         Compares last 30 days spending vs previous 30 days
-        Returns None if insufficient data
         """
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.db.models import Sum
-        
-        now = timezone.now()
-        last_30_days = now - timedelta(days=30)
-        previous_60_to_30_days = now - timedelta(days=60)
-        
-        # Get spending in last 30 days
-        recent_spending = obj.orders.filter(
-            order_date__gte=last_30_days
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Get spending in previous 30 days (30-60 days ago)
-        previous_spending = obj.orders.filter(
-            order_date__gte=previous_60_to_30_days,
-            order_date__lt=last_30_days
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Calculate percentage change
-        if previous_spending > 0:
-            growth = ((recent_spending - previous_spending) / previous_spending) * 100
-            return round(growth, 1)
-        elif recent_spending > 0:
-            return 100.0  # 100% growth if spending started in last 30 days
-        else:
-            return 0.0  # No growth if no spending in either period
+        stats = self._stats(obj)
+        return growth_percentage(stats['recent_spending'], stats['previous_spending'])
 
 
 class InventorySerializer(serializers.ModelSerializer):
@@ -211,6 +200,108 @@ class ProductListSerializer(serializers.ModelSerializer):
             return 0
 
 
+# ==================== FAST PATH ROW RENDERERS ====================
+# Render the same output as the product serializers above directly from
+# values_list() tuples, skipping model instances and DRF field machinery.
+# Used for the catalog snapshot and product list endpoints.
+
+CATALOG_SEASON_DISPLAY = {
+    'SUMMER': 'summer',
+    'WINTER': 'winter',
+    'ALL_YEAR': 'year-round'
+}
+
+
+def _memoized(to_representation):
+    """
+    Memoize a field's to_representation per distinct value
+    Prices and discounts repeat heavily, and Decimal quantizing dominates
+    """
+    cache = {}
+
+    def render(value):
+        try:
+            return cache[value]
+        except KeyError:
+            result = cache[value] = to_representation(value)
+            return result
+    return render
+
+
+class ProductCatalogRowRenderer:
+    """
+    Fast path for ProductCatalogSerializer
+    Rows must be values_list(*ProductCatalogRowRenderer.value_fields) tuples.
+    The current month (for inSeasonNow) is computed once per renderer instead
+    of once per product.
+    """
+    value_fields = (
+        'product_id', 'name', 'local_name', 'price', 'image', 'category',
+        'season', 'inventory__stock_available', 'discount', 'slug',
+    )
+
+    def __init__(self, month=None):
+        import datetime
+        if month is None:
+            month = datetime.datetime.now().month
+
+        # Summer months: 5-9 (May to September)
+        is_summer = month in [5, 6, 7, 8, 9]
+        self.in_season = {'ALL_YEAR': True, 'SUMMER': is_summer, 'WINTER': not is_summer}
+
+        # Reuse the serializer's own decimal fields so formatting stays identical
+        fields = ProductCatalogSerializer().fields
+        self.render_price = _memoized(fields['price'].to_representation)
+        self.render_discount = _memoized(fields['discount'].to_representation)
+
+    def render(self, row):
+        (product_id, name, local_name, price, image, category,
+         season, stock, discount, slug) = row
+        return {
+            'id': product_id,
+            'name': name,
+            'variety': local_name,
+            'price': self.render_price(price),
+            'image': image if image else f'/static/images/{category}/default.png',
+            'category': category,
+            'season': CATALOG_SEASON_DISPLAY.get(season, 'year-round'),
+            'inStock': stock is not None and stock > 0,
+            'inSeasonNow': self.in_season.get(season, False),
+            'stock_available': stock if stock is not None else 0,
+            'discount': self.render_discount(discount),
+            'slug': slug,
+        }
+
+    def render_many(self, rows):
+        render = self.render
+        return [render(row) for row in rows]
+
+
+class ProductListRowRenderer:
+    """
+    Fast path for ProductListSerializer
+    Rows must be values_list(*ProductListRowRenderer.value_fields) tuples
+    """
+    value_fields = ('product_id', 'name', 'category', 'price', 'inventory__stock_available')
+
+    def __init__(self):
+        self.render_price = _memoized(ProductListSerializer().fields['price'].to_representation)
+
+    def render(self, row):
+        product_id, name, category, price, stock = row
+        return {
+            'product_id': product_id,
+            'name': name,
+            'category': category,
+            'price': self.render_price(price),
+            'stock_available': stock if stock is not None else 0,
+        }
+
+    def render_many(self, rows):
+        render = self.render
+        return [render(row) for row in rows]
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Serializer for OrderItem model"""
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -250,7 +341,7 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def get_items_count(self, obj):
         """Get total number of items in order"""
-        return obj.order_items.count()
+        return len(obj.order_items.all())
 
 
 class OrderSummarySerializer(serializers.ModelSerializer):
@@ -272,17 +363,18 @@ class OrderSummarySerializer(serializers.ModelSerializer):
         """
         Get product names from order items
         Returns first 2 product names, then '+X more' if more exist
+        Reads the prefetched items (see main/orders.order_items_prefetch)
         """
-        order_items = obj.order_items.select_related('product').all()
+        order_items = list(obj.order_items.all())
         
-        if not order_items.exists():
+        if not order_items:
             return "No items"
         
         # Get first 2 product names
         product_names = [item.product.name for item in order_items[:2]]
         
         # Add "+X more" if there are more than 2 items
-        remaining = order_items.count() - 2
+        remaining = len(order_items) - 2
         if remaining > 0:
             product_names.append(f"+{remaining} more")
         
@@ -349,7 +441,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         """
         Get total number of items in this order
         """
-        return obj.order_items.count()
+        return len(obj.order_items.all())
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -365,63 +457,67 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         fields = ['customer', 'status', 'payment', 'items']
     
     def validate_items(self, value):
-        """Validate order items"""
+        """Validate order items (all products are loaded in one query)"""
         if not value:
             raise serializers.ValidationError("Order must contain at least one item.")
         
+        items = []
         for item in value:
             if 'product_id' not in item or 'quantity' not in item or 'price' not in item:
                 raise serializers.ValidationError(
                     "Each item must have 'product_id', 'quantity', and 'price'."
                 )
-            
+            try:
+                items.append({
+                    'product_id': int(item['product_id']),
+                    'quantity': int(item['quantity']),
+                    'price': Decimal(str(item['price'])),
+                })
+            except (TypeError, ValueError, InvalidOperation):
+                raise serializers.ValidationError(
+                    "Item 'product_id' and 'quantity' must be whole numbers and 'price' a number."
+                )
+        
+        products = load_order_products((item['product_id'] for item in items), active_only=False)
+        
+        for product_id, quantity in order_quantities(items).items():
             # Check if product exists
-            if not Product.objects.filter(product_id=item['product_id']).exists():
+            product = products.get(product_id)
+            if product is None:
                 raise serializers.ValidationError(
-                    f"Product with ID {item['product_id']} does not exist."
+                    f"Product with ID {product_id} does not exist."
                 )
             
             # Check stock availability
             try:
-                inventory = Inventory.objects.get(product_id=item['product_id'])
-                if inventory.stock_available < item['quantity']:
-                    product = Product.objects.get(product_id=item['product_id'])
-                    raise serializers.ValidationError(
-                        f"Insufficient stock for {product.name}. Available: {inventory.stock_available}"
-                    )
+                inventory = product.inventory
             except Inventory.DoesNotExist:
                 raise serializers.ValidationError(
-                    f"No inventory found for product ID {item['product_id']}."
+                    f"No inventory found for product ID {product_id}."
+                )
+            if inventory.stock_available < quantity:
+                raise serializers.ValidationError(
+                    f"Insufficient stock for {product.name}. Available: {inventory.stock_available}"
                 )
         
-        return value
+        return items
     
     def create(self, validated_data):
         """Create order with items and update inventory"""
+        from django.db import transaction
+        
         items_data = validated_data.pop('items')
         
-        # Create the order
-        order = Order.objects.create(**validated_data)
-        
-        # Calculate total amount and create order items
-        total = 0
-        for item_data in items_data:
-            order_item = OrderItem.objects.create(
-                order=order,
-                product_id=item_data['product_id'],
-                quantity=item_data['quantity'],
-                price=item_data['price']
-            )
-            total += order_item.quantity * order_item.price
+        with transaction.atomic():
+            # Take the stock with one conditional UPDATE
+            try:
+                reserve_stock(order_quantities(items_data))
+            except InsufficientStockError as e:
+                raise serializers.ValidationError({'items': [str(e)]})
             
-            # Update inventory
-            inventory = Inventory.objects.get(product_id=item_data['product_id'])
-            inventory.stock_available -= item_data['quantity']
-            inventory.save()
-        
-        # Update order total
-        order.total_amount = total
-        order.save()
+            # Create the order with its total, then all items with one INSERT
+            order = Order.objects.create(total_amount=order_total(items_data), **validated_data)
+            create_order_items(order, items_data)
         
         return order
 
@@ -449,15 +545,20 @@ class CartSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Validate cart item"""
-        product = data.get('product')
+        product = data.get('product') or getattr(self.instance, 'product', None)
         quantity = data.get('quantity', 1)
+        customer = data.get('customer') or getattr(self.instance, 'customer', None)
         
-        # Check if product has inventory
+        # Check if product has inventory (stock already held for this
+        # customer's cart counts as available to them)
         try:
             inventory = product.inventory
-            if inventory.stock_available < quantity:
+            available = inventory.stock_available
+            if customer is not None:
+                available += held_quantity(customer.customer_id, product.product_id)
+            if available < quantity:
                 raise serializers.ValidationError(
-                    f"Insufficient stock. Available: {inventory.stock_available}"
+                    f"Insufficient stock. Available: {available}"
                 )
         except Inventory.DoesNotExist:
             raise serializers.ValidationError(f"Product {product.name} is out of stock.")
@@ -647,42 +748,70 @@ class CheckoutOrderCreateSerializer(serializers.Serializer):
     customer_id = serializers.IntegerField(required=False, allow_null=True)
     
     def validate_items(self, value):
-        """Validate cart items"""
+        """
+        Validate cart items
+        Every product and its inventory is loaded in one query, however many
+        items the cart holds (see main/orders.py)
+        """
         if not value:
             raise serializers.ValidationError("Order must contain at least one item")
         
+        items = []
         for item in value:
             if 'product_id' not in item or 'quantity' not in item:
                 raise serializers.ValidationError(
                     "Each item must have 'product_id' and 'quantity'"
                 )
             
-            # Validate product exists and is active
             try:
-                product = Product.objects.get(product_id=item['product_id'], is_active=True)
-            except Product.DoesNotExist:
+                product_id = int(item['product_id'])
+                quantity = int(item['quantity'])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError("Item 'product_id' and 'quantity' must be whole numbers")
+            
+            # Validate quantity is positive
+            if quantity <= 0:
+                raise serializers.ValidationError("Item quantity must be greater than 0")
+            
+            items.append({'product_id': product_id, 'quantity': quantity})
+        
+        products = load_order_products(item['product_id'] for item in items)
+        
+        # Stock held for this customer's cart counts as available to them
+        held = {}
+        customer_id = self.initial_data.get('customer_id')
+        if customer_id:
+            held = dict(
+                StockHold.objects.filter(customer_id=customer_id, product_id__in=products)
+                .values_list('product_id', 'quantity')
+            )
+        
+        # Validate products exist, are active and have enough stock
+        # (a product listed twice is checked against its combined quantity)
+        for product_id, quantity in order_quantities(items).items():
+            product = products.get(product_id)
+            if product is None:
                 raise serializers.ValidationError(
-                    f"Product with ID {item['product_id']} not found or inactive"
+                    f"Product with ID {product_id} not found or inactive"
                 )
             
-            # Check stock availability
             try:
                 inventory = product.inventory
-                if inventory.stock_available < item['quantity']:
-                    raise serializers.ValidationError(
-                        f"Insufficient stock for {product.name}. "
-                        f"Available: {inventory.stock_available}, Requested: {item['quantity']}"
-                    )
             except Inventory.DoesNotExist:
                 raise serializers.ValidationError(
                     f"No inventory found for {product.name}"
                 )
             
-            # Validate quantity is positive
-            if item['quantity'] <= 0:
-                raise serializers.ValidationError("Item quantity must be greater than 0")
+            available = inventory.stock_available + held.get(product_id, 0)
+            if available < quantity:
+                raise serializers.ValidationError(
+                    f"Insufficient stock for {product.name}. "
+                    f"Available: {available}, Requested: {quantity}"
+                )
         
-        return value
+        # Reused by create() so the products aren't loaded twice
+        self._order_products = products
+        return items
     
     def validate(self, data):
         """Cross-field validation"""
@@ -730,7 +859,12 @@ class CheckoutOrderCreateSerializer(serializers.Serializer):
                     phone=shipping_data['phone']
                 )
             
-            # Step 2: Create the order
+            # Step 2: Take the stock, using the customer's cart holds first
+            # (main/inventory.py) - raises InsufficientStockError, rolling
+            # everything back, if another order bought it since validation
+            checkout_stock(customer.customer_id, order_quantities(items_data))
+            
+            # Step 3: Create the order
             # Determine payment method from billing data
             card_number = billing_data.get('cardNumber', '').strip()
             if card_number and len(card_number) >= 4:
@@ -738,36 +872,20 @@ class CheckoutOrderCreateSerializer(serializers.Serializer):
             else:
                 payment_method = "Cash on Delivery"
             
+            # Charge the current product price
+            products = self._order_products
+            for item_data in items_data:
+                item_data['price'] = products[item_data['product_id']].price
+            
             order = Order.objects.create(
                 customer=customer,
                 status='PENDING',
-                payment=payment_method
+                payment=payment_method,
+                total_amount=order_total(items_data)
             )
             
-            # Step 3: Create order items and calculate total
-            total_amount = 0
-            for item_data in items_data:
-                product = Product.objects.get(product_id=item_data['product_id'])
-                
-                # Create order item
-                order_item = OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=item_data['quantity'],
-                    price=product.price  # Use current product price
-                )
-                
-                # Add to total
-                total_amount += order_item.quantity * order_item.price
-                
-                # Update inventory
-                inventory = product.inventory
-                inventory.stock_available -= item_data['quantity']
-                inventory.save()
-            
-            # Step 4: Update order total
-            order.total_amount = total_amount
-            order.save()
+            # Step 4: Create all order items with one INSERT
+            create_order_items(order, items_data)
             
             # Step 5: Store shipping info as temporary attribute for email
             # (Not persisted to database, just for passing to email function)
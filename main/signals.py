@@ -0,0 +1,97 @@
+"""
+Model Signal Handlers for Farm2Home
+Keeps derived data (catalog snapshot, caches and the customer stats rollup)
+in sync with model changes
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, Inventory, Order
+from .catalog import catalog_engine
+from .customer_stats import ORDER_STATS_FIELDS, apply_order_changes, order_row
+
+
+# Product ids changed by the current thread and not yet applied to the catalog
+_pending = threading.local()
+
+
+def _pending_product_ids():
+    if not hasattr(_pending, 'product_ids'):
+        _pending.product_ids = set()
+    return _pending.product_ids
+
+
+def _apply_pending_catalog_changes():
+    """
+    Apply every pending product change to the catalog in one batch
+    A checkout touching 30 inventory rows registers 30 callbacks - the first
+    one does the work and the rest find nothing pending. Ids left behind by a
+    rolled-back transaction are simply re-read (unchanged) on the next commit.
+    """
+    product_ids = _pending_product_ids()
+    if not product_ids:
+        return
+    changed = list(product_ids)
+    product_ids.clear()
+    catalog_engine.apply_changes(changed)
+
+
+def catalog_products_changed(product_ids):
+    """
+    Refresh these products in the catalog once the current transaction commits
+    Call this after bulk writes that bypass model signals (queryset.update,
+    bulk_create) - see main/orders.py
+    """
+    _pending_product_ids().update(product_ids)
+    # Deferred until commit so a concurrent request can't re-cache old rows
+    transaction.on_commit(_apply_pending_catalog_changes)
+
+
+def _catalog_changed(product_id):
+    catalog_products_changed([product_id])
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Refresh the catalog when a product is created, edited or deleted"""
+    _catalog_changed(instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=Inventory)
+def inventory_changed(sender, instance, **kwargs):
+    """Refresh the catalog when a product's stock changes"""
+    _catalog_changed(instance.product_id)
+
+
+@receiver(pre_save, sender=Order)
+def order_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember what an existing order counted for in the stats rollup"""
+    instance._stats_before = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not {'customer', 'customer_id', 'total_amount', 'order_date'} & set(update_fields):
+        return
+    instance._stats_before = Order.objects.filter(pk=instance.pk).values_list(*ORDER_STATS_FIELDS).first()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Count a new order, or move an edited one, in the customer stats rollup"""
+    if raw:
+        return
+    before = getattr(instance, '_stats_before', None)
+    if created:
+        apply_order_changes(added=[order_row(instance)])
+    elif before is not None:
+        apply_order_changes(removed=[before], added=[order_row(instance)])
+    instance._stats_before = None
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    """Take a deleted order out of the customer stats rollup"""
+    apply_order_changes(removed=[order_row(instance)])
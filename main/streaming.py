@@ -0,0 +1,110 @@
+"""
+Streaming List Responses for Farm2Home
+List endpoints of viewsets that mix in StreamingListMixin can send every row
+in one response without building it in memory first:
+- ?stream=1: a JSON array, written row by row
+- ?stream=ndjson, ?format=ndjson or Accept: application/x-ndjson: NDJSON
+  (one JSON object per line)
+Rows are read with queryset.iterator(chunk_size=...) - a server-side cursor on
+PostgreSQL, prefetches done per chunk - serialized one at a time with the
+view's own serializer, and sent through StreamingHttpResponse in ~64 KB
+writes. Memory stays flat whether the list has 1 000 or 1 000 000 rows.
+Streamed lists are not paginated; without the opt-in, list() is unchanged.
+"""
+
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Rows fetched from the database per round trip
+STREAM_CHUNK_SIZE = 2000
+
+# Bytes collected before each write to the client
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def encode_row(row):
+    """One row as compact JSON (same encoder as DRF's JSONRenderer)"""
+    return json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def stream_rows(rows, ndjson=False):
+    """
+    Encode rows as a JSON array (or NDJSON) and yield it in WRITE_BUFFER_SIZE pieces
+
+    Args:
+        rows: iterable of serialized rows (dicts)
+        ndjson: One row per line instead of a JSON array
+    """
+    buffer = [] if ndjson else ['[']
+    size = 0
+    first = True
+    for row in rows:
+        text = encode_row(row)
+        if ndjson:
+            text += '\n'
+        elif not first:
+            text = ',' + text
+        first = False
+        buffer.append(text)
+        size += len(text)
+        if size >= WRITE_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if not ndjson:
+        buffer.append(']')
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders application/x-ndjson for responses that aren't streamed
+    (detail views, errors): lists and paginated pages become one line per
+    row, anything else a single line
+    """
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = data['results']
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(stream_rows(data, ndjson=True))
+
+
+class StreamingListMixin:
+    """
+    Opt-in streaming for a viewset's list() (see module docstring)
+    Put it before the viewset base class:
+
+        class OrderViewSet(StreamingListMixin, viewsets.ModelViewSet): ...
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    def list(self, request, *args, **kwargs):
+        ndjson = request.accepted_renderer.format == 'ndjson' or request.query_params.get('stream') == 'ndjson'
+        if not ndjson and request.query_params.get('stream') not in ('1', 'true', 'json'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        rows = (
+            serializer.to_representation(instance)
+            for instance in queryset.iterator(chunk_size=self.stream_chunk_size)
+        )
+        return StreamingHttpResponse(
+            stream_rows(rows, ndjson),
+            content_type=NDJSON_MEDIA_TYPE if ndjson else 'application/json',
+        )
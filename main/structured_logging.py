@@ -0,0 +1,184 @@
+"""
+Structured Logging for Farm2Home
+JSON-lines logging that keeps request threads off the output stream:
+- QueueLogHandler puts each record on a bounded in-memory queue and returns;
+  a background thread formats and writes them. When the queue is full new
+  records are dropped (and reported later) rather than blocking the request
+- JSONFormatter writes one JSON object per line: time, level, logger, event
+  (the message), request_id and the record's extra={...} fields
+- the request ID comes from RequestIDMiddleware (main/middleware.py) through a
+  context variable, so all lines of one request can be correlated
+- DEBUG records are sampled per request (LOG_DEBUG_SAMPLE_RATE): a sampled
+  request keeps all of its debug lines, the others keep none
+Log an event: logger.info('order_created', extra={'order_id': order.order_id})
+Configured in settings.LOGGING; benchmark: python manage.py benchmark_logging
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import weakref
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# ID of the request being served by this thread / task (None outside requests)
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+
+def new_request_id():
+    """Random 32-hex-digit ID; only used for correlation, so no need for os.urandom"""
+    return f'{random.getrandbits(128):032x}'
+
+# Standard LogRecord attributes - anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id',
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record (see module docstring)"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request ID and samples DEBUG records"""
+
+    def __init__(self, debug_sample_rate=1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record):
+        request_id = record.request_id = request_id_var.get()
+        if record.levelno > logging.DEBUG or self.debug_sample_rate >= 1:
+            return True
+        if request_id is None:
+            return random.random() < self.debug_sample_rate
+        # Hash the ID so every debug line of a request gets the same decision
+        return zlib.crc32(request_id.encode('utf-8')) < self.debug_sample_rate * 2 ** 32
+
+
+_handlers = weakref.WeakSet()
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Logging handler that leaves formatting and writing to a background thread
+
+    Args:
+        stream: Where the JSON lines go (default: sys.stderr)
+        queue_size: Records buffered before new ones are dropped
+        debug_sample_rate: Share of requests whose DEBUG records are kept
+    """
+
+    def __init__(self, stream=None, queue_size=10000, debug_sample_rate=1.0):
+        super().__init__(queue.Queue(queue_size))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JSONFormatter())
+        self.addFilter(RequestContextFilter(debug_sample_rate))
+        self.dropped = 0  # Since the last "log_records_dropped" warning
+        self.dropped_total = 0
+        self.listener = None
+        self.start()
+        _handlers.add(self)
+
+    def start(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def prepare(self, record):
+        """
+        Merge the message arguments now; JSON formatting happens on the writer thread
+        Done in place rather than on a copy - other handlers of the record get the
+        same message and traceback text from the merged fields.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self.dropped_total += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': 'log_records_dropped', 'count': dropped, 'request_id': None,
+            })
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                self.dropped += dropped
+
+    def flush(self):
+        """Wait until the writer thread has written everything queued so far"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.start()
+        self.target.flush()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        _handlers.discard(self)
+        super().close()
+
+
+@contextmanager
+def redirect_logs(stream):
+    """Send the output of every QueueLogHandler to `stream` for the block (benchmarks)"""
+    handlers = list(_handlers)
+    for handler in handlers:
+        handler.flush()
+    previous = [handler.target.stream for handler in handlers]
+    for handler in handlers:
+        handler.target.setStream(stream)
+    try:
+        yield
+    finally:
+        for handler, old in zip(handlers, previous):
+            handler.flush()
+            handler.target.setStream(old)
+
+
+def _restart_writers():
+    """The writer thread doesn't survive a fork (gunicorn workers) - start a new one"""
+    for handler in list(_handlers):
+        if handler.listener is not None:
+            handler.queue = queue.Queue(handler.queue.maxsize)
+            handler.start()
+
+
+os.register_at_fork(after_in_child=_restart_writers)
@@ -1,3 +1,1302 @@
-from django.test import TestCase
+"""
+Tests for Farm2Home
+CatalogSnapshotTests checks that the in-memory catalog (main/catalog.py)
+renders the same JSON as the database path for every filter and sort, also
+after a product or its stock changes.
+ProductSearchTests checks typo-tolerant search ranking (main/search.py) on the
+search function, the product API and the catalog API.
+CatalogSuggestTests checks search-as-you-type suggestions
+(/api/catalog/suggest/).
+InventoryTests checks stock changes, cart holds and the hold sweeper of
+main/inventory.py.
+ConcurrentCheckoutTests checks (PostgreSQL only) that parallel checkouts of
+scarce stock never oversell it.
+IdempotencyTests checks that POSTs repeated with an Idempotency-Key
+(main/idempotency.py) are answered once and replayed after that.
+OrderPaginationTests checks that cursor paging of the order lists
+(main/pagination.py) returns every order exactly once.
+StreamingListTests checks that streamed lists (main/streaming.py) hold the
+same rows as the serializer and that lists without the opt-in are unchanged.
+OrderExportTests checks that order exports (main/exports.py) round-trip
+through CSV and JSONL and that partitions split orders at local midnights.
+ConditionalGetTests checks that a matching If-None-Match on the catalog and
+product APIs is answered 304 without queries or serializer work.
+HotQueryIndexTests checks (PostgreSQL only) that every hot query of the
+explain_hot_queries command uses the index it was given.
+OrderPlacementQueryTests checks that placing an order runs the same number of
+queries for 1, 30 and 100 items.
+OrderHistoryQueryTests checks that every order list endpoint runs the same
+number of queries for a customer with 1, 10 and 100 orders.
+CustomerProfileQueryTests pins the customer profile and its serializer to one
+query, however many orders the customer has, and checks that the figures
+read from the stats rollup equal aggregates over the orders themselves.
+EndpointBenchmarkTests runs the endpoint benchmark suite (main/benchmarks.py)
+against a small generated dataset:
+- every endpoint must answer and stay within its query budget (QUERY_BUDGETS)
+- with BENCHMARK_BASELINE=<results.json> set (a benchmark_endpoints --output
+  run on the same machine), latency and allocations must not regress either
+RequestMetricsMiddlewareTests checks the Server-Timing header, the log line
+and repeated-query (N+1) detection of main/middleware.py.
+StructuredLoggingTests checks the JSON lines, request IDs and debug sampling
+of main/structured_logging.py.
+EmailRenderingTests checks the email templates and batch rendering of
+main/email_rendering.py.
+BatchEmailSenderTests checks that a batch reuses one SMTP connection per pool
+slot and that a failed message only fails itself.
+EmailQueueWorkerTests checks that checkout and signup queue their emails and
+that the worker (main/email_queue.py) claims, retries and gives up on them as
+configured and outlives a lost database connection.
+MetricsTests checks that the per-process metric files of main/metrics.py are
+merged and served at /internal/metrics.
+Run: python manage.py test main
+     pytest main/tests.py  (needs pytest-django)
+"""
 
-# Create your tests here.
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import smtplib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from .benchmarks import QUERY_BUDGETS, compare_results, run_benchmarks
+from .catalog import (
+    SORT_OPTIONS, build_catalog_queryset, bump_catalog_version, catalog_engine, get_catalog_data,
+    normalize_catalog_params,
+)
+from .customer_stats import growth_percentage
+from .email_queue import BatchEmailSender, EmailQueueWorker, claim_due_emails, retry_delay
+from .email_rendering import render_email, render_emails
+from .exports import (
+    COLUMN_NAMES, export_filename, export_partitions, export_range, export_rows, partition_ranges,
+)
+from .idempotency import idempotent, purge_expired_keys
+from .inventory import (
+    InsufficientStockError, adjust_stock, checkout_stock, held_quantity, hold_stock, release_expired_holds,
+)
+from .load_data import generate_load_data
+from .management.commands.explain_hot_queries import explain, hot_queries, uses_full_scan
+from .metrics import MetricsFile
+from .middleware import QueryRecorder
+from .pagination import OrderCursorPagination, encode_cursor
+from .search import search_products
+from .structured_logging import QueueLogHandler, request_id_var
+from .models import Customer, IdempotencyKey, Inventory, Order, OrderItem, OutboundEmail, Product, StockHold
+from .serializers import CustomerProfileSerializer, CustomerSerializer, OrderSerializer, ProductCatalogSerializer
+from .views import ProductViewSet
+
+
+# name, local name, category, season, price, stock
+CATALOG_PRODUCTS = [
+    ('Tomato', 'Tamatar', 'vegetables', 'ALL_YEAR', '120.00', 40),
+    ('Tomatillo', 'Tomatillo', 'vegetables', 'SUMMER', '300.00', 0),
+    ('Okra', 'Bhindi', 'vegetables', 'SUMMER', '180.00', 25),
+    ('Potato', 'Aloo', 'vegetables', 'WINTER', '80.00', 100),
+    ('Bitter Gourd', 'Karela', 'vegetables', 'SUMMER', '160.00', 15),
+    ('Mango', 'Aam', 'fruits', 'SUMMER', '250.00', 10),
+    ('Guava', 'Amrood', 'fruits', 'WINTER', '150.00', 0),
+    ('Mint', 'Podina', 'herbs', 'ALL_YEAR', '50.00', 30),
+]
+
+
+def create_catalog_products():
+    """The CATALOG_PRODUCTS with their inventory, by name"""
+    products = {}
+    for name, local_name, category, season, price, stock in CATALOG_PRODUCTS:
+        product = Product.objects.create(
+            name=name, local_name=local_name, category=category, season=season, price=Decimal(price),
+        )
+        Inventory.objects.create(product=product, stock_available=stock)
+        products[name] = product
+    return products
+
+
+class CatalogTestCase(TestCase):
+    """Tests over CATALOG_PRODUCTS, with a catalog snapshot of this test's data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog_products()
+
+    def setUp(self):
+        # The snapshot and response cache are process-wide - don't serve the
+        # previous test's rows
+        bump_catalog_version()
+        catalog_engine.invalidate()
+        self.addCleanup(catalog_engine.invalidate)
+
+
+class CatalogSnapshotTests(CatalogTestCase):
+
+    def assertMatchesDatabase(self):
+        renderer = JSONRenderer()
+        combinations = itertools.product(
+            [None, 'vegetables', 'fruits', 'herbs'],
+            [None, 'summer', 'winter', 'year-round'],
+            [None, 'true'],
+            [None, 'to', 'bhindi', 'xyz'],
+            [(None, None), ('100', None), (None, '200'), ('100', '200')],
+            SORT_OPTIONS,
+        )
+        for category, season, in_stock, search, (price_min, price_max), sort_by in combinations:
+            query = {
+                'category': category, 'season': season, 'in_stock': in_stock, 'search': search,
+                'price_min': price_min, 'price_max': price_max, 'sort': sort_by,
+            }
+            params = normalize_catalog_params({key: value for key, value in query.items() if value is not None})
+            expected = renderer.render(ProductCatalogSerializer(build_catalog_queryset(params), many=True).data)
+            self.assertEqual(renderer.render(get_catalog_data(params)), expected, query)
+
+    def test_snapshot_matches_the_database(self):
+        self.assertMatchesDatabase()
+
+    def test_snapshot_follows_product_and_stock_changes(self):
+        catalog_engine.snapshot()
+        tomato, guava = self.products['Tomato'], self.products['Guava']
+        with self.captureOnCommitCallbacks(execute=True):
+            tomato.price = Decimal('95.00')
+            tomato.save()
+            guava.inventory.stock_available = 12
+            guava.inventory.save()
+            Product.objects.create(name='Spinach', local_name='Palak', category='vegetables', price=Decimal('60.00'))
+        self.assertMatchesDatabase()
+
+
+class ProductSearchTests(CatalogTestCase):
+
+    def assertRanksFirst(self, term, name):
+        product_ids = search_products(term)
+        self.assertTrue(product_ids, term)
+        self.assertEqual(product_ids[0], self.products[name].product_id, term)
+
+    def test_typos_and_local_names(self):
+        self.assertRanksFirst('tomatoe', 'Tomato')
+        self.assertRanksFirst('bhindi', 'Okra')
+        self.assertRanksFirst('bindi', 'Okra')
+        self.assertEqual(search_products('xyz'), [])
+
+    def test_product_api(self):
+        response = self.client.get('/api/products/', {'search': 'tomatoe'})
+        self.assertEqual(response.status_code, 200)
+        names = [product['name'] for product in response.json()['results']]
+        self.assertEqual(names[0], 'Tomato')
+        self.assertIn('Tomatillo', names)
+        self.assertNotIn('Mango', names)
+
+    def test_catalog_api(self):
+        response = self.client.get('/api/catalog/products/', {'search': 'bhindi', 'sort': 'relevance'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Okra')
+
+    def test_index_follows_product_changes(self):
+        self.assertEqual(search_products('spearmint'), [])
+        mint = self.products['Mint']
+        with self.captureOnCommitCallbacks(execute=True):
+            mint.name = 'Spearmint'
+            mint.save()
+        self.assertRanksFirst('spearmint', 'Mint')
+        response = self.client.get('/api/catalog/products/', {'search': 'spearmint', 'sort': 'relevance'})
+        self.assertEqual(response.json()[0]['name'], 'Spearmint')
+
+
+class CatalogSuggestTests(CatalogTestCase):
+
+    def suggest(self, **params):
+        response = self.client.get('/api/catalog/suggest/', params)
+        self.assertEqual(response.status_code, 200)
+        return [suggestion['name'] for suggestion in response.json()['suggestions']]
+
+    def test_prefix_of_name_and_local_name(self):
+        self.assertEqual(self.suggest(q='tom'), ['Tomatillo', 'Tomato'])
+        self.assertEqual(self.suggest(q='BHI'), ['Okra'])
+        self.assertEqual(self.suggest(q='gourd'), ['Bitter Gourd'])
+        self.assertEqual(self.suggest(q='mat'), [])
+
+    def test_empty_query(self):
+        response = self.client.get('/api/catalog/suggest/')
+        self.assertEqual(response.json(), {'status': 'success', 'query': '', 'suggestions': []})
+        self.assertEqual(self.suggest(q='  '), [])
+
+    def test_limit_is_clamped(self):
+        for number in range(25):
+            Product.objects.create(name=f'Tomato {number:02}', local_name='Tamatar', category='vegetables',
+                                   price=Decimal('100.00'))
+        self.assertEqual(len(self.suggest(q='tom')), 8)
+        self.assertEqual(len(self.suggest(q='tom', limit=3)), 3)
+        self.assertEqual(len(self.suggest(q='tom', limit=0)), 1)
+        self.assertEqual(len(self.suggest(q='tom', limit=100)), 20)
+        self.assertEqual(len(self.suggest(q='tom', limit='many')), 8)
+
+    def test_trie_follows_product_changes(self):
+        self.assertEqual(self.suggest(q='pod'), ['Mint'])
+        mint = self.products['Mint']
+        with self.captureOnCommitCallbacks(execute=True):
+            mint.name = 'Spearmint'
+            mint.save()
+        self.assertEqual(self.suggest(q='spe'), ['Spearmint'])
+        self.assertEqual(self.suggest(q='mint'), [])
+
+
+class InventoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tomato = Product.objects.create(name='Stock Tomato', local_name='Tamatar', category='vegetables',
+                                            price=Decimal('120.00'))
+        cls.okra = Product.objects.create(name='Stock Okra', local_name='Bhindi', category='vegetables',
+                                          price=Decimal('180.00'))
+        Inventory.objects.bulk_create([
+            Inventory(product=cls.tomato, stock_available=5), Inventory(product=cls.okra, stock_available=2),
+        ])
+        cls.customer = Customer.objects.create(name='Stock Check', email='stock-check@example.com', phone='03000000001')
+        cls.other = Customer.objects.create(name='Stock Other', email='stock-other@example.com', phone='03000000002')
+
+    def stock(self, product):
+        return Inventory.objects.get(product=product).stock_available
+
+    def test_shortfall_changes_nothing(self):
+        with self.assertRaises(InsufficientStockError) as raised:
+            adjust_stock({self.tomato.product_id: -3, self.okra.product_id: -5})
+        self.assertEqual(raised.exception.shortages, [('Stock Okra', 2, 5)])
+        self.assertEqual((self.stock(self.tomato), self.stock(self.okra)), (5, 2))
+
+        adjust_stock({self.tomato.product_id: -5, self.okra.product_id: 3})
+        self.assertEqual((self.stock(self.tomato), self.stock(self.okra)), (0, 5))
+
+    def test_checkout_counts_held_stock(self):
+        tomato_id = self.tomato.product_id
+        hold_stock(self.customer.customer_id, tomato_id, 4)
+        self.assertEqual((self.stock(self.tomato), held_quantity(self.customer.customer_id, tomato_id)), (1, 4))
+        hold_stock(self.customer.customer_id, tomato_id, 3)
+        self.assertEqual(self.stock(self.tomato), 2)
+        with self.assertRaises(InsufficientStockError):
+            hold_stock(self.other.customer_id, tomato_id, 3)
+
+        # Nobody else can buy the held units...
+        with self.assertRaises(InsufficientStockError):
+            checkout_stock(self.other.customer_id, {tomato_id: 3})
+        # ...but the customer holding them can, along with what is left
+        checkout_stock(self.customer.customer_id, {tomato_id: 5})
+        self.assertEqual(self.stock(self.tomato), 0)
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_checkout_gives_back_unordered_holds(self):
+        hold_stock(self.customer.customer_id, self.tomato.product_id, 3)
+        hold_stock(self.customer.customer_id, self.okra.product_id, 2)
+        checkout_stock(self.customer.customer_id, {self.tomato.product_id: 1})
+        self.assertEqual((self.stock(self.tomato), self.stock(self.okra)), (4, 2))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_expired_holds_are_released_once(self):
+        hold_stock(self.customer.customer_id, self.tomato.product_id, 2)
+        hold_stock(self.other.customer_id, self.tomato.product_id, 1)
+        StockHold.objects.filter(customer=self.customer).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(self.stock(self.tomato), 4)
+        self.assertEqual(release_expired_holds(), 0)
+        self.assertEqual(self.stock(self.tomato), 4)
+        self.assertEqual(held_quantity(self.other.customer_id, self.tomato.product_id), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite serializes every write, so nothing runs concurrently')
+class ConcurrentCheckoutTests(TransactionTestCase):
+
+    STOCK = 20
+
+    def checkout(self, data, barrier):
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        try:
+            response = Client().post('/api/checkout/create-order/', data, content_type='application/json')
+            return response.status_code
+        finally:
+            connections.close_all()
+
+    def test_parallel_checkouts_never_oversell(self):
+        products = Product.objects.bulk_create([
+            Product(name=f'Scarce Product {i}', local_name='', category='vegetables', season='ALL_YEAR',
+                    price=Decimal('50.00') + i, slug=f'scarce-product-{i}')
+            for i in range(3)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=product, stock_available=self.STOCK) for product in products])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f'Scarce {i}', email=f'scarce-{i}@example.com', phone='03001234567') for i in range(40)
+        ])
+        # Half of them checkout with a cart hold
+        for customer, product in zip(customers[::2], itertools.cycle(products)):
+            hold_stock(customer.customer_id, product.product_id, 2)
+
+        rng = random.Random(1)
+        orders = []
+        for customer in customers:
+            lines = rng.sample(products, rng.randint(1, len(products)))  # random lock order
+            orders.append({
+                'customer_id': customer.customer_id,
+                'shipping': {
+                    'fullName': customer.name, 'email': customer.email, 'phone': customer.phone,
+                    'address': 'House 1, Street 1', 'city': 'Lahore', 'zipCode': '54000',
+                },
+                'billing': {},
+                'items': [{'product_id': product.product_id, 'quantity': rng.randint(1, 3)} for product in lines],
+            })
+
+        threads = 8
+        barrier = threading.Barrier(threads)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses = list(executor.map(self.checkout, orders, itertools.repeat(barrier)))
+
+        self.assertTrue(all(code < 500 for code in statuses), statuses)
+        self.assertIn(201, statuses)
+        self.assertEqual(statuses.count(201), Order.objects.count())
+        for product in products:
+            left = Inventory.objects.get(product=product).stock_available
+            sold = OrderItem.objects.filter(product=product).aggregate(units=Sum('quantity'))['units'] or 0
+            held = StockHold.objects.filter(product=product).aggregate(units=Sum('quantity'))['units'] or 0
+            self.assertGreaterEqual(left, 0)
+            self.assertEqual(sold + held + left, self.STOCK)
+
+
+class IdempotencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Retry Check', email='retry-check@example.com', phone='03000000003')
+        cls.product = Product.objects.create(name='Retry Tomato', local_name='Tamatar', category='vegetables',
+                                             price=Decimal('120.00'))
+        Inventory.objects.create(product=cls.product, stock_available=10)
+
+    def setUp(self):
+        self.calls = []
+
+    def checkout(self, key, quantity=1):
+        return self.client.post('/api/checkout/create-order/', {
+            'customer_id': self.customer.customer_id,
+            'shipping': {
+                'fullName': 'Retry Check', 'email': 'retry-check@example.com', 'phone': '03000000003',
+                'address': 'House 1, Street 1', 'city': 'Lahore', 'zipCode': '54000',
+            },
+            'billing': {'cardNumber': ''},
+            'items': [{'product_id': self.product.product_id, 'quantity': quantity}],
+        }, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def post(self, key, data):
+        """POST to a view that records its calls and fails on request"""
+        @api_view(['POST'])
+        @idempotent('tests.echo')
+        def echo(request):
+            self.calls.append(request.data)
+            if request.data.get('fail') == 'raise':
+                raise RuntimeError('Stripe is down')
+            if request.data.get('fail') == '500':
+                return Response({'error': 'Stripe is down'}, status=500)
+            return Response({'echo': request.data}, status=201)
+
+        return echo(APIRequestFactory().post('/echo/', data, format='json', HTTP_IDEMPOTENCY_KEY=key))
+
+    def test_retry_replays_the_order(self):
+        first = self.checkout('order-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        retry = self.checkout('order-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.assertEqual(Inventory.objects.get(product=self.product).stock_available, 9)
+
+    def test_same_key_with_a_different_body(self):
+        self.assertEqual(self.checkout('order-1').status_code, 201)
+        self.assertEqual(self.checkout('order-1', quantity=2).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_server_errors_release_the_key(self):
+        for failure in ('500', 'raise'):
+            with self.subTest(failure=failure):
+                key = f'payment-{failure}'
+                if failure == 'raise':
+                    with self.assertRaises(RuntimeError):
+                        self.post(key, {'amount': 100, 'fail': failure})
+                else:
+                    self.assertEqual(self.post(key, {'amount': 100, 'fail': failure}).status_code, 500)
+                self.assertFalse(IdempotencyKey.objects.filter(key=key).exists())
+                # The body may not change, so the retry fails again - but it runs
+                calls = len(self.calls)
+                self.post(key, {'amount': 100, 'fail': '500'})
+                self.assertEqual(len(self.calls), calls + 1)
+
+    def test_stale_lock_is_taken_over(self):
+        # Left behind by a worker that died mid-request
+        now = timezone.now()
+        IdempotencyKey.objects.create(scope='tests.echo', key='crashed', fingerprint='unknown',
+                                      locked_at=now - timedelta(minutes=5), expires_at=now + timedelta(days=1))
+        response = self.post('crashed', {'amount': 100})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(IdempotencyKey.objects.get(key='crashed').status, 'COMPLETED')
+        self.assertEqual(self.post('crashed', {'amount': 100})['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_running_duplicate_gets_409(self):
+        self.post('running', {'amount': 100})
+        IdempotencyKey.objects.filter(key='running').update(status='IN_PROGRESS', response_status=None,
+                                                            response_body=None)
+        self.assertEqual(self.post('running', {'amount': 100}).status_code, 409)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_purge_expired_keys(self):
+        now = timezone.now()
+        for i in range(5):
+            IdempotencyKey.objects.create(scope='tests.echo', key=f'key-{i}', fingerprint='',
+                                          expires_at=now + timedelta(hours=i - 3, minutes=30))
+        self.assertEqual(purge_expired_keys(batch_size=2), 3)
+        self.assertEqual(sorted(IdempotencyKey.objects.values_list('key', flat=True)), ['key-3', 'key-4'])
+
+
+class OrderPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Paging Check', email='paging-check@example.com', phone='03000000004')
+        cls.other = Customer.objects.create(name='Paging Other', email='paging-other@example.com', phone='03000000005')
+        Order.objects.bulk_create(
+            [Order(customer=cls.customer, total_amount=Decimal('100.00')) for _ in range(23)]
+            + [Order(customer=cls.other, total_amount=Decimal('100.00')) for _ in range(4)]
+        )
+        # Orders placed in the same instant (bulk imports) only differ by id
+        same_time = timezone.now() - timedelta(days=1)
+        ids = sorted(Order.objects.values_list('order_id', flat=True))
+        Order.objects.filter(order_id__in=ids[5:15]).update(order_date=same_time)
+        Order.objects.filter(order_id__in=ids[15:]).update(order_date=same_time - timedelta(days=1))
+
+    def walk(self, url):
+        """Order ids of every page, following the next links"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(set(body), {'next', 'next_cursor', 'results'})
+            pages.append([order['order_id'] for order in body['results']])
+            url = body['next']
+        return pages
+
+    def expected(self, orders):
+        return list(orders.order_by('-order_date', '-order_id').values_list('order_id', flat=True))
+
+    def test_every_order_once(self):
+        for page_size in (1, 4, 10, 27, 100):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(f'/api/orders/?page_size={page_size}')
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+                self.assertEqual(sum(pages, []), self.expected(Order.objects.all()))
+
+    def test_customer_orders(self):
+        pages = self.walk(f'/api/customers/{self.customer.customer_id}/orders/?page_size=5')
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(sum(pages, []), self.expected(self.customer.orders.all()))
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        response = self.client.get('/api/orders/', {'page_size': 10})
+        first_page = [order['order_id'] for order in response.json()['results']]
+        Order.objects.create(customer=self.customer, total_amount=Decimal('100.00'))
+        rest = sum(self.walk(response.json()['next']), [])
+        self.assertEqual(first_page + rest, self.expected(Order.objects.all())[1:])
+
+    def test_invalid_cursor(self):
+        for cursor in ('nonsense', encode_cursor(timezone.now(), 1)[:-4], 'bm90fGFuIGlk'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/orders/', {'cursor': cursor}).status_code, 404)
+
+    def test_page_size_is_clamped(self):
+        def page_length(**params):
+            return len(self.client.get('/api/orders/', params).json()['results'])
+
+        self.assertEqual(page_length(page_size=0), 27)  # default PAGE_SIZE
+        self.assertEqual(page_length(page_size='many'), 27)
+        self.assertEqual(page_length(page=2), 27)  # page numbers are ignored
+        with mock.patch.object(OrderCursorPagination, 'max_page_size', 5):
+            self.assertEqual(page_length(page_size=50), 5)
+
+
+class StreamingListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(name=f'Stream Product {i}', local_name=f'Stream {i}', category='vegetables',
+                    season='ALL_YEAR', price=Decimal('100.00') + i, slug=f'stream-product-{i}')
+            for i in range(3)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=product, stock_available=10) for product in products])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f'Stream “{i}” & Co', email=f'stream-{i}@example.com', phone='03001234567')
+            for i in range(12)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(customer=customer, total_amount=Decimal('250.50')) for customer in customers for _ in range(2)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=2, price=product.price)
+            for order in orders for product in products[:order.order_id % 3 + 1]
+        ])
+
+    def expected(self, serializer_class, queryset):
+        """The unpaginated serializer output, as a client decodes it"""
+        return json.loads(JSONRenderer().render(serializer_class(queryset, many=True).data))
+
+    def stream(self, url, **headers):
+        # Small writes, so rows are split over several chunks
+        with mock.patch('main.streaming.WRITE_BUFFER_SIZE', 500):
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        return response, b''.join(chunks).decode('utf-8')
+
+    def test_json_array(self):
+        response, body = self.stream('/api/orders/?stream=1')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        orders = Order.objects.order_by('-order_date', '-order_id')
+        self.assertEqual(json.loads(body), self.expected(OrderSerializer, orders))
+
+        # Customers have no default ordering
+        response, body = self.stream('/api/customers/?stream=true')
+        self.assertCountEqual(json.loads(body), self.expected(CustomerSerializer, Customer.objects.all()))
+
+    def test_ndjson(self):
+        response, body = self.stream('/api/customers/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(body.endswith('\n'))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertCountEqual(rows, self.expected(CustomerSerializer, Customer.objects.all()))
+
+        _, body = self.stream('/api/orders/?stream=ndjson')
+        self.assertEqual(len(body.splitlines()), Order.objects.count())
+
+    def test_lists_without_the_opt_in_are_paged(self):
+        response = self.client.get('/api/orders/', {'page_size': 5})
+        self.assertFalse(response.streaming)
+        self.assertEqual(set(response.json()), {'next', 'next_cursor', 'results'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+        response = self.client.get('/api/customers/')
+        self.assertEqual(set(response.json()), {'count', 'next', 'previous', 'results'})
+        self.assertCountEqual(response.json()['results'], self.expected(CustomerSerializer, Customer.objects.all()))
+
+
+# Europe/Berlin: clocks went forward at 02:00 on 2025-03-30 and back at 03:00 on 2025-10-26
+@override_settings(TIME_ZONE='Europe/Berlin')
+class OrderExportTests(TestCase):
+
+    # Local times of the fixture orders - around a month end and both DST changes
+    LOCAL_ORDER_TIMES = [
+        datetime(2025, 1, 31, 12, 0),
+        datetime(2025, 1, 31, 23, 59, 59, 999999),
+        datetime(2025, 2, 1, 0, 0),
+        datetime(2025, 3, 29, 23, 30),
+        datetime(2025, 3, 30, 0, 0),
+        datetime(2025, 3, 30, 3, 30),
+        datetime(2025, 3, 30, 23, 59),
+        datetime(2025, 3, 31, 0, 0),
+        datetime(2025, 10, 26, 2, 30),
+        datetime(2025, 10, 26, 23, 59),
+        datetime(2025, 10, 27, 0, 0),
+    ]
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        customer = Customer.objects.create(name='Export, "Quoted" Ünïcode', email='export@example.com',
+                                           phone='03000000006')
+        tomato = Product.objects.create(name='Tomato, Desi', local_name='Tamatar', category='vegetables',
+                                        price=Decimal('120.50'))
+        okra = Product.objects.create(name='Okra', local_name='Bhindi', category='vegetables', price=Decimal('80.00'))
+        for number, local_time in enumerate(self.LOCAL_ORDER_TIMES):
+            order = Order.objects.create(customer=customer, total_amount=Decimal('361.50'),
+                                         payment=None if number == 0 else 'Cash on Delivery')
+            Order.objects.filter(order_id=order.order_id).update(order_date=timezone.make_aware(local_time))
+            OrderItem.objects.create(order=order, product=tomato, quantity=3, price=Decimal('120.50'))
+            if number % 2:
+                OrderItem.objects.create(order=order, product=okra, quantity=1, price=Decimal('0.00'))
+        self.rows = list(export_rows())
+
+    def read(self, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', newline='') as f:
+            if '.csv' in path:
+                return list(csv.reader(f))
+            return [json.loads(line) for line in f]
+
+    def order_ids(self, path):
+        if '.csv' in path:
+            return {int(row[0]) for row in self.read(path)[1:]}
+        return {row['order_id'] for row in self.read(path)}
+
+    def test_round_trip(self):
+        as_text = [
+            ['' if value is None else value.isoformat() if isinstance(value, datetime) else str(value) for value in row]
+            for row in self.rows
+        ]
+        as_json = [dict(zip(COLUMN_NAMES, row)) for row in as_text]
+        for row in as_json:
+            row.update({name: int(row[name]) for name in ('order_id', 'customer_id', 'item_id', 'product_id', 'quantity')})
+            row['payment'] = row['payment'] or None
+
+        for fmt, compress in itertools.product(('csv', 'jsonl'), (False, True)):
+            with self.subTest(fmt=fmt, compress=compress):
+                path = os.path.join(self.directory, export_filename('all', fmt, compress))
+                self.assertEqual(export_range(path, fmt, compress=compress, chunk_size=4), len(self.rows))
+                expected = [COLUMN_NAMES] + as_text if fmt == 'csv' else as_json
+                self.assertEqual(self.read(path), expected)
+                self.assertEqual(os.listdir(self.directory), [os.path.basename(path)])
+                os.remove(path)
+
+    def test_partitions_split_at_local_midnight(self):
+        start = timezone.make_aware(datetime(2025, 1, 1))
+        end = timezone.make_aware(datetime(2025, 11, 1))
+        for partition in ('day', 'month'):
+            ranges = partition_ranges(start, end, partition)
+            self.assertEqual(ranges[0][1], start)
+            self.assertEqual(ranges[-1][2], end)
+            for (_, _, previous_end), (_, next_start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(previous_end, next_start)
+
+        # Compared in UTC - subtracting Berlin times would give wall clock time
+        hours = {
+            label: (day_end.timestamp() - day_start.timestamp()) / 3600
+            for label, day_start, day_end in partition_ranges(start, end, 'day')
+        }
+        self.assertEqual((hours['2025-03-30'], hours['2025-03-31'], hours['2025-10-26']), (23, 24, 25))
+
+        for partition in ('day', 'month'):
+            with self.subTest(partition=partition):
+                directory = os.path.join(self.directory, partition)
+                files = export_partitions(directory, 'csv', start, end, partition=partition)
+                self.assertEqual(sum(written for _, written in files), len(self.rows))
+                placed = {}
+                for path, written in files:
+                    for order_id in self.order_ids(path):
+                        self.assertNotIn(order_id, placed)
+                        placed[order_id] = os.path.basename(path)
+                self.assertEqual(len(placed), len(self.LOCAL_ORDER_TIMES))
+
+                # Every order is in the file for its local date
+                for order in Order.objects.all():
+                    label = timezone.localtime(order.order_date).strftime('%Y-%m-%d' if partition == 'day' else '%Y-%m')
+                    self.assertEqual(placed[order.order_id], f'orders-{label}.csv')
+
+    def test_failed_export_leaves_no_file(self):
+        def failing_rows(*args):
+            yield from self.rows[:3]
+            raise OperationalError('server closed the connection unexpectedly')
+
+        for fmt, compress in itertools.product(('csv', 'jsonl'), (False, True)):
+            with self.subTest(fmt=fmt, compress=compress):
+                path = os.path.join(self.directory, export_filename('failed', fmt, compress))
+                with mock.patch('main.exports.export_rows', failing_rows), self.assertRaises(OperationalError):
+                    export_range(path, fmt, compress=compress, chunk_size=2)
+                self.assertEqual(os.listdir(self.directory), [])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Conditional Tomato', local_name='Tamatar', category='vegetables',
+            season='ALL_YEAR', price=Decimal('120.00'),
+        )
+        Inventory.objects.create(product=cls.product, stock_available=50)
+
+    def assertNotModified(self, path):
+        """A repeat of `path` with its ETag gets a 304 and runs no queries"""
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(response.content, b'')
+
+    def test_catalog_products_api(self):
+        with mock.patch('main.views.get_catalog_data') as get_catalog_data:
+            get_catalog_data.return_value = []
+            response = self.client.get('/api/catalog/products/?category=fruits')
+            get_catalog_data.reset_mock()
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/catalog/products/?category=fruits',
+                                           HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        get_catalog_data.assert_not_called()
+        self.assertNotModified('/api/catalog/products/?category=vegetables')
+
+    def test_product_list(self):
+        self.assertNotModified('/api/products/')
+        response = self.client.get('/api/products/')
+        with mock.patch('main.views.ProductListRowRenderer') as renderer:
+            self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        renderer.assert_not_called()
+
+    def test_product_retrieve(self):
+        path = f'/api/products/{self.product.product_id}/'
+        self.assertNotModified(path)
+        response = self.client.get(path)
+        with mock.patch.object(ProductViewSet, 'get_serializer') as get_serializer:
+            self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        get_serializer.assert_not_called()
+
+    def test_changed_catalog_is_served_again(self):
+        response = self.client.get('/api/products/')
+        self.product.price = Decimal('130.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['price'], '130.00')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Index names only show in PostgreSQL plans')
+class HotQueryIndexTests(TestCase):
+
+    def test_hot_queries_use_their_index(self):
+        for label, queryset, _, index in hot_queries():
+            with self.subTest(query=label):
+                plan = explain(queryset)
+                self.assertFalse(uses_full_scan(plan, queryset.model._meta.db_table), plan)
+                self.assertIn(index, plan)
+
+
+class OrderPlacementQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Query Check', email='query-check@example.com', phone='03000000000')
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f'Query Check Product {i}', local_name=f'Check {i}', category='vegetables',
+                season='ALL_YEAR', price=Decimal('100.00') + i, slug=f'query-check-product-{i}',
+            )
+            for i in range(100)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=product, stock_available=1000) for product in cls.products])
+
+    def place_order(self, size):
+        """Queries run by the checkout endpoint for an order of `size` line items"""
+        data = {
+            'customer_id': self.customer.customer_id,
+            'shipping': {
+                'fullName': 'Query Check', 'email': 'query-check@example.com', 'phone': '03000000000',
+                'address': 'House 1, Street 1', 'city': 'Lahore', 'zipCode': '54000',
+            },
+            'billing': {'cardNumber': ''},
+            'items': [{'product_id': product.product_id, 'quantity': 2} for product in self.products[:size]],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/checkout/create-order/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()['items']), size)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        counts = {size: self.place_order(size) for size in (1, 30, 100)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+
+class OrderHistoryQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'History Check Product {i}', local_name=f'Check {i}', category='vegetables',
+                season='ALL_YEAR', price=Decimal('100.00') + i, slug=f'history-check-product-{i}',
+            )
+            for i in range(3)
+        ])
+        cls.customers = {}
+        for size in (1, 10, 100):
+            customer = Customer.objects.create(
+                name='History Check', email=f'history-check-{size}@example.com', phone='03000000000',
+            )
+            orders = Order.objects.bulk_create([
+                Order(customer=customer, status='CONFIRMED', total_amount=Decimal('300.00')) for _ in range(size)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for order in orders for product in products
+            ])
+            cls.customers[size] = customer
+
+    def list_orders(self, path, params):
+        """Queries run to list the orders, and the number of orders listed"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        if isinstance(data, dict):
+            data = data.get('data', data.get('results'))
+        return len(queries), len(data)
+
+    def test_query_count_does_not_grow_with_the_orders(self):
+        endpoints = {
+            'orders-summary': lambda customer, size: (
+                '/api/customer/orders-summary/', {'customer_id': customer.customer_id, 'limit': size}),
+            'orders': lambda customer, size: ('/api/customer/orders/', {'customer_id': customer.customer_id}),
+            'api/orders': lambda customer, size: ('/api/orders/', {'customer_id': customer.customer_id}),
+            'api/customers/<id>/orders': lambda customer, size: (
+                f'/api/customers/{customer.customer_id}/orders/', {}),
+        }
+        for name, request in endpoints.items():
+            with self.subTest(endpoint=name):
+                counts = {}
+                for size, customer in self.customers.items():
+                    counts[size], listed = self.list_orders(*request(customer, size))
+                    self.assertEqual(listed, size)
+                self.assertEqual(len(set(counts.values())), 1, counts)
+
+
+class CustomerProfileQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Profile Check', email='profile-check@example.com', phone='03000000000')
+        for i in range(12):
+            Order.objects.create(customer=cls.customer, status='DELIVERED', total_amount=Decimal('250.00') + i)
+
+    def test_profile_api_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/customer/profile/', {'customer_id': self.customer.customer_id})
+        data = response.json()['data']
+        self.assertEqual(data['total_orders'], 12)
+        self.assertEqual(data['total_spent'], 3066.0)
+        self.assertEqual(data['growth_percentage'], 100.0)
+
+    def test_serializer_without_annotations_is_one_query(self):
+        customer = Customer.objects.get(pk=self.customer.pk)
+        with self.assertNumQueries(1):
+            data = CustomerProfileSerializer(customer).data
+        self.assertEqual((data['total_orders'], data['total_spent']), (12, 3066.0))
+
+    def test_stats_match_the_orders(self):
+        # Either side of both window starts, and a cancelled order (still counted)
+        now = timezone.now()
+        for age, amount, status in [
+            (timedelta(days=30, minutes=-5), 100, 'DELIVERED'),
+            (timedelta(days=30, minutes=5), 200, 'DELIVERED'),
+            (timedelta(days=45), 300, 'CANCELLED'),
+            (timedelta(days=60, minutes=-5), 400, 'DELIVERED'),
+            (timedelta(days=60, minutes=5), 500, 'DELIVERED'),
+        ]:
+            order = Order.objects.create(customer=self.customer, status=status, total_amount=Decimal(amount))
+            order.order_date = now - age
+            order.save()
+        orders = Order.objects.filter(customer=self.customer)
+        recent = sum(order.total_amount for order in orders if order.order_date >= now - timedelta(days=30))
+        previous = sum(order.total_amount for order in orders
+                       if now - timedelta(days=60) <= order.order_date < now - timedelta(days=30))
+
+        data = self.client.get('/api/customer/profile/', {'customer_id': self.customer.customer_id}).json()['data']
+        self.assertEqual(data['total_orders'], 17)
+        self.assertEqual(data['total_spent'], float(sum(order.total_amount for order in orders)))
+        self.assertEqual(data['growth_percentage'], float(growth_percentage(recent, previous)))
+
+
+class EndpointBenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, (category, season) in enumerate([
+            ('vegetables', 'ALL_YEAR'), ('vegetables', 'WINTER'), ('fruits', 'SUMMER'),
+            ('fruits', 'ALL_YEAR'), ('herbs', 'ALL_YEAR'),
+        ]):
+            product = Product.objects.create(
+                name=f'Benchmark Product {i}', local_name='Benchmark', category=category,
+                season=season, price=Decimal('100.00') + i * 20,
+            )
+            Inventory.objects.create(product=product, stock_available=1000)
+        generate_load_data(customers=20, orders=400, days=90, cart_share=0.5, batch_size=500)
+
+    def test_endpoints_within_query_budgets(self):
+        results = run_benchmarks(requests=5, warmup=1)
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(endpoint=name):
+                self.assertLessEqual(results['endpoints'][name]['queries'], budget)
+
+    def test_no_regressions_against_baseline(self):
+        path = os.environ.get('BENCHMARK_BASELINE')
+        if not path:
+            self.skipTest('Set BENCHMARK_BASELINE to a benchmark_endpoints --output file')
+        with open(path) as f:
+            baseline = json.load(f)
+        results = run_benchmarks(requests=baseline['requests'])
+        self.assertEqual(compare_results(results, baseline), [])
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Metrics Test', email='metrics@example.com', phone='03001234567')
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('main.requests', level='INFO') as logs:
+            response = self.client.get('/api/customer/profile/', {'customer_id': self.customer.customer_id})
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+, total;dur=[\d.]+')
+        record = logs.records[0]
+        self.assertEqual(record.getMessage(), 'request')
+        self.assertEqual(record.view, 'main:customer_profile_api')
+        self.assertEqual(record.queries, 1)
+        self.assertEqual(record.repeated_queries, [])
+
+    def test_repeated_queries_share_a_fingerprint(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for customer_id in range(3):
+                Customer.objects.filter(customer_id=customer_id).first()
+            for ids in ([1], [1, 2], [1, 2, 3]):
+                list(Customer.objects.filter(customer_id__in=ids))
+        self.assertEqual([count for _, count, _ in recorder.repeated(3)], [3, 3])
+
+
+class StructuredLoggingTests(TestCase):
+
+    def capture(self, debug_sample_rate=1.0):
+        """Route main.* records through a fresh QueueLogHandler writing to a StringIO"""
+        stream = io.StringIO()
+        handler = QueueLogHandler(stream, debug_sample_rate=debug_sample_rate)
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('main')
+        self.addCleanup(setattr, logger, 'handlers', logger.handlers)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.handlers = [handler]
+        logger.setLevel(logging.DEBUG)
+        return handler, stream
+
+    def lines(self, handler, stream):
+        handler.flush()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+    def test_request_lines_share_the_request_id(self):
+        handler, stream = self.capture()
+        response = self.client.post('/api/checkout/create-order/', {'items': []}, content_type='application/json',
+                                    HTTP_X_REQUEST_ID='checkout-test-1')
+        self.assertEqual(response['X-Request-ID'], 'checkout-test-1')
+        lines = self.lines(handler, stream)
+        self.assertEqual([line['event'] for line in lines], ['checkout_received', 'checkout_invalid', 'request'])
+        self.assertEqual({line['request_id'] for line in lines}, {'checkout-test-1'})
+        self.assertEqual(lines[0]['payment'], 'cod')
+
+    def test_debug_lines_are_sampled_per_request(self):
+        handler, stream = self.capture(debug_sample_rate=0.5)
+        logger = logging.getLogger('main.tests')
+        for i in range(200):
+            token = request_id_var.set(f'request-{i}')
+            logger.debug('first')
+            logger.debug('second')
+            logger.info('always')
+            request_id_var.reset(token)
+        lines = self.lines(handler, stream)
+        kept = {line['request_id'] for line in lines if line['event'] == 'first'}
+        self.assertEqual(kept, {line['request_id'] for line in lines if line['event'] == 'second'})
+        self.assertLess(abs(len(kept) - 100), 30)
+        self.assertEqual(sum(line['event'] == 'always' for line in lines), 200)
+
+
+def email_context(customer_name, order_id, tracking_number=''):
+    """Values for every variable used by templates/emails"""
+    return {
+        'customer_name': customer_name,
+        'order_id': order_id,
+        'order_date': 'March 01, 2025 at 10:30 AM',
+        'total_amount': '360.00',
+        'payment_method': 'Card ending in 4242',
+        'items': [
+            {'product': {'name': 'Tomato'}, 'quantity': 2, 'price': '120.00', 'subtotal': '240.00'},
+            {'product': {'name': 'Okra'}, 'quantity': 1, 'price': '120.00', 'subtotal': '120.00'},
+        ],
+        'shipping_name': customer_name,
+        'shipping_phone': '03001234567',
+        'shipping_address': 'House 1, Street 1',
+        'shipping_city': 'Lahore',
+        'shipping_zip': '54000',
+        'tracking_number': tracking_number,
+        'reset_link': 'https://farm2home.example.com/reset-password/?token=abc&email=x',
+    }
+
+
+class EmailRenderingTests(TestCase):
+
+    template_names = sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(os.path.join(settings.BASE_DIR, 'templates', 'emails'))
+        if name.endswith('.txt')
+    )
+
+    def test_every_template_renders(self):
+        self.assertIn('welcome', self.template_names)
+        for name in self.template_names:
+            plain_message, html_message = render_email(name, email_context('Ayesha', 1001, 'TRK123'))
+            self.assertIn('Ayesha', plain_message, name)
+            self.assertIn('Ayesha', html_message, name)
+            self.assertTrue(plain_message.endswith('\n'), name)
+            self.assertNotIn('{', plain_message, name)
+            self.assertNotIn('<', plain_message, name)
+
+    def test_batch_matches_single_renders(self):
+        contexts = [email_context('Ayesha', 1001, 'TRK123'), email_context('Bilal', 1002)]
+        for name in self.template_names:
+            rendered = render_emails(name, contexts)
+            self.assertEqual(rendered, [render_email(name, context) for context in contexts], name)
+        plain_first, plain_second = [plain for plain, _ in render_emails('order_shipped', contexts)]
+        self.assertIn('TRK123', plain_first)
+        self.assertNotIn('TRK123', plain_second)
+
+    def test_text_part_is_not_html_escaped(self):
+        for name in self.template_names:
+            plain_message, html_message = render_email(name, email_context('Ali & Sons <Farm>', 1001))
+            self.assertIn('Ali & Sons <Farm>', plain_message, name)
+            self.assertIn('Ali &amp; Sons &lt;Farm&gt;', html_message, name)
+            self.assertNotIn('&amp;', plain_message, name)
+
+
+class FakeSMTPConnection:
+    """Email backend stand-in that fails messages to chosen addresses"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.errors.get(message.to[0])
+            if error is not None:
+                raise error
+            self.sent.append(message)
+        return len(messages)
+
+
+class BatchEmailSenderTests(TestCase):
+
+    def sender(self, pool_size, errors=None):
+        connections = []
+
+        def connection_factory():
+            connections.append(FakeSMTPConnection(errors or {}))
+            return connections[-1]
+
+        return BatchEmailSender(pool_size=pool_size, connection_factory=connection_factory), connections
+
+    def messages(self, addresses):
+        return [EmailMultiAlternatives(subject='Hello', body='Hello', to=[address]) for address in addresses]
+
+    def test_batch_reuses_the_pool(self):
+        sender, connections = self.sender(pool_size=3)
+        messages = self.messages(f'customer{i}@example.com' for i in range(1000))
+        self.assertEqual(sender.send(messages), [None] * 1000)
+        self.assertEqual(sender.connections_opened, 3)
+        sent = [message for connection in connections for message in connection.sent]
+        self.assertCountEqual(sent, messages)
+        sender.close()
+        self.assertTrue(all(connection.closed for connection in connections))
+
+    def test_failures_are_per_message(self):
+        refused = smtplib.SMTPRecipientsRefused({'refused@example.com': (550, b'No such user')})
+        broken = ValueError('Bad header')
+        sender, connections = self.sender(pool_size=2, errors={
+            'refused@example.com': refused, 'broken@example.com': broken,
+        })
+        addresses = [f'customer{i}@example.com' for i in range(10)]
+        addresses[3], addresses[6] = 'refused@example.com', 'broken@example.com'
+        results = sender.send(self.messages(addresses))
+        self.assertEqual(results, [None] * 3 + [refused] + [None] * 2 + [broken] + [None] * 3)
+        self.assertEqual(sum(len(connection.sent) for connection in connections), 8)
+
+    def test_connection_is_reopened_after_an_error(self):
+        dropped = smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        refused = smtplib.SMTPRecipientsRefused({'refused@example.com': (550, b'No such user')})
+        sender, connections = self.sender(pool_size=1, errors={
+            'dropped@example.com': dropped, 'refused@example.com': refused,
+        })
+        results = sender.send(self.messages([
+            'first@example.com', 'refused@example.com', 'second@example.com',
+            'dropped@example.com', 'third@example.com',
+        ]))
+        self.assertEqual(results, [None, refused, None, dropped, None])
+        # A refused recipient leaves the connection usable; a dropped one does not
+        self.assertEqual(sender.connections_opened, 2)
+        self.assertTrue(connections[0].closed)
+        self.assertEqual([message.to for message in connections[0].sent], [['first@example.com'], ['second@example.com']])
+        self.assertEqual([message.to for message in connections[1].sent], [['third@example.com']])
+
+
+class EmailQueueWorkerTests(TestCase):
+
+    def queue(self, count=1, **fields):
+        return [
+            OutboundEmail.objects.create(
+                kind='welcome', to_email=f'customer{i}@example.com', subject='Welcome', body_text='Hello', **fields,
+            )
+            for i in range(count)
+        ]
+
+    def failing_sender(self, error):
+        sender = mock.Mock()
+        sender.send.side_effect = lambda messages: [error] * len(messages)
+        return sender
+
+    def test_checkout_and_signup_queue_instead_of_sending(self):
+        response = self.client.post('/api/auth/signup/', {
+            'name': 'Queue Check', 'email': 'queue-check@example.com', 'phone': '03001112222', 'password': 'secret123',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        customer_id = response.json()['customer_id']
+        product = Product.objects.create(name='Queue Tomato', local_name='Tamatar', category='vegetables',
+                                         price=Decimal('120.00'))
+        Inventory.objects.create(product=product, stock_available=10)
+        response = self.client.post('/api/checkout/create-order/', {
+            'customer_id': customer_id,
+            'shipping': {
+                'fullName': 'Queue Check', 'email': 'queue-check@example.com', 'phone': '03001112222',
+                'address': 'House 1, Street 1', 'city': 'Lahore', 'zipCode': '54000',
+            },
+            'billing': {'cardNumber': ''},
+            'items': [{'product_id': product.product_id, 'quantity': 2}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(list(OutboundEmail.objects.values_list('kind', 'status')),
+                         [('welcome', 'PENDING'), ('order_confirmation', 'PENDING')])
+
+        EmailQueueWorker(sender=BatchEmailSender(pool_size=1)).run(once=True)
+        self.assertEqual([message.to for message in mail.outbox], [['queue-check@example.com']] * 2)
+        self.assertEqual(set(OutboundEmail.objects.values_list('status', flat=True)), {'SENT'})
+
+    def test_only_due_emails_are_claimed(self):
+        due, = self.queue()
+        self.queue(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(claim_due_emails(10), [due])
+        self.assertEqual(claim_due_emails(10), [])
+
+    def test_failures_back_off(self):
+        email, = self.queue()
+        worker = EmailQueueWorker(sender=self.failing_sender(smtplib.SMTPServerDisconnected('gone')))
+        for attempts in (1, 2, 3):
+            before = timezone.now()
+            self.assertEqual(worker.process_batch(), 1)
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('PENDING', attempts))
+            self.assertGreaterEqual(email.next_attempt_at, before + retry_delay(attempts))
+            self.assertLessEqual(email.next_attempt_at, timezone.now() + retry_delay(attempts))
+            self.assertEqual(worker.process_batch(), 0)
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+        self.assertEqual(email.last_error, 'SMTPServerDisconnected: gone')
+
+    def test_permanent_errors_fail_at_once(self):
+        email, = self.queue()
+        refused = smtplib.SMTPRecipientsRefused({'customer0@example.com': (550, b'No such user')})
+        EmailQueueWorker(sender=self.failing_sender(refused)).process_batch()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('FAILED', 1))
+
+    @override_settings(EMAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        email, = self.queue(attempts=1)
+        worker = EmailQueueWorker(sender=self.failing_sender(smtplib.SMTPServerDisconnected('gone')))
+        worker.process_batch()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('FAILED', 2))
+        self.assertEqual(worker.failed, 1)
+
+    def test_stale_sending_emails_are_reclaimed(self):
+        now = timezone.now()
+        stale, = self.queue(status='SENDING', claimed_at=now - timedelta(hours=1))
+        self.queue(status='SENDING', claimed_at=now - timedelta(minutes=1))
+        EmailQueueWorker(sender=BatchEmailSender(pool_size=1)).run(once=True)
+        self.assertEqual([message.to for message in mail.outbox], [[stale.to_email]])
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts), ('SENT', 1))
+
+    def test_worker_retries_after_losing_the_database(self):
+        worker = EmailQueueWorker(sender=mock.Mock())
+        with mock.patch.object(worker, 'process_batch', side_effect=[
+            OperationalError('server closed the connection unexpectedly'), 0,
+        ]) as process_batch, mock.patch('main.email_queue.time.sleep', side_effect=[None, KeyboardInterrupt]):
+            with self.assertLogs('main.email_queue', level='WARNING') as logs, self.assertRaises(KeyboardInterrupt):
+                worker.run(poll_interval=1)
+        self.assertEqual(process_batch.call_count, 2)
+        self.assertEqual(logs.records[0].getMessage(), 'database_unavailable')
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(METRICS_DIR=self.directory, METRICS_TOKEN=''))
+
+    def scrape(self, **headers):
+        return self.client.get('/internal/metrics', REMOTE_ADDR='127.0.0.1', **headers)
+
+    def test_checkout_failures_and_latency_are_exported(self):
+        self.client.post('/api/checkout/create-order/', {'items': []}, content_type='application/json')
+        self.client.post('/api/checkout/create-order/', {'items': []}, content_type='application/json')
+        body = self.scrape().content.decode()
+        self.assertIn('farm2home_checkout_failures_total{exception="ValidationError"} 2.0', body)
+        self.assertIn('farm2home_view_latency_seconds_count{view="main:create_checkout_order"} 2.0', body)
+        self.assertIn('farm2home_view_latency_seconds_bucket{view="main:create_checkout_order",le="+Inf"} 2.0', body)
+
+    def test_worker_files_are_merged(self):
+        # Two other worker processes, as under gunicorn
+        first, second = MetricsFile(self.directory, 1), MetricsFile(self.directory, 2)
+        for worker, template in ((first, 'welcome'), (second, 'welcome'), (second, 'order_confirmation')):
+            worker.inc(json.dumps(['farm2home_emails_sent_total', '', [template]]), 1)
+        first.set(json.dumps(['farm2home_stripe_call_seconds', '', ['PaymentIntent.create']]), 0.8)
+        second.set(json.dumps(['farm2home_stripe_call_seconds', '', ['PaymentIntent.create']]), 0.3)
+        body = self.scrape().content.decode()
+        self.assertIn('farm2home_emails_sent_total{template="welcome"} 2.0', body)
+        self.assertIn('farm2home_emails_sent_total{template="order_confirmation"} 1.0', body)
+        self.assertIn('farm2home_stripe_call_seconds{call="PaymentIntent.create"} 0.3', body)
+
+    def test_scraping_needs_an_allowed_address_or_token(self):
+        self.assertEqual(self.scrape().status_code, 200)
+        self.assertEqual(self.client.get('/internal/metrics', REMOTE_ADDR='10.0.0.9').status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.scrape().status_code, 403)
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
@@ -23,6 +23,9 @@ urlpatterns = [
     # Returns products in the exact format expected by script.js on catalog page
     path('api/catalog/products/', views.catalog_products_api, name='catalog_products_api'),
     
+    # Search-as-you-type suggestions for the catalog search box
+    path('api/catalog/suggest/', views.catalog_suggest_api, name='catalog_suggest_api'),
+    
     # Checkout API endpoints
     # These endpoints handle the complete checkout flow from cart to order confirmation
     path('api/checkout/cart/', views.checkout_cart_api, name='checkout_cart_api'),
@@ -59,6 +62,11 @@ urlpatterns = [
     path('api/stripe/confirm-payment/', views.confirm_stripe_payment, name='confirm_stripe_payment'),
     path('api/stripe/payment-method/<str:payment_method_id>/', views.get_stripe_payment_method, name='get_stripe_payment_method'),
     
+    # ==================== INTERNAL ====================
+    
+    # Prometheus metrics (see main/metrics.py)
+    path('internal/metrics', views.internal_metrics, name='internal_metrics'),
+    
     # ==================== HTML PAGE ROUTES ====================
     
     # Home and landing
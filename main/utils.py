@@ -1,12 +1,19 @@
 """
 Email Utility Functions for Farm2Home
 Handles sending various email notifications to customers
+
+Emails are rendered here from precompiled HTML + plain text template pairs
+(see main/email_rendering.py) and queued in the database; the
+process_email_queue worker delivers them over SMTP (see main/email_queue.py),
+so no request ever waits on the mail server.
 """
 
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.conf import settings
-from django.utils.html import strip_tags
+import logging
+
+from .email_queue import enqueue_email, enqueue_emails
+from .email_rendering import render_email, render_emails
+
+logger = logging.getLogger(__name__)
 
 
 def send_welcome_email(customer):
@@ -17,7 +24,7 @@ def send_welcome_email(customer):
         customer: Customer model instance
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued successfully, False otherwise
     """
     try:
         subject = 'Welcome to Farm2Home! 🌾'
@@ -27,30 +34,66 @@ def send_welcome_email(customer):
             'customer_name': customer.name,
         }
         
-        # Render HTML email template
-        html_message = render_to_string('emails/welcome.html', context)
-        
-        # Create plain text version (fallback)
-        plain_message = strip_tags(html_message)
+        # Render HTML email and its plain text version
+        plain_message, html_message = render_email('welcome', context)
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[customer.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Queue email for the delivery worker
+        enqueue_email('welcome', customer.email, subject, plain_message, html_message)
         
-        print(f"✅ Welcome email sent successfully to {customer.email}")
+        logger.debug('email_queued', extra={'template': 'welcome', 'customer_id': customer.customer_id})
         return True
         
-    except Exception as e:
-        print(f"❌ Failed to send welcome email to {customer.email}: {str(e)}")
+    except Exception:
+        logger.exception('email_queue_failed', extra={'template': 'welcome', 'customer_id': customer.customer_id})
         return False
 
 
+def _order_confirmation_context(order):
+    """Template context for the order confirmation email"""
+    # Calculate item subtotals
+    items_with_subtotal = []
+    for item in order.order_items.all():
+        items_with_subtotal.append({
+            'product': item.product,
+            'quantity': item.quantity,
+            'price': f"{item.price:,.2f}",
+            'subtotal': f"{(item.quantity * item.price):,.2f}"
+        })
+    
+    # Get shipping info from order's temporary attribute if available
+    # Otherwise use customer's default information
+    if hasattr(order, 'shipping_info'):
+        shipping_info = order.shipping_info
+        shipping_name = shipping_info.get('name', order.customer.name)
+        shipping_address = shipping_info.get('address', 'Address on file')
+        shipping_city = shipping_info.get('city', 'City')
+        shipping_zip = shipping_info.get('zip', 'Postal Code')
+        shipping_phone = shipping_info.get('phone', order.customer.phone)
+    else:
+        # Fallback to customer information
+        shipping_name = order.customer.name
+        shipping_phone = order.customer.phone
+        shipping_address = 'Address on file'
+        shipping_city = 'City'
+        shipping_zip = 'Postal Code'
+    
+    # Template context with complete order details
+    return {
+        'customer_name': order.customer.name,
+        'order_id': order.order_id,
+        'order_date': order.order_date.strftime('%B %d, %Y at %I:%M %p'),
+        'total_amount': f"{order.total_amount:,.2f}",
+        'payment_method': order.payment if order.payment else 'Cash on Delivery',
+        'items': items_with_subtotal,
+        # Shipping/Delivery information
+        'shipping_name': shipping_name,
+        'shipping_phone': shipping_phone,
+        'shipping_address': shipping_address,
+        'shipping_city': shipping_city,
+        'shipping_zip': shipping_zip,
+    }
+
+
 def send_order_confirmation_email(order):
     """
     Send order confirmation email after successful order placement
@@ -59,82 +102,22 @@ def send_order_confirmation_email(order):
         order: Order model instance with related customer and order_items
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued successfully, False otherwise
     """
     try:
         subject = f'Order Confirmation #{order.order_id} - Farm2Home'
         
-        # Calculate item subtotals
-        items_with_subtotal = []
-        for item in order.order_items.all():
-            items_with_subtotal.append({
-                'product': item.product,
-                'quantity': item.quantity,
-                'price': f"{item.price:,.2f}",
-                'subtotal': f"{(item.quantity * item.price):,.2f}"
-            })
-        
-        # Get shipping info from order's temporary attribute if available
-        # Otherwise use customer's default information
-        if hasattr(order, 'shipping_info'):
-            shipping_info = order.shipping_info
-            shipping_name = shipping_info.get('name', order.customer.name)
-            shipping_address = shipping_info.get('address', 'Address on file')
-            shipping_city = shipping_info.get('city', 'City')
-            shipping_zip = shipping_info.get('zip', 'Postal Code')
-            shipping_phone = shipping_info.get('phone', order.customer.phone)
-        else:
-            # Fallback to customer information
-            shipping_name = order.customer.name
-            shipping_phone = order.customer.phone
-            shipping_address = 'Address on file'
-            shipping_city = 'City'
-            shipping_zip = 'Postal Code'
-        
-        # Prepare template context with complete order details
-        context = {
-            'customer_name': order.customer.name,
-            'order_id': order.order_id,
-            'order_date': order.order_date.strftime('%B %d, %Y at %I:%M %p'),
-            'total_amount': f"{order.total_amount:,.2f}",
-            'payment_method': order.payment if order.payment else 'Cash on Delivery',
-            'items': items_with_subtotal,
-            # Shipping/Delivery information
-            'shipping_name': shipping_name,
-            'shipping_phone': shipping_phone,
-            'shipping_address': shipping_address,
-            'shipping_city': shipping_city,
-            'shipping_zip': shipping_zip,
-        }
-        
-        # Render HTML email template
-        html_message = render_to_string('emails/order_confirmation.html', context)
-        
-        # Create plain text version (fallback)
-        plain_message = strip_tags(html_message)
+        # Render HTML email and its plain text version
+        plain_message, html_message = render_email('order_confirmation', _order_confirmation_context(order))
         
-        # Send email
-        print(f"📧 Attempting to send email to: {order.customer.email}")
-        print(f"📧 Using SMTP: {settings.EMAIL_HOST}")
-        print(f"📧 From: {settings.DEFAULT_FROM_EMAIL}")
+        # Queue email for the delivery worker
+        enqueue_email('order_confirmation', order.customer.email, subject, plain_message, html_message)
         
-        result = send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.customer.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        print(f"📧 Email send result: {result} (1 = success, 0 = failed)")
-        print(f"✅ Order confirmation email sent successfully to {order.customer.email} for Order #{order.order_id}")
+        logger.debug('email_queued', extra={'template': 'order_confirmation', 'order_id': order.order_id})
         return True
         
-    except Exception as e:
-        print(f"❌ Failed to send order confirmation email for Order #{order.order_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception('email_queue_failed', extra={'template': 'order_confirmation', 'order_id': order.order_id})
         return False
 
 
@@ -147,7 +130,7 @@ def send_password_reset_email(customer, reset_link):
         reset_link: String URL for password reset
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued successfully, False otherwise
     """
     try:
         subject = 'Password Reset Request - Farm2Home'
@@ -158,120 +141,124 @@ def send_password_reset_email(customer, reset_link):
             'reset_link': reset_link
         }
         
-        # Render HTML email template
-        html_message = render_to_string('emails/password_reset.html', context)
-        
-        # Create plain text version (fallback)
-        plain_message = strip_tags(html_message)
+        # Render HTML email and its plain text version
+        plain_message, html_message = render_email('password_reset', context)
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[customer.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Queue email for the delivery worker
+        enqueue_email('password_reset', customer.email, subject, plain_message, html_message)
         
-        print(f"✅ Password reset email sent successfully to {customer.email}")
+        logger.debug('email_queued', extra={'template': 'password_reset', 'customer_id': customer.customer_id})
         return True
         
-    except Exception as e:
-        print(f"❌ Failed to send password reset email to {customer.email}: {str(e)}")
+    except Exception:
+        logger.exception('email_queue_failed', extra={'template': 'password_reset', 'customer_id': customer.customer_id})
         return False
 
 
-def send_order_shipped_email(order, tracking_number=None):
+def _order_shipped_context(order, tracking_number=None):
+    """Template context for the shipping notification email"""
+    return {
+        'customer_name': order.customer.name,
+        'order_id': order.order_id,
+        'tracking_number': tracking_number,
+    }
+
+
+def _order_delivered_context(order):
+    """Template context for the delivery confirmation email"""
+    return {
+        'customer_name': order.customer.name,
+        'order_id': order.order_id,
+    }
+
+
+def send_order_shipped_emails(orders, tracking_numbers=None):
     """
-    Send notification when order is shipped (for future use)
+    Send shipping notifications for many orders at once (admin bulk actions)
+    All emails are rendered in one pass and queued with a single INSERT; the queue
+    worker then delivers them over pooled SMTP connections
     
     Args:
-        order: Order model instance
-        tracking_number: Optional tracking number string
+        orders: Order instances (use select_related('customer'))
+        tracking_numbers: Optional dict of order_id -> tracking number
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        int: Number of emails queued
     """
+    tracking_numbers = tracking_numbers or {}
     try:
-        subject = f'Your Order #{order.order_id} Has Been Shipped! 🚚'
-        
-        # Simple HTML message for now
-        html_message = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif;">
-            <h2>Hi {order.customer.name},</h2>
-            <p>Great news! Your order #{order.order_id} has been shipped and is on its way to you!</p>
-            {f'<p><strong>Tracking Number:</strong> {tracking_number}</p>' if tracking_number else ''}
-            <p>You should receive your fresh produce within 24-48 hours.</p>
-            <p>Thank you for choosing Farm2Home!</p>
-            <br>
-            <p style="color: #666;">Farm2Home - Fresh Organic Produce</p>
-        </body>
-        </html>
-        """
+        orders = list(orders)
+        rendered = render_emails('order_shipped', [
+            _order_shipped_context(order, tracking_numbers.get(order.order_id)) for order in orders
+        ])
+        emails = [
+            ('order_shipped', order.customer.email,
+             f'Your Order #{order.order_id} Has Been Shipped! 🚚', plain_message, html_message)
+            for order, (plain_message, html_message) in zip(orders, rendered)
+        ]
         
-        plain_message = strip_tags(html_message)
+        queued = enqueue_emails(emails)
+        logger.info('emails_queued', extra={'template': 'order_shipped', 'count': queued})
+        return queued
         
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.customer.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+    except Exception:
+        logger.exception('email_queue_failed', extra={'template': 'order_shipped'})
+        return 0
+
+
+def send_order_delivered_emails(orders):
+    """
+    Send delivery confirmations for many orders at once (admin bulk actions)
+    All emails are rendered in one pass and queued with a single INSERT; the queue
+    worker then delivers them over pooled SMTP connections
+    
+    Args:
+        orders: Order instances (use select_related('customer'))
+    
+    Returns:
+        int: Number of emails queued
+    """
+    try:
+        orders = list(orders)
+        rendered = render_emails('order_delivered', [_order_delivered_context(order) for order in orders])
+        emails = [
+            ('order_delivered', order.customer.email,
+             f'Your Order #{order.order_id} Has Been Delivered! ✅', plain_message, html_message)
+            for order, (plain_message, html_message) in zip(orders, rendered)
+        ]
         
-        print(f"✅ Shipping notification email sent successfully to {order.customer.email}")
-        return True
+        queued = enqueue_emails(emails)
+        logger.info('emails_queued', extra={'template': 'order_delivered', 'count': queued})
+        return queued
         
-    except Exception as e:
-        print(f"❌ Failed to send shipping notification email: {str(e)}")
-        return False
+    except Exception:
+        logger.exception('email_queue_failed', extra={'template': 'order_delivered'})
+        return 0
+
+
+def send_order_shipped_email(order, tracking_number=None):
+    """
+    Send notification when order is shipped
+    
+    Args:
+        order: Order model instance
+        tracking_number: Optional tracking number string
+    
+    Returns:
+        bool: True if email was queued successfully, False otherwise
+    """
+    tracking_numbers = {order.order_id: tracking_number} if tracking_number else None
+    return send_order_shipped_emails([order], tracking_numbers) == 1
 
 
 def send_order_delivered_email(order):
     """
-    Send notification when order is delivered (for future use)
+    Send notification when order is delivered
     
     Args:
         order: Order model instance
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued successfully, False otherwise
     """
-    try:
-        subject = f'Your Order #{order.order_id} Has Been Delivered! ✅'
-        
-        # Simple HTML message for now
-        html_message = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif;">
-            <h2>Hi {order.customer.name},</h2>
-            <p>Your order #{order.order_id} has been successfully delivered!</p>
-            <p>We hope you enjoy your fresh, organic produce from Farm2Home.</p>
-            <p>If you have any questions or concerns about your order, please don't hesitate to contact us.</p>
-            <p><strong>We'd love to hear your feedback!</strong> Please consider leaving a review.</p>
-            <br>
-            <p style="color: #666;">Thank you for choosing Farm2Home!</p>
-        </body>
-        </html>
-        """
-        
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.customer.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        print(f"✅ Delivery confirmation email sent successfully to {order.customer.email}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Failed to send delivery confirmation email: {str(e)}")
-        return False
+    return send_order_delivered_emails([order]) == 1
@@ -1,13 +1,20 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.utils.decorators import method_decorator
 from .models import Product, Inventory, Customer, Order, OrderItem, Cart, Address, PasswordResetToken
 from .serializers import (
     ProductSerializer, ProductListSerializer, 
-    ProductCatalogSerializer,
+    ProductListRowRenderer,
     InventorySerializer, CustomerSerializer, CustomerProfileSerializer,
     OrderSerializer, OrderCreateSerializer, OrderSummarySerializer,
     CartSerializer, CheckoutCartItemSerializer,
@@ -15,9 +22,25 @@ from .serializers import (
     AddressSerializer
 )
 from .utils import send_welcome_email, send_order_confirmation_email, send_password_reset_email
+from .catalog import (
+    catalog_cache, get_catalog_data, normalize_catalog_params,
+    catalog_products_etag, catalog_products_last_modified,
+    product_api_etag, product_api_last_modified
+)
+from .search import search_products, relevance_ordering, suggest_products, MAX_SUGGESTIONS
+from .inventory import InsufficientStockError, hold_stock, release_holds
+from .idempotency import idempotent
+from .customer_stats import annotate_order_stats, annotate_order_count
+from .orders import order_items_prefetch
+from .pagination import OrderCursorPagination
+from .streaming import StreamingListMixin
+from .metrics import CHECKOUT_FAILURES, ORDERS_CREATED, STRIPE_CALL_SECONDS, render_metrics
+
+logger = logging.getLogger(__name__)
 
 # ==================== API VIEWS ====================
 
+@condition(etag_func=catalog_products_etag, last_modified_func=catalog_products_last_modified)
 @api_view(['GET'])
 def catalog_products_api(request):
     """
@@ -28,94 +51,73 @@ def catalog_products_api(request):
     - category: Filter by category (vegetables, fruits, herbs)
     - season: Filter by season (summer, winter, year-round)
     - in_stock: Filter only in-stock items (true/false)
-    - search: Search by name or local name
+    - search: Fuzzy search by name, local name, category or slug (typos allowed)
     - price_min: Minimum price filter
     - price_max: Maximum price filter
-    - sort: Sort order (price_low, price_high, name_asc, name_desc, featured)
+    - sort: Sort order (price_low, price_high, name_asc, name_desc, date_new,
+            featured, relevance)
+    
+    Results are answered from an in-memory snapshot of active products and
+    cached per normalized parameter set. Both are refreshed whenever a Product
+    or Inventory row changes (see main/catalog.py)
+    
+    Supports conditional GET: responses carry ETag and Last-Modified headers,
+    and a matching If-None-Match / If-Modified-Since returns 304 Not Modified
     
     Returns: JSON array of products matching frontend structure
     """
-    # Start with active products and optimize query with select_related
-    products = Product.objects.filter(is_active=True).select_related('inventory')
-    
-    # ===== CATEGORY FILTER =====
-    category = request.GET.get('category')
-    if category and category != 'all':
-        products = products.filter(category__iexact=category)
-    
-    # ===== SEASON FILTER =====
-    # Convert frontend format (summer, winter, year-round) to DB format (SUMMER, WINTER, ALL_YEAR)
-    season = request.GET.get('season')
-    if season:
-        season_mapping = {
-            'summer': 'SUMMER',
-            'winter': 'WINTER',
-            'year-round': 'ALL_YEAR'
-        }
-        db_season = season_mapping.get(season.lower())
-        if db_season:
-            products = products.filter(season=db_season)
-    
-    # ===== IN STOCK FILTER =====
-    in_stock = request.GET.get('in_stock')
-    if in_stock and in_stock.lower() == 'true':
-        products = products.filter(inventory__stock_available__gt=0)
-    
-    # ===== SEARCH FILTER =====
-    # Search in both English name and local name (variety)
-    search = request.GET.get('search')
-    if search:
-        search_term = search.strip()
-        if search_term:
-            products = products.filter(
-                Q(name__icontains=search_term) | Q(local_name__icontains=search_term)
-            )
+    # Normalize query parameters so equivalent requests share a cache entry
+    params = normalize_catalog_params(request.GET)
     
-    # ===== PRICE RANGE FILTERS =====
-    price_min = request.GET.get('price_min')
-    if price_min:
-        try:
-            products = products.filter(price__gte=float(price_min))
-        except (ValueError, TypeError):
-            pass  # Ignore invalid price values
+    # Serve from the versioned catalog cache when possible
+    cached_data = catalog_cache.get(params)
+    if cached_data is not None:
+        return Response(cached_data, status=status.HTTP_200_OK)
     
-    price_max = request.GET.get('price_max')
-    if price_max:
-        try:
-            products = products.filter(price__lte=float(price_max))
-        except (ValueError, TypeError):
-            pass
-    
-    # ===== SORTING =====
-    sort_by = request.GET.get('sort', 'featured')
-    
-    if sort_by == 'price_low':
-        products = products.order_by('price', 'name')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price', 'name')
-    elif sort_by == 'name_asc':
-        products = products.order_by('name')
-    elif sort_by == 'name_desc':
-        products = products.order_by('-name')
-    elif sort_by == 'date_new':
-        # Sort by newest first (using product_id as proxy for creation order)
-        products = products.order_by('-product_id')
-    else:  # featured or default
-        # Default sorting: by category and name
-        products = products.order_by('category', 'name')
-    
-    # ===== SERIALIZE AND RETURN =====
-    serializer = ProductCatalogSerializer(products, many=True)
+    # Filter and sort from the in-memory catalog snapshot (main/catalog.py)
+    data = get_catalog_data(params)
+    catalog_cache.set(params, data)
     
     # Return the data with proper JSON response
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def catalog_suggest_api(request):
+    """
+    Search-as-you-type suggestions for the catalog search box
+    GET /api/catalog/suggest/?q=tom&limit=8
+    
+    Matches the start of the English name, the local (Urdu) name, or any word
+    of either. Answered from an in-memory prefix trie that is rebuilt whenever
+    a Product row changes (see main/search.py)
+    
+    Query Parameters:
+    - q: What the customer has typed so far
+    - limit: Maximum number of suggestions (default 8, max 20)
+    
+    Returns: {'status': 'success', 'query': q, 'suggestions': [...]}
+    """
+    query = request.GET.get('q', '')
+    
+    try:
+        limit = int(request.GET.get('limit', 8))
+    except (TypeError, ValueError):
+        limit = 8
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    
+    return Response({
+        'status': 'success',
+        'query': query,
+        'suggestions': suggest_products(query, limit)
+    }, status=status.HTTP_200_OK)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
     """
     API endpoint for products
-    GET /api/products/ - List all products
-    GET /api/products/{id}/ - Get product details
+    GET /api/products/ - List all products (conditional GET supported)
+    GET /api/products/{id}/ - Get product details (conditional GET supported)
     POST /api/products/ - Create product
     PUT /api/products/{id}/ - Update product
     DELETE /api/products/{id}/ - Delete product
@@ -140,20 +142,44 @@ class ProductViewSet(viewsets.ModelViewSet):
         if season:
             queryset = queryset.filter(season=season)
         
-        # Search by name
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(local_name__icontains=search)
-            )
-        
         # Filter by stock availability
         in_stock = self.request.query_params.get('in_stock', None)
         if in_stock == 'true':
             queryset = queryset.filter(inventory__stock_available__gt=0)
         
+        # Fuzzy search (name, local name, category, slug) - best match first
+        search = self.request.query_params.get('search', None)
+        if search:
+            product_ids = search_products(search)
+            return queryset.filter(product_id__in=product_ids).order_by(
+                relevance_ordering(product_ids)
+            )
+        
         return queryset.order_by('category', 'name')
     
+    @method_decorator(condition(etag_func=product_api_etag, last_modified_func=product_api_last_modified))
+    def list(self, request, *args, **kwargs):
+        """
+        List products using the values()-based fast path renderer
+        Output is identical to ProductListSerializer
+        Supports conditional GET (ETag / Last-Modified -> 304 Not Modified)
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            *ProductListRowRenderer.value_fields
+        )
+        renderer = ProductListRowRenderer()
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(renderer.render_many(page))
+        
+        return Response(renderer.render_many(queryset))
+    
+    @method_decorator(condition(etag_func=product_api_etag, last_modified_func=product_api_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        """Get product details - supports conditional GET like list()"""
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get all unique categories"""
@@ -174,10 +200,38 @@ class CartViewSet(viewsets.ModelViewSet):
     POST /api/cart/ - Add item to cart
     PUT /api/cart/{id}/ - Update cart item
     DELETE /api/cart/{id}/ - Remove cart item
+    
+    Every cart line holds its quantity in stock for CART_HOLD_TIMEOUT seconds
+    (refreshed whenever the line changes) - see main/inventory.py
     """
     serializer_class = CartSerializer
     lookup_field = 'cart_id'
     
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            cart_item = serializer.save()
+            self._hold(cart_item)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous_product_id = serializer.instance.product_id
+            cart_item = serializer.save()
+            if cart_item.product_id != previous_product_id:
+                release_holds(cart_item.customer_id, [previous_product_id])
+            self._hold(cart_item)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            release_holds(instance.customer_id, [instance.product_id])
+            instance.delete()
+    
+    def _hold(self, cart_item):
+        """Hold the cart line's quantity in stock (rolls the change back if it's gone)"""
+        try:
+            hold_stock(cart_item.customer_id, cart_item.product_id, cart_item.quantity)
+        except InsufficientStockError as e:
+            raise ValidationError({'quantity': [str(e)]})
+    
     def get_queryset(self):
         customer_id = self.request.query_params.get('customer_id')
         if customer_id:
@@ -192,15 +246,19 @@ class CartViewSet(viewsets.ModelViewSet):
         quantity = request.data.get('quantity', 1)
         
         try:
-            cart_item, created = Cart.objects.get_or_create(
-                customer_id=customer_id,
-                product_id=product_id,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            with transaction.atomic():
+                cart_item, created = Cart.objects.get_or_create(
+                    customer_id=customer_id,
+                    product_id=product_id,
+                    defaults={'quantity': quantity}
+                )
+                
+                if not created:
+                    cart_item.quantity += quantity
+                    cart_item.save()
+                
+                # Hold the new quantity in stock (raises if it's not available)
+                hold_stock(cart_item.customer_id, cart_item.product_id, cart_item.quantity)
             
             serializer = self.get_serializer(cart_item)
             return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -212,7 +270,9 @@ class CartViewSet(viewsets.ModelViewSet):
         """Clear entire cart for customer"""
         customer_id = request.query_params.get('customer_id')
         if customer_id:
-            deleted_count = Cart.objects.filter(customer_id=customer_id).delete()[0]
+            with transaction.atomic():
+                release_holds(customer_id)
+                deleted_count = Cart.objects.filter(customer_id=customer_id).delete()[0]
             return Response({'message': f'Cart cleared. {deleted_count} items removed.'})
         return Response({'error': 'Customer ID required'}, status=status.HTTP_400_BAD_REQUEST)
     
@@ -233,15 +293,22 @@ class CartViewSet(viewsets.ModelViewSet):
         })
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     API endpoint for orders
     GET /api/orders/ - List all orders
+    GET /api/orders/?stream=1 - Stream every order (JSON array, or NDJSON - see main/streaming.py)
     GET /api/orders/?customer_id=1 - Get customer orders
     POST /api/orders/ - Create new order
     GET /api/orders/{id}/ - Get order details
+    
+    Lists (here and GET /api/customers/{id}/orders/) are keyset-paged with
+    ?cursor=...&page_size=N and answer {"next", "next_cursor", "results"}.
+    There is no "count" or "previous" any more, and ?page=N is ignored - follow
+    "next" (or pass next_cursor) to get the following page.
     """
-    queryset = Order.objects.all().prefetch_related('order_items__product')
+    queryset = Order.objects.select_related('customer').prefetch_related(order_items_prefetch())
+    pagination_class = OrderCursorPagination  # ?cursor=... (see main/pagination.py)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -253,13 +320,14 @@ class OrderViewSet(viewsets.ModelViewSet):
         customer_id = self.request.query_params.get('customer_id')
         if customer_id:
             queryset = queryset.filter(customer_id=customer_id)
-        return queryset.order_by('-order_date')
+        return queryset.order_by('-order_date', '-order_id')
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     API endpoint for customers
     GET /api/customers/ - List all customers
+    GET /api/customers/?stream=1 - Stream every customer (JSON array, or NDJSON - see main/streaming.py)
     POST /api/customers/ - Create customer
     GET /api/customers/{id}/ - Get customer details
     PUT /api/customers/{id}/ - Update customer
@@ -270,17 +338,22 @@ class CustomerViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def orders(self, request, pk=None):
-        """Get all orders for a customer"""
+        """Get a customer's orders, keyset-paged like /api/orders/"""
         customer = self.get_object()
-        orders = customer.orders.all().order_by('-order_date')
+        paginator = OrderCursorPagination()
+        orders = paginator.paginate_queryset(
+            customer.orders.select_related('customer').prefetch_related(order_items_prefetch()),
+            request, view=self
+        )
         serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     API endpoint for inventory management
     GET /api/inventory/ - List all inventory
+    GET /api/inventory/?stream=1 - Stream all inventory (JSON array, or NDJSON - see main/streaming.py)
     PUT /api/inventory/{id}/ - Update stock
     """
     queryset = Inventory.objects.all().select_related('product')
@@ -382,6 +455,7 @@ def checkout_cart_api(request):
 
 @api_view(['POST'])
 @csrf_exempt
+@idempotent('checkout.create_order')
 def create_checkout_order(request):
     """
     API endpoint to create a complete order from checkout
@@ -389,6 +463,10 @@ def create_checkout_order(request):
     
     ✅ CSRF EXEMPT - This endpoint is accessible from frontend without CSRF token
     
+    Send an Idempotency-Key header to make retries safe: a repeated request
+    with the same key gets the first response back instead of a second order
+    (see main/idempotency.py)
+    
     Expected POST data structure:
     {
         "shipping": {
@@ -427,15 +505,13 @@ def create_checkout_order(request):
     7. Clears customer's Cart
     8. Returns order confirmation data
     """
-    # Log incoming request data for debugging
-    print("=" * 60)
-    print("🛒 CREATING ORDER - Request received")
-    print("=" * 60)
-    print(f"📦 Items: {len(request.data.get('items', []))}")
-    print(f"👤 Customer ID: {request.data.get('customer_id')}")
-    print(f"📧 Email: {request.data.get('shipping', {}).get('email')}")
-    print(f"💳 Payment: {request.data.get('billing', {}).get('cardNumber', 'COD')[:4]}...")
-    print("=" * 60)
+    # Log incoming request data for debugging (no card or contact details)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('checkout_received', extra={
+            'items': len(request.data.get('items', [])),
+            'customer_id': request.data.get('customer_id'),
+            'payment': 'card' if request.data.get('billing', {}).get('cardNumber') else 'cod',
+        })
     
     # Validate request data using CheckoutOrderCreateSerializer
     serializer = CheckoutOrderCreateSerializer(data=request.data)
@@ -447,28 +523,41 @@ def create_checkout_order(request):
             # order items creation, inventory updates, and cart clearing
             order = serializer.save()
             
-            # Send order confirmation email
+            # Queue order confirmation email (delivered by process_email_queue,
+            # so checkout never waits on SMTP)
             try:
                 send_order_confirmation_email(order)
-            except Exception as e:
+            except Exception:
                 # Log error but don't fail order creation if email fails
-                print(f"Warning: Failed to send order confirmation email: {str(e)}")
+                logger.warning('order_confirmation_email_failed', exc_info=True, extra={'order_id': order.order_id})
             
             # Prepare order confirmation response
             confirmation_serializer = OrderConfirmationSerializer(order)
             
-            print(f"✅ Order #{order.order_id} created successfully!")
-            print(f"📦 Total: Rs. {order.total_amount}")
-            print(f"🛒 Cart cleared for customer #{order.customer.customer_id}")
-            print("=" * 60)
+            ORDERS_CREATED.inc()
+            
+            logger.info('order_created', extra={
+                'order_id': order.order_id,
+                'customer_id': order.customer_id,
+                'total_amount': str(order.total_amount),
+            })
             
             return Response(
                 confirmation_serializer.data, 
                 status=status.HTTP_201_CREATED
             )
         
+        except InsufficientStockError as e:
+            # Stock ran out between validation and the stock update
+            CHECKOUT_FAILURES.inc(exception='InsufficientStockError')
+            return Response({
+                'error': 'Insufficient stock',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         except Inventory.DoesNotExist as e:
             # Handle case where product has no inventory record
+            CHECKOUT_FAILURES.inc(exception='Inventory.DoesNotExist')
             return Response({
                 'error': 'Product inventory not found',
                 'detail': str(e)
@@ -476,6 +565,7 @@ def create_checkout_order(request):
         
         except Product.DoesNotExist as e:
             # Handle case where product doesn't exist
+            CHECKOUT_FAILURES.inc(exception='Product.DoesNotExist')
             return Response({
                 'error': 'Product not found',
                 'detail': str(e)
@@ -483,15 +573,15 @@ def create_checkout_order(request):
         
         except Exception as e:
             # Handle any other unexpected errors during order creation
+            CHECKOUT_FAILURES.inc(exception='Exception')
             return Response({
                 'error': 'Failed to create order',
                 'detail': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     # Return validation errors if serializer validation failed
-    print("❌ Order validation failed!")
-    print(f"Errors: {serializer.errors}")
-    print("=" * 60)
+    CHECKOUT_FAILURES.inc(exception='ValidationError')
+    logger.info('checkout_invalid', extra={'errors': serializer.errors})
     
     return Response({
         'error': 'Invalid order data',
@@ -518,7 +608,7 @@ def get_order_confirmation(request, order_id):
     try:
         # Fetch order with related items and product data
         order = Order.objects.prefetch_related(
-            'order_items__product'
+            order_items_prefetch()
         ).get(order_id=order_id)
         
         # Serialize order data for confirmation display
@@ -717,12 +807,12 @@ def api_signup(request):
             password=hashed_password
         )
         
-        # Send welcome email to new customer
+        # Queue welcome email to new customer
         try:
             send_welcome_email(customer)
-        except Exception as e:
+        except Exception:
             # Log error but don't fail registration if email fails
-            print(f"Warning: Failed to send welcome email: {str(e)}")
+            logger.warning('welcome_email_failed', exc_info=True, extra={'customer_id': customer.customer_id})
         
         # Return success response with customer data
         return Response({
@@ -799,7 +889,7 @@ def api_request_password_reset(request):
         # For development, use localhost
         reset_link = f"{request.scheme}://{request.get_host()}/landing/?token={reset_token.token}"
         
-        # Send password reset email
+        # Queue password reset email
         try:
             email_sent = send_password_reset_email(customer, reset_link)
             
@@ -816,7 +906,7 @@ def api_request_password_reset(request):
                 
         except Exception as email_error:
             # Log error but still return success to prevent email enumeration
-            print(f"❌ Failed to send password reset email: {str(email_error)}")
+            logger.error('password_reset_email_failed', exc_info=True, extra={'customer_id': customer.customer_id})
             return Response({
                 'success': False,
                 'error': 'Failed to send reset email. Please try again later.',
@@ -978,8 +1068,8 @@ def customer_profile_api(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Get customer with prefetch for optimization
-        customer = Customer.objects.prefetch_related('orders').get(customer_id=customer_id)
+        # Get customer and its order statistics (from the stats rollup) in one query
+        customer = annotate_order_stats(Customer.objects.all()).get(customer_id=customer_id)
         
         # Serialize customer data with statistics
         from .serializers import CustomerProfileSerializer
@@ -1012,6 +1102,7 @@ def customer_orders_summary_api(request):
     Query Parameters:
     - customer_id (required): The ID of the customer
     - limit (optional): Number of recent orders to return (default: 3)
+    - cursor (optional): next_cursor of the previous call, for older orders
     
     Returns:
     {
@@ -1028,13 +1119,13 @@ def customer_orders_summary_api(request):
             },
             ...
         ],
-        "count": 3
+        "count": 3,
+        "next_cursor": "MjAyNC0xMS0yOFQxMDozMDowMCswMDowMHwxMTI4"
     }
     
     Use Case: Called by account overview page to populate recent orders list
     """
     customer_id = request.GET.get('customer_id')
-    limit = request.GET.get('limit', 3)
     
     # Validate customer_id parameter
     if not customer_id:
@@ -1044,14 +1135,6 @@ def customer_orders_summary_api(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Validate limit parameter
-        try:
-            limit = int(limit)
-            if limit <= 0:
-                limit = 3
-        except (ValueError, TypeError):
-            limit = 3
-        
         # Verify customer exists
         try:
             customer = Customer.objects.get(customer_id=customer_id)
@@ -1061,12 +1144,15 @@ def customer_orders_summary_api(request):
                 'message': f'Customer with ID {customer_id} not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get recent orders with prefetch for optimization
-        orders = Order.objects.filter(
-            customer_id=customer_id
-        ).prefetch_related(
-            'order_items__product'
-        ).order_by('-order_date')[:limit]
+        # Get recent orders with their items and products (one query for all items),
+        # keyset-paged with `limit` orders per page (invalid limits fall back to 3)
+        paginator = OrderCursorPagination()
+        paginator.page_size = 3
+        paginator.page_size_query_param = 'limit'
+        orders = paginator.paginate_queryset(
+            Order.objects.filter(customer_id=customer_id).prefetch_related(order_items_prefetch()),
+            request
+        )
         
         # Serialize orders
         from .serializers import OrderSummarySerializer
@@ -1075,9 +1161,16 @@ def customer_orders_summary_api(request):
         return Response({
             'status': 'success',
             'data': serializer.data,
-            'count': len(serializer.data)
+            'count': len(serializer.data),
+            'next_cursor': paginator.get_next_cursor()
         }, status=status.HTTP_200_OK)
     
+    except NotFound:
+        return Response({
+            'status': 'error',
+            'message': 'Invalid cursor'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
     except Exception as e:
         return Response({
             'status': 'error',
@@ -1089,10 +1182,12 @@ def customer_orders_summary_api(request):
 @api_view(['GET'])
 def customer_orders_api(request):
     """
-    API endpoint to get ALL orders for customer (for Orders page)
+    API endpoint to get a customer's orders, a page at a time (for Orders page)
     
     Query Parameters:
     - customer_id (required): The ID of the customer
+    - page_size (optional): Orders per page (default: 100, max: 500)
+    - cursor (optional): next_cursor of the previous page (omit for the first page)
     
     Returns:
     {
@@ -1123,11 +1218,15 @@ def customer_orders_api(request):
             },
             ...
         ],
-        "count": 47
+        "count": 47,
+        "total": 312,
+        "next_cursor": "MjAyNC0xMS0yOFQxMDozMDowMCswMDowMHwxMTI4"
     }
+    count is the number of orders on this page and total the customer's number
+    of orders; next_cursor is null on the last page.
     
     Use Case: Called by orders page to display complete order history with all details
-    Difference from orders-summary: Returns ALL orders (not just 3) with complete order_items data
+    Difference from orders-summary: Pages through ALL orders with complete order_items data
     """
     customer_id = request.GET.get('customer_id')
     
@@ -1141,19 +1240,20 @@ def customer_orders_api(request):
     try:
         # Verify customer exists
         try:
-            customer = Customer.objects.get(customer_id=customer_id)
+            customer = annotate_order_count(Customer.objects.all()).get(customer_id=customer_id)
         except Customer.DoesNotExist:
             return Response({
                 'status': 'error',
                 'message': f'Customer with ID {customer_id} not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get ALL orders for this customer with prefetch for optimization
-        orders = Order.objects.filter(
-            customer_id=customer_id
-        ).prefetch_related(
-            'order_items__product'
-        ).order_by('-order_date')  # Most recent first
+        # Get one page of orders with their items and products (one query for all items),
+        # most recent first - keyset-paged so page 500 costs the same as page 1
+        paginator = OrderCursorPagination()
+        orders = paginator.paginate_queryset(
+            Order.objects.filter(customer_id=customer_id).prefetch_related(order_items_prefetch()),
+            request
+        )
         
         # Serialize orders with complete details
         from .serializers import OrderDetailSerializer
@@ -1162,9 +1262,17 @@ def customer_orders_api(request):
         return Response({
             'status': 'success',
             'data': serializer.data,
-            'count': len(serializer.data)
+            'count': len(serializer.data),
+            'total': customer.total_orders,
+            'next_cursor': paginator.get_next_cursor()
         }, status=status.HTTP_200_OK)
     
+    except NotFound:
+        return Response({
+            'status': 'error',
+            'message': 'Invalid cursor'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
     except Exception as e:
         return Response({
             'status': 'error',
@@ -1912,6 +2020,7 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 @api_view(['POST'])
 @csrf_exempt
+@idempotent('stripe.create_payment_intent')
 def create_payment_intent(request):
     """
     Create a Stripe Payment Intent for processing card payments
@@ -1923,6 +2032,10 @@ def create_payment_intent(request):
         - customer_id: int (required)
         - description: str (optional)
     
+    Headers:
+        - Idempotency-Key (optional): a retry with the same key returns the
+          first Payment Intent instead of creating another
+    
     Returns:
         - 200: Payment Intent created successfully with client_secret
         - 400: Invalid request
@@ -1944,18 +2057,21 @@ def create_payment_intent(request):
         amount_cents = int(float(amount) * 100)
         
         # Create Payment Intent
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount_cents,
-            currency=currency,
-            description=description,
-            metadata={
-                'customer_id': str(customer_id)
-            },
-            # Automatic payment methods for card
-            automatic_payment_methods={
-                'enabled': True,
-            },
-        )
+        with STRIPE_CALL_SECONDS.time(call='PaymentIntent.create'):
+            payment_intent = stripe.PaymentIntent.create(
+                amount=amount_cents,
+                currency=currency,
+                description=description,
+                metadata={
+                    'customer_id': str(customer_id)
+                },
+                # Automatic payment methods for card
+                automatic_payment_methods={
+                    'enabled': True,
+                },
+                # Stripe de-duplicates on its side too if our stored response is lost
+                idempotency_key=request.headers.get('Idempotency-Key'),
+            )
         
         return Response({
             'status': 'success',
@@ -2000,7 +2116,8 @@ def confirm_stripe_payment(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Retrieve payment intent from Stripe
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        with STRIPE_CALL_SECONDS.time(call='PaymentIntent.retrieve'):
+            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
         
         if payment_intent.status == 'succeeded':
             return Response({
@@ -2042,7 +2159,8 @@ def get_stripe_payment_method(request, payment_method_id):
     """
     try:
         # Retrieve payment method from Stripe
-        payment_method = stripe.PaymentMethod.retrieve(payment_method_id)
+        with STRIPE_CALL_SECONDS.time(call='PaymentMethod.retrieve'):
+            payment_method = stripe.PaymentMethod.retrieve(payment_method_id)
         
         return Response({
             'status': 'success',
@@ -2066,3 +2184,27 @@ def get_stripe_payment_method(request, payment_method_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ==================== INTERNAL METRICS ====================
+
+def internal_metrics(request):
+    """
+    Prometheus scrape endpoint
+    GET /internal/metrics
+    
+    Serves the metrics of every server process (see main/metrics.py) in the
+    Prometheus text format. With METRICS_TOKEN set the scraper must send
+    "Authorization: Bearer <token>"; without it only METRICS_ALLOWED_IPS may scrape.
+    
+    Returns:
+        - 200: Metrics (text/plain; version=0.0.4)
+        - 403: Missing or wrong token / address not allowed
+    """
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+        )
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -355,7 +355,7 @@ async function loadUserProfile() {
         }
         
         // Load total orders count
-        const response = await fetch(`/api/orders/?customer_id=${customerId}`, {
+        const response = await fetch(`/api/customer/orders/?customer_id=${customerId}&page_size=1`, {
             method: 'GET',
             headers: {
                 'Content-Type': 'application/json'
@@ -365,7 +365,7 @@ async function loadUserProfile() {
         const data = await response.json();
         
         if (response.ok && data.status === 'success') {
-            const totalOrders = data.count || data.data?.length || 0;
+            const totalOrders = data.total ?? data.data?.length ?? 0;
             document.getElementById('totalOrders').textContent = `${totalOrders} Order${totalOrders !== 1 ? 's' : ''}`;
         } else {
             console.error('Failed to load orders:', data);
@@ -246,11 +246,12 @@ function updateOrdersCount() {
     const customerId = localStorage.getItem('customer_id');
     if (!el || !customerId) return;
     
-    fetch(`/api/customer/orders/?customer_id=${customerId}`)
+    // Only the total is needed, so ask for the smallest page
+    fetch(`/api/customer/orders/?customer_id=${customerId}&page_size=1`)
         .then(r => r.json())
         .then(data => {
             if (data.status === 'success' && data.data) {
-                const count = data.data.length;
+                const count = data.total ?? data.data.length;
                 el.textContent = `${count} ${count === 1 ? 'Order' : 'Orders'}`;
             }
         })
@@ -256,9 +256,13 @@ function setupEventListeners() {
     const headerSearch = document.getElementById('headerSearch');
     if (productSearch) {
         productSearch.addEventListener('input', handleSearch);
+        productSearch.addEventListener('input', handleSuggest);
+        productSearch.setAttribute('list', 'productSuggestions');
     }
     if (headerSearch) {
         headerSearch.addEventListener('input', handleSearch);
+        headerSearch.addEventListener('input', handleSuggest);
+        headerSearch.setAttribute('list', 'productSuggestions');
     }
     
     // View toggle buttons
@@ -1217,6 +1221,49 @@ function handleSearch(event) {
     updateProductCount(searched.length);
 }
 
+// ===============================================
+// SEARCH SUGGESTIONS (AUTOCOMPLETE)
+// ===============================================
+let suggestTimer = null;
+
+function handleSuggest(event) {
+    const query = event.target.value.trim();
+    
+    // Wait until typing pauses before asking the server
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(() => fetchSuggestions(query), 150);
+}
+
+async function fetchSuggestions(query) {
+    let datalist = document.getElementById('productSuggestions');
+    if (!datalist) {
+        datalist = document.createElement('datalist');
+        datalist.id = 'productSuggestions';
+        document.body.appendChild(datalist);
+    }
+    
+    if (query === '') {
+        datalist.innerHTML = '';
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/catalog/suggest/?q=${encodeURIComponent(query)}&limit=8`);
+        if (!response.ok) return;
+        const data = await response.json();
+        
+        datalist.innerHTML = '';
+        data.suggestions.forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.name;
+            option.label = suggestion.variety;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        console.error('Error fetching suggestions:', error);
+    }
+}
+
 // ===============================================
 // UPDATE PRODUCT COUNT
 // ===============================================
@@ -53,6 +53,54 @@ function getCsrfToken() {
     return cookieValue;
 }
 
+// Idempotency keys kept in memory when crypto.subtle is unavailable (plain http)
+const pendingIdempotencyKeys = {};
+
+/**
+ * SHA-256 (hex) of a payload, salted with its idempotency key
+ */
+async function payloadDigest(key, body) {
+    const hash = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(`${key}\n${body}`));
+    return Array.from(new Uint8Array(hash), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+/**
+ * Get the Idempotency-Key for a POST
+ * Resubmitting the same payload reuses the same key, so a retried request is
+ * answered with the first response instead of placing a second order.
+ * sessionStorage only gets the key and a digest of the payload - the payload
+ * itself holds the card number and CVV. Without crypto.subtle the key is only
+ * remembered in memory, for retries from this page.
+ */
+async function getIdempotencyKey(scope, payload) {
+    const storageKey = `idempotency:${scope}`;
+    const body = JSON.stringify(payload);
+    const persist = Boolean(window.crypto && crypto.subtle);
+    const saved = persist
+        ? JSON.parse(sessionStorage.getItem(storageKey) || 'null')
+        : pendingIdempotencyKeys[scope];
+    if (saved && saved.digest === (persist ? await payloadDigest(saved.key, body) : body)) {
+        return saved.key;
+    }
+    const key = window.crypto && crypto.randomUUID
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    if (persist) {
+        sessionStorage.setItem(storageKey, JSON.stringify({ key, digest: await payloadDigest(key, body) }));
+    } else {
+        pendingIdempotencyKeys[scope] = { key, digest: body };
+    }
+    return key;
+}
+
+/**
+ * Forget the Idempotency-Key once its request succeeded
+ */
+function clearIdempotencyKey(scope) {
+    sessionStorage.removeItem(`idempotency:${scope}`);
+    delete pendingIdempotencyKeys[scope];
+}
+
 /**
  * Show or hide loading spinner
  */
@@ -578,7 +626,8 @@ async function submitOrderToBackend() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'X-CSRFToken': getCsrfToken()
+                'X-CSRFToken': getCsrfToken(),
+                'Idempotency-Key': await getIdempotencyKey('create-order', orderPayload)
             },
             body: JSON.stringify(orderPayload)
         });
@@ -591,6 +640,7 @@ async function submitOrderToBackend() {
         if (response.ok) {
             // Order created successfully
             console.log('Order created successfully:', result);
+            clearIdempotencyKey('create-order');
             
             // Store order data for confirmation display
             orderData = result;
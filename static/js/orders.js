@@ -3,6 +3,11 @@
 // Global variable to store all orders data
 let allOrdersData = [];
 
+// Orders are loaded a page at a time: cursor of the next page (null once
+// every order is loaded) and the customer's total number of orders
+let nextOrdersCursor = null;
+let totalOrdersCount = 0;
+
 // Helper function to get CSRF token from cookies
 function getCookie(name) {
     let cookieValue = null;
@@ -50,9 +55,11 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 /**
- * Step 7: Fetch all customer orders from API
+ * Step 7: Fetch customer orders from API
+ * Without a cursor the first page replaces the loaded orders; with the
+ * next_cursor of the last page the next page is appended to them
  */
-async function fetchCustomerOrders() {
+async function fetchCustomerOrders(cursor = null) {
     const customerId = localStorage.getItem('customer_id');
     
     if (!customerId) {
@@ -61,7 +68,11 @@ async function fetchCustomerOrders() {
     }
     
     try {
-        const response = await fetch(`/api/customer/orders/?customer_id=${customerId}`);
+        let url = `/api/customer/orders/?customer_id=${customerId}`;
+        if (cursor) {
+            url += `&cursor=${encodeURIComponent(cursor)}`;
+        }
+        const response = await fetch(url);
         
         if (response.status === 404) {
             handleAuthError('Customer not found');
@@ -76,7 +87,9 @@ async function fetchCustomerOrders() {
         
         if (data.status === 'success') {
             // Store orders data globally
-            allOrdersData = data.data || [];
+            allOrdersData = cursor ? allOrdersData.concat(data.data || []) : (data.data || []);
+            nextOrdersCursor = data.next_cursor || null;
+            totalOrdersCount = data.total ?? allOrdersData.length;
             
             // Render orders UI
             renderOrdersUI(allOrdersData);
@@ -136,6 +149,11 @@ function renderOrdersUI(orders) {
         const orderCard = renderOrderCard(order);
         ordersContainer.appendChild(orderCard);
     });
+    
+    // Older orders are fetched on demand
+    if (nextOrdersCursor) {
+        ordersContainer.appendChild(renderLoadMoreButton());
+    }
 
     // After rendering, re-bind action button handlers (details, reorder, etc.)
     initializeOrderActions();
@@ -152,6 +170,38 @@ function renderOrdersUI(orders) {
     });
 }
 
+/**
+ * Render the "load more" button shown below the last loaded order
+ */
+function renderLoadMoreButton() {
+    const wrapper = document.createElement('div');
+    wrapper.className = 'load-more-orders';
+    wrapper.style.textAlign = 'center';
+    wrapper.style.padding = '20px 0';
+    wrapper.innerHTML = `
+        <button class="action-btn details-btn load-more-btn">
+            <i class="fas fa-chevron-down"></i>
+            LOAD MORE ORDERS (${allOrdersData.length} OF ${totalOrdersCount})
+        </button>
+    `;
+    wrapper.querySelector('button').addEventListener('click', loadMoreOrders);
+    return wrapper;
+}
+
+/**
+ * Fetch the next page of orders and re-apply the active filter
+ */
+async function loadMoreOrders(e) {
+    e.preventDefault();
+    const button = e.currentTarget;
+    button.disabled = true;
+    
+    await fetchCustomerOrders(nextOrdersCursor);
+    
+    const activeTab = document.querySelector('.tab-btn.active');
+    filterOrders(activeTab ? activeTab.getAttribute('data-filter') : 'all');
+}
+
 /**
  * Step 9: Render individual order card
  */
@@ -255,7 +305,7 @@ function updateSidebarProfile() {
 function updateOrdersCount() {
     const sidebarTotalOrdersElement = document.getElementById('sidebarTotalOrders');
     if (sidebarTotalOrdersElement) {
-        const count = allOrdersData.length;
+        const count = totalOrdersCount || allOrdersData.length;
         sidebarTotalOrdersElement.textContent = `${count} ${count === 1 ? 'Order' : 'Orders'}`;
     }
 }
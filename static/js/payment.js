@@ -130,6 +130,46 @@ function getCsrfToken() {
     return cookieValue;
 }
 
+// Idempotency keys kept in memory when crypto.subtle is unavailable (plain http)
+const pendingIdempotencyKeys = {};
+
+// SHA-256 (hex) of a payload, salted with its idempotency key
+async function payloadDigest(key, body) {
+    const hash = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(`${key}\n${body}`));
+    return Array.from(new Uint8Array(hash), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Get the Idempotency-Key for a POST - resubmitting the same payload reuses
+// the same key, so a retried request is answered with the first response.
+// sessionStorage only gets the key and a digest of the payload (which holds
+// card details); without crypto.subtle the key is only kept in memory.
+async function getIdempotencyKey(scope, payload) {
+    const storageKey = `idempotency:${scope}`;
+    const body = JSON.stringify(payload);
+    const persist = Boolean(window.crypto && crypto.subtle);
+    const saved = persist
+        ? JSON.parse(sessionStorage.getItem(storageKey) || 'null')
+        : pendingIdempotencyKeys[scope];
+    if (saved && saved.digest === (persist ? await payloadDigest(saved.key, body) : body)) {
+        return saved.key;
+    }
+    const key = window.crypto && crypto.randomUUID
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    if (persist) {
+        sessionStorage.setItem(storageKey, JSON.stringify({ key, digest: await payloadDigest(key, body) }));
+    } else {
+        pendingIdempotencyKeys[scope] = { key, digest: body };
+    }
+    return key;
+}
+
+// Forget the Idempotency-Key once its request succeeded
+function clearIdempotencyKey(scope) {
+    sessionStorage.removeItem(`idempotency:${scope}`);
+    delete pendingIdempotencyKeys[scope];
+}
+
 // Get modal and define functions at global scope
 const modal = document.getElementById('paymentModal');
 
@@ -752,18 +792,20 @@ async function processPayment(method) {
                 const totalAmount = cart.reduce((sum, item) => sum + (item.price * item.quantity), 0);
                 
                 // Create Payment Intent on backend
+                const paymentIntentPayload = {
+                    amount: totalAmount,
+                    currency: 'usd',
+                    customer_id: customerId,
+                    description: `Farm2Home Order - ${cart.length} items`
+                };
                 const paymentIntentResponse = await fetch('/api/stripe/create-payment-intent/', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
-                        'X-CSRFToken': getCsrfToken()
+                        'X-CSRFToken': getCsrfToken(),
+                        'Idempotency-Key': await getIdempotencyKey('create-payment-intent', paymentIntentPayload)
                     },
-                    body: JSON.stringify({
-                        amount: totalAmount,
-                        currency: 'usd',
-                        customer_id: customerId,
-                        description: `Farm2Home Order - ${cart.length} items`
-                    })
+                    body: JSON.stringify(paymentIntentPayload)
                 });
 
                 const paymentIntentData = await paymentIntentResponse.json();
@@ -860,7 +902,8 @@ async function processPayment(method) {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'X-CSRFToken': getCsrfToken()
+                'X-CSRFToken': getCsrfToken(),
+                'Idempotency-Key': await getIdempotencyKey('create-order', orderData)
             },
             body: JSON.stringify(orderData)
         });
@@ -874,6 +917,8 @@ async function processPayment(method) {
 
         if (response.ok && data.order_id) {
             console.log('✅ Order created successfully:', data);
+            clearIdempotencyKey('create-order');
+            clearIdempotencyKey('create-payment-intent');
             
             // Save order ID for confirmation page
             localStorage.setItem('lastOrderId', data.order_id);